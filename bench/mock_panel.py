@@ -0,0 +1,162 @@
+import asyncio
+import json
+import logging
+import random
+import uuid
+from collections import Counter
+from typing import Dict, List, Optional
+from urllib.parse import parse_qs
+
+logger = logging.getLogger(__name__)
+
+SESSION_COOKIE = "3x-ui=mock-session"
+
+def make_inbounds(inbound_count: int, client_count: int, seed: int = 1) -> List[Dict]:
+    """
+    Builds `inbound_count` VLESS/REALITY inbounds sharing `client_count` clients, in the shape
+    /panel/api/inbounds/list returns (settings and streamSettings as JSON strings, clientStats list).
+    """
+    rng = random.Random(seed)
+    inbounds = []
+    per_inbound = [client_count // inbound_count + (1 if i < client_count % inbound_count else 0) for i in range(inbound_count)]
+    n = 0
+    for i, count in enumerate(per_inbound, start=1):
+        clients, stats = [], []
+        for _ in range(count):
+            email = f"user{n:06d}"
+            up, down = rng.randrange(0, 5 * 1024 ** 3), rng.randrange(0, 50 * 1024 ** 3)
+            clients.append({
+                "id": str(uuid.UUID(int=rng.getrandbits(128))), "email": email, "enable": rng.random() > 0.1,
+                "flow": "xtls-rprx-vision", "limitIp": 0, "totalGB": rng.choice([0, 50 * 1024 ** 3]),
+                "expiryTime": rng.choice([0, 1_700_000_000_000, 4_100_000_000_000]), "tgId": "", "subId": "",
+            })
+            stats.append({"id": n, "inboundId": i, "enable": True, "email": email, "up": up, "down": down,
+                          "expiryTime": 0, "total": 0})
+            n += 1
+        stream = {
+            "network": "tcp", "security": "reality",
+            "realitySettings": {"serverNames": ["example.com"], "shortIds": ["ab12"],
+                                "settings": {"publicKey": "mockPublicKey", "fingerprint": "chrome"}},
+            "tcpSettings": {"header": {"type": "none"}},
+        }
+        inbounds.append({
+            "id": i, "up": sum(s["up"] for s in stats), "down": sum(s["down"] for s in stats), "total": 0,
+            "remark": f"inbound-{i}", "enable": True, "expiryTime": 0, "listen": "", "port": 40000 + i,
+            "protocol": "vless", "tag": f"inbound-{40000 + i}",
+            "settings": json.dumps({"clients": clients, "decryption": "none", "fallbacks": []}),
+            "streamSettings": json.dumps(stream),
+            "sniffing": json.dumps({"enabled": True, "destOverride": ["http", "tls"]}),
+            "clientStats": stats,
+        })
+    return inbounds
+
+
+class MockPanel:
+    """
+    Minimal 3x-ui panel on localhost for benchmarks.
+
+    Implements /login, /panel/api/inbounds/list, get/{id}, addClient, delClient/{id}/{uuid},
+    update/{id} and /server/status with HTTP/1.1 keep-alive, and sleeps `latency` seconds per
+    request to simulate a remote panel. `requests` counts calls per endpoint.
+    """
+    def __init__(self, inbounds: List[Dict], latency: float = 0.0, host: str = "127.0.0.1", port: int = 0):
+        self.inbounds = {i["id"]: i for i in inbounds}
+        self.latency = latency
+        self.host = host
+        self.port = port
+        self.requests: Counter = Counter()
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def start(self) -> int:
+        self._server = await asyncio.start_server(self._handle, self.host, self.port)
+        self.port = self._server.sockets[0].getsockname()[1]
+        return self.port
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            while True:
+                try:
+                    head = await reader.readuntil(b"\r\n\r\n")
+                except (asyncio.IncompleteReadError, ConnectionError):
+                    break
+                lines = head.decode("latin-1").split("\r\n")
+                method, path, _ = lines[0].split(" ", 2)
+                headers = {}
+                for line in lines[1:]:
+                    if ":" in line:
+                        name, value = line.split(":", 1)
+                        headers[name.strip().lower()] = value.strip()
+                length = int(headers.get("content-length", 0))
+                body = await reader.readexactly(length) if length else b""
+
+                if self.latency:
+                    await asyncio.sleep(self.latency)
+                status, payload, extra = self.route(method, path.split("?", 1)[0], headers, body)
+                data = json.dumps(payload).encode()
+                out = [f"HTTP/1.1 {status} {'OK' if status == 200 else 'Error'}",
+                       "Content-Type: application/json", f"Content-Length: {len(data)}", "Connection: keep-alive"]
+                out += [f"{k}: {v}" for k, v in extra.items()]
+                writer.write(("\r\n".join(out) + "\r\n\r\n").encode("latin-1") + data)
+                await writer.drain()
+        finally:
+            writer.close()
+
+    def route(self, method: str, path: str, headers: Dict[str, str], body: bytes):
+        parts = path.strip("/").split("/")
+        endpoint = path
+        if len(parts) >= 4 and parts[:3] == ["panel", "api", "inbounds"]:
+            endpoint = "/".join(parts[:4])
+        self.requests[endpoint] += 1
+
+        if path == "/login":
+            return 200, {"success": True, "msg": "Login Successfully"}, {"Set-Cookie": f"{SESSION_COOKIE}; Path=/; HttpOnly"}
+        if SESSION_COOKIE not in headers.get("cookie", ""):
+            return 401, {"success": False, "msg": "unauthorized"}, {}
+
+        if path == "/server/status":
+            return 200, {"success": True, "obj": {"cpu": 3.5, "mem": {"current": 1, "total": 4}, "disk": {"current": 1, "total": 10},
+                                                 "xray": {"state": "running"}}}, {}
+        if parts[:3] != ["panel", "api", "inbounds"] or len(parts) < 4:
+            return 404, {"success": False, "msg": "not found"}, {}
+
+        action = parts[3]
+        if action == "list":
+            return 200, {"success": True, "obj": list(self.inbounds.values())}, {}
+        if action == "get":
+            inbound = self.inbounds.get(int(parts[4]))
+            return 200, {"success": inbound is not None, "obj": inbound}, {}
+        if action == "addClient":
+            form = {k: v[0] for k, v in parse_qs(body.decode()).items()}
+            inbound = self.inbounds.get(int(form.get("id", 0)))
+            if inbound is None:
+                return 200, {"success": False, "msg": "inbound not found"}, {}
+            settings = json.loads(inbound["settings"])
+            existing = {c["email"] for c in settings["clients"]}
+            new = json.loads(form["settings"])["clients"]
+            if any(c["email"] in existing for c in new):
+                return 200, {"success": False, "msg": "Duplicate email"}, {}
+            settings["clients"].extend(new)
+            inbound["settings"] = json.dumps(settings)
+            return 200, {"success": True, "msg": "Client(s) added"}, {}
+        if action == "delClient":
+            inbound = self.inbounds.get(int(parts[4]))
+            if inbound is None:
+                return 200, {"success": False, "msg": "inbound not found"}, {}
+            settings = json.loads(inbound["settings"])
+            before = len(settings["clients"])
+            settings["clients"] = [c for c in settings["clients"] if (c.get("id") or c.get("password")) != parts[5]]
+            inbound["settings"] = json.dumps(settings)
+            return 200, {"success": len(settings["clients"]) < before, "msg": "Client deleted"}, {}
+        if action == "update":
+            inbound_id = int(parts[4])
+            if inbound_id not in self.inbounds:
+                return 200, {"success": False, "msg": "inbound not found"}, {}
+            self.inbounds[inbound_id] = dict(self.inbounds[inbound_id], **json.loads(body))
+            return 200, {"success": True, "msg": "Inbound updated"}, {}
+        return 404, {"success": False, "msg": "not found"}, {}
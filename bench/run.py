@@ -0,0 +1,274 @@
+"""
+Benchmarks the panel client, the snapshot cache and the /xui handler flows against a local mock panel.
+
+    python -m bench.run --inbounds 4 --clients 5000 --latency 5 --iterations 50 --output bench_output.txt
+
+Every scenario reports latency (mean/p50/p95), mock panel requests and fake Telegram calls per
+iteration; a second pass under tracemalloc reports peak and retained allocations per iteration.
+"""
+import argparse
+import asyncio
+import os
+import statistics
+import sys
+import time
+import tracemalloc
+from collections import Counter
+from typing import Awaitable, Callable, Dict, List, Optional
+
+from bench.mock_panel import MockPanel, make_inbounds
+
+BENCH_USER_ID = 424242
+
+class FakeMessage:
+    def __init__(self, bench: "Bench"):
+        self.bench = bench
+
+    async def reply_text(self, text, **kwargs):
+        self.bench.tg_calls['reply_text'] += 1
+        return FakeMessage(self.bench)
+
+    async def edit_text(self, text, **kwargs):
+        self.bench.tg_calls['edit_text'] += 1
+        return self
+
+    async def reply_document(self, document, **kwargs):
+        self.bench.tg_calls['reply_document'] += 1
+        return FakeMessage(self.bench)
+
+
+class FakeCallbackQuery:
+    def __init__(self, bench: "Bench", data: str):
+        self.bench = bench
+        self.data = data
+        self.message = FakeMessage(bench)
+
+    async def answer(self, *args, **kwargs):
+        self.bench.tg_calls['answer'] += 1
+
+    async def edit_message_text(self, text, **kwargs):
+        self.bench.tg_calls['edit_message_text'] += 1
+
+
+class FakeUser:
+    id = BENCH_USER_ID
+    username = "bench"
+
+
+class FakeUpdate:
+    """
+    Just the attributes the /xui handlers read from telegram.Update.
+    """
+    def __init__(self, bench: "Bench", callback_data: Optional[str] = None):
+        self.effective_user = FakeUser()
+        self.message = FakeMessage(bench)
+        self.callback_query = FakeCallbackQuery(bench, callback_data) if callback_data else None
+
+
+class FakeContext:
+    def __init__(self, args: Optional[List[str]] = None, user_data: Optional[Dict] = None):
+        self.args = args or []
+        self.user_data = user_data if user_data is not None else {}
+
+
+class Result:
+    def __init__(self, name: str):
+        self.name = name
+        self.latencies: List[float] = []
+        self.panel_requests = 0
+        self.tg_calls = 0
+        self.peak_kb = 0.0
+        self.net_kb = 0.0
+
+    def row(self) -> str:
+        n = len(self.latencies) or 1
+        ordered = sorted(self.latencies)
+        p50 = ordered[int(0.50 * (len(ordered) - 1))] if ordered else 0
+        p95 = ordered[int(0.95 * (len(ordered) - 1))] if ordered else 0
+        mean = statistics.fmean(ordered) if ordered else 0
+        return (f"{self.name:<28} {len(self.latencies):>5} {mean * 1000:>9.2f} {p50 * 1000:>9.2f} {p95 * 1000:>9.2f}"
+                f" {self.panel_requests / n:>8.2f} {self.tg_calls / n:>6.2f} {self.peak_kb:>10.1f} {self.net_kb:>9.1f}")
+
+
+HEADER = (f"{'scenario':<28} {'iters':>5} {'mean ms':>9} {'p50 ms':>9} {'p95 ms':>9}"
+          f" {'panel/it':>8} {'tg/it':>6} {'peak KB/it':>10} {'net KB/it':>9}")
+
+
+class Bench:
+    def __init__(self, panel: MockPanel, iterations: int):
+        self.panel = panel
+        self.iterations = iterations
+        self.tg_calls: Counter = Counter()
+        self.results: Dict[str, Result] = {}
+
+    async def measure(self, name: str, op: Callable[[int], Awaitable], iterations: Optional[int] = None,
+                      setup: Optional[Callable[[], None]] = None):
+        result = self.results.setdefault(name, Result(name))
+        iterations = iterations or self.iterations
+        requests_before = sum(self.panel.requests.values())
+        tg_before = sum(self.tg_calls.values())
+        for i in range(iterations):
+            if setup:
+                setup()
+            start = time.perf_counter()
+            await op(i)
+            result.latencies.append(time.perf_counter() - start)
+        result.panel_requests += sum(self.panel.requests.values()) - requests_before
+        result.tg_calls += sum(self.tg_calls.values()) - tg_before
+
+    async def allocations(self, name: str, op: Callable[[int], Awaitable], iterations: int,
+                          setup: Optional[Callable[[], None]] = None, offset: int = 0):
+        result = self.results.setdefault(name, Result(name))
+        tracemalloc.start()
+        try:
+            peaks, nets = [], []
+            for i in range(offset, offset + iterations):
+                if setup:
+                    setup()
+                tracemalloc.reset_peak()
+                before = tracemalloc.get_traced_memory()[0]
+                await op(i)
+                current, peak = tracemalloc.get_traced_memory()
+                peaks.append(peak - before)
+                nets.append(current - before)
+        finally:
+            tracemalloc.stop()
+        result.peak_kb = statistics.fmean(peaks) / 1024
+        result.net_kb = statistics.fmean(nets) / 1024
+
+
+async def run(args) -> str:
+    inbounds = make_inbounds(args.inbounds, args.clients, seed=args.seed)
+    panel = MockPanel(inbounds, latency=args.latency / 1000)
+    port = await panel.start()
+
+    # The handlers read their configuration at import time
+    os.environ.update({
+        "XUI_HOST": "http://127.0.0.1", "XUI_PORT": str(port), "XUI_ROOT": "", "XUI_NODES_FILE": "",
+        "XUI_SESSION_FILE": "", "XUI_CACHE_TTL": "3600", "HOME_IP": "203.0.113.1",
+        "ALLOWED_IDS": str(BENCH_USER_ID), "TRAFFIC_DB": "", "SUB_PORT": "0", "ENFORCE_INTERVAL": "0",
+    })
+    from handlers import xui
+    from services.client_index import client_key
+    from services.xui_cache import InboundSnapshot
+
+    bench = Bench(panel, args.iterations)
+    node = xui.xui_nodes.default
+    client, cache = node.client, node.cache
+    alloc_iterations = max(1, min(args.iterations, args.alloc_iterations))
+
+    try:
+        if not await client.login():
+            raise RuntimeError("login against the mock panel failed")
+
+        async def get_inbounds(_):
+            await client.get_inbounds()
+        raw = await client.get_inbounds()
+
+        async def parse(_):
+            InboundSnapshot(raw, time.time())
+
+        previous = InboundSnapshot(raw, time.time())
+
+        async def parse_incremental(_):
+            InboundSnapshot(raw, time.time(), previous=previous)
+
+        async def snapshot(_):
+            await cache.get_snapshot()
+
+        async def refresh(_):
+            await cache.get_snapshot(force=True)
+
+        snapshot_cases = [
+            ("client.get_inbounds", get_inbounds, None),
+            ("snapshot.parse", parse, None),
+            ("snapshot.parse incremental", parse_incremental, None),
+            ("cache.get_snapshot cold", snapshot, cache.invalidate),
+            ("cache refresh unchanged", refresh, None),
+            ("cache.get_snapshot warm", snapshot, None),
+        ]
+
+        async def list_users(_):
+            await xui.list_users_handler(FakeUpdate(bench), FakeContext())
+
+        await cache.get_snapshot(force=True)
+        wanted = args.iterations + alloc_iterations
+        refs = [xui.client_ref(node, client_key(c)) for _, c in (await cache.get_snapshot()).index.page(0, wanted)]
+
+        async def detail(i):
+            await xui.xui_callback_handler(FakeUpdate(bench, f"xui_u_{refs[i % len(refs)]}"), FakeContext())
+
+        async def link(i):
+            await xui.xui_callback_handler(FakeUpdate(bench, f"xui_l_{refs[i % len(refs)]}"), FakeContext())
+
+        async def page(i):
+            await xui.xui_callback_handler(FakeUpdate(bench, f"xui_p_{i % 50}"), FakeContext())
+
+        handler_cases = [
+            ("handler.list cold", list_users, cache.invalidate),
+            ("handler.list warm", list_users, None),
+            ("handler.page warm", page, None),
+            ("handler.detail", detail, None),
+            ("handler.link", link, None),
+        ]
+
+        for name, op, setup in snapshot_cases + handler_cases:
+            await cache.get_snapshot()
+            await bench.measure(name, op, setup=setup)
+            await bench.allocations(name, op, alloc_iterations, setup=setup)
+
+        # Writes: every add creates a new client and every delete removes a different existing one
+        async def add(i):
+            await xui.add_user_handler(FakeUpdate(bench), FakeContext([f"bench-{i:06d}", "10", "30"]))
+
+        deletable = list(refs)
+
+        async def delete(i):
+            await xui.xui_callback_handler(FakeUpdate(bench, f"xui_dc_{deletable[i]}"), FakeContext())
+            await asyncio.sleep(0)  # let the background progress edit run
+
+        await bench.measure("handler.add", add)
+        await bench.allocations("handler.add", add, alloc_iterations, offset=args.iterations)
+        delete_iterations = min(args.iterations, len(deletable) - alloc_iterations)
+        if delete_iterations > 0:
+            await bench.measure("handler.delete", delete, iterations=delete_iterations)
+            await bench.allocations("handler.delete", delete, alloc_iterations, offset=delete_iterations)
+    finally:
+        await xui.xui_nodes.close()
+        await panel.stop()
+
+    lines = [
+        f"vpsstatus bench: {args.inbounds} inbounds, {args.clients} clients, {args.latency:g} ms panel latency, "
+        f"{args.iterations} iterations ({alloc_iterations} under tracemalloc), python {sys.version.split()[0]}",
+        "",
+        HEADER,
+        "-" * len(HEADER),
+    ]
+    lines += [r.row() for r in bench.results.values()]
+    lines += ["", "mock panel requests: " + ", ".join(f"{k}={v}" for k, v in sorted(panel.requests.items())),
+              "telegram calls: " + ", ".join(f"{k}={v}" for k, v in sorted(bench.tg_calls.items()))]
+    return "\n".join(lines) + "\n"
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark the 3x-ui client and /xui handlers against a mock panel.")
+    parser.add_argument("--inbounds", type=int, default=4)
+    parser.add_argument("--clients", type=int, default=1000, help="total clients across all inbounds (10 to 50000)")
+    parser.add_argument("--latency", type=float, default=0, help="injected panel latency per request, in ms")
+    parser.add_argument("--iterations", type=int, default=50)
+    parser.add_argument("--alloc-iterations", type=int, default=10, help="iterations per scenario under tracemalloc")
+    parser.add_argument("--seed", type=int, default=1)
+    parser.add_argument("--output", help="also write the report to this file")
+    args = parser.parse_args()
+    if not 1 <= args.inbounds <= args.clients:
+        parser.error("need at least one client per inbound")
+
+    report = asyncio.run(run(args))
+    print(report, end="")
+    if args.output:
+        with open(args.output, "w") as f:
+            f.write(report)
+
+
+if __name__ == "__main__":
+    main()
@@ -1,4 +1,5 @@
 import os
+import json
 from dotenv import load_dotenv
 
 load_dotenv()
@@ -6,10 +7,114 @@ load_dotenv()
 TOKEN = os.getenv("TELEGRAM_BOT_TOKEN")
 ALLOWED_IDS = [int(x.strip()) for x in os.getenv("ALLOWED_IDS", "").split(",") if x.strip()]
 
+# Webhook mode (behind a reverse proxy): WEBHOOK_URL is the public https URL Telegram posts updates to,
+# served locally on WEBHOOK_LISTEN:WEBHOOK_PORT at WEBHOOK_PATH (default: the path of WEBHOOK_URL).
+# WEBHOOK_SECRET is checked on every request (default: derived from the bot token). Empty WEBHOOK_URL = long polling.
+WEBHOOK_URL = os.getenv("WEBHOOK_URL", "")
+WEBHOOK_LISTEN = os.getenv("WEBHOOK_LISTEN", "127.0.0.1")
+WEBHOOK_PORT = int(os.getenv("WEBHOOK_PORT", "8443"))
+WEBHOOK_PATH = os.getenv("WEBHOOK_PATH", "")
+WEBHOOK_SECRET = os.getenv("WEBHOOK_SECRET", "")
+
 XUI_HOST = os.getenv("XUI_HOST", "http://127.0.0.1")
 XUI_PORT = int(os.getenv("XUI_PORT", "2053"))
 XUI_USER = os.getenv("XUI_USERNAME", "admin")
 XUI_PASS = os.getenv("XUI_PASSWORD", "admin")
 XUI_ROOT = os.getenv("XUI_ROOT", "")
+XUI_TIMEOUT = float(os.getenv("XUI_TIMEOUT", "10"))
+XUI_MAX_CONCURRENCY = int(os.getenv("XUI_MAX_CONCURRENCY", "4"))
+# Panel session cookie is saved here so restarts skip the cold login (empty to disable)
+XUI_SESSION_FILE = os.getenv("XUI_SESSION_FILE", ".xui_session.json")
+# Assumed session lifetime (seconds) when the panel cookie carries no expiry
+XUI_SESSION_MAX_AGE = float(os.getenv("XUI_SESSION_MAX_AGE", "3600"))
+XUI_CACHE_TTL = float(os.getenv("XUI_CACHE_TTL", "30"))
+XUI_PAGE_SIZE = max(1, int(os.getenv("XUI_PAGE_SIZE", "20")))
 
 HOME_IP = os.getenv("HOME_IP", "")
+
+# Multiple panels: path to a JSON list of
+# {"name", "host", "port", "username", "password", "root", "address"} objects.
+# Without it the single panel above is used, named XUI_NODE_NAME, with HOME_IP as its link address.
+XUI_NODES_FILE = os.getenv("XUI_NODES_FILE", "")
+XUI_NODE_NAME = os.getenv("XUI_NODE_NAME", "main")
+# Per-node timeout (seconds) for fan-out operations across panels (default: XUI_TIMEOUT; unused with one panel)
+XUI_NODE_TIMEOUT = float(os.getenv("XUI_NODE_TIMEOUT", str(XUI_TIMEOUT)))
+
+def _load_nodes():
+    if XUI_NODES_FILE:
+        with open(XUI_NODES_FILE) as f:
+            return json.load(f)
+    return [{
+        "name": XUI_NODE_NAME, "host": XUI_HOST, "port": XUI_PORT, "username": XUI_USER,
+        "password": XUI_PASS, "root": XUI_ROOT, "address": HOME_IP
+    }]
+
+XUI_NODES = _load_nodes()
+
+# Service watchdog: comma-separated systemd units shown in System Status, seconds between checks,
+# units restarted automatically when they stop, and the restart backoff (seconds, doubling up to the max)
+WATCH_SERVICES = [x.strip() for x in os.getenv("WATCH_SERVICES", "x-ui,docker,ssh").split(",") if x.strip()]
+WATCH_INTERVAL = float(os.getenv("WATCH_INTERVAL", "15"))
+WATCH_AUTO_RESTART = [x.strip() for x in os.getenv("WATCH_AUTO_RESTART", "").split(",") if x.strip()]
+WATCH_RESTART_BACKOFF = float(os.getenv("WATCH_RESTART_BACKOFF", "30"))
+WATCH_RESTART_MAX_BACKOFF = float(os.getenv("WATCH_RESTART_MAX_BACKOFF", "1800"))
+
+# Alerting: seconds between evaluations (0 disables), % limits for cpu/ram/disk (0 turns a rule off),
+# points below the limit before an alert clears, consecutive checks needed to change state,
+# seconds between service/panel probes, and the comma-separated services watched
+ALERT_INTERVAL = float(os.getenv("ALERT_INTERVAL", "10"))
+ALERT_CPU = float(os.getenv("ALERT_CPU", "90"))
+ALERT_RAM = float(os.getenv("ALERT_RAM", "90"))
+ALERT_DISK = float(os.getenv("ALERT_DISK", "90"))
+ALERT_HYSTERESIS = float(os.getenv("ALERT_HYSTERESIS", "10"))
+ALERT_DEBOUNCE = int(os.getenv("ALERT_DEBOUNCE", "3"))
+ALERT_PROBE_INTERVAL = float(os.getenv("ALERT_PROBE_INTERVAL", "60"))
+ALERT_SERVICES = [x.strip() for x in os.getenv("ALERT_SERVICES", "x-ui").split(",") if x.strip()]
+
+# Subscription server: client apps fetch http://<host>:SUB_PORT<SUB_PATH><token> (SUB_PORT=0 disables it)
+# Tokens are HMACs of the client's credential under SUB_SECRET (default: derived from the bot token)
+SUB_LISTEN = os.getenv("SUB_LISTEN", "0.0.0.0")
+SUB_PORT = int(os.getenv("SUB_PORT", "0"))
+SUB_PATH = os.getenv("SUB_PATH", "/sub/")
+SUB_SECRET = os.getenv("SUB_SECRET", "")
+# Refresh interval (hours) suggested to client apps
+SUB_UPDATE_HOURS = int(os.getenv("SUB_UPDATE_HOURS", "12"))
+
+# Quota/expiry enforcement (opt-in): seconds between cycles (0 disables), and "disable" or "delete"
+ENFORCE_INTERVAL = float(os.getenv("ENFORCE_INTERVAL", "0"))
+ENFORCE_ACTION = os.getenv("ENFORCE_ACTION", "disable")
+
+# Minimum seconds between live edits of the ping message (Telegram edit limits)
+PING_EDIT_INTERVAL = float(os.getenv("PING_EDIT_INTERVAL", "1"))
+
+# System stats sampler: seconds between samples, samples kept, summary window (seconds)
+STATS_INTERVAL = float(os.getenv("STATS_INTERVAL", "5"))
+STATS_HISTORY = int(os.getenv("STATS_HISTORY", "720"))
+STATS_WINDOW = float(os.getenv("STATS_WINDOW", "300"))
+# Process table: seconds between refreshes, rows shown by /procs
+PROC_INTERVAL = float(os.getenv("PROC_INTERVAL", "10"))
+PROC_TOP = int(os.getenv("PROC_TOP", "10"))
+# Seconds between per-inbound connection counts for /inbounds (0 disables the monitor);
+# throughput refreshes with the panel snapshot, at most every XUI_CACHE_TTL seconds
+PORT_MONITOR_INTERVAL = float(os.getenv("PORT_MONITOR_INTERVAL", "5"))
+# Outbound Telegram limits: messages/s overall, per private chat (with burst), per group per minute,
+# and retries after a flood-control RetryAfter
+TG_GLOBAL_RATE = float(os.getenv("TG_GLOBAL_RATE", "25"))
+TG_CHAT_RATE = float(os.getenv("TG_CHAT_RATE", "1"))
+TG_CHAT_BURST = float(os.getenv("TG_CHAT_BURST", "3"))
+TG_GROUP_RATE_PER_MIN = float(os.getenv("TG_GROUP_RATE_PER_MIN", "20"))
+TG_MAX_RETRIES = int(os.getenv("TG_MAX_RETRIES", "3"))
+# Incoming updates: handlers running at once (updates from one chat always run in order),
+# and updates admitted before the rest wait in the application's queue
+UPDATE_WORKERS = max(1, int(os.getenv("UPDATE_WORKERS", "8")))
+UPDATE_MAX_PENDING = max(1, int(os.getenv("UPDATE_MAX_PENDING", "256")))
+# Optional Prometheus endpoint for the /perf histograms (PERF_METRICS_PORT=0 disables it)
+PERF_METRICS_LISTEN = os.getenv("PERF_METRICS_LISTEN", "127.0.0.1")
+PERF_METRICS_PORT = int(os.getenv("PERF_METRICS_PORT", "0"))
+
+# Traffic history (SQLite file, empty to disable): poll interval (seconds),
+# hours of raw samples before hourly downsampling, days of history kept
+TRAFFIC_DB = os.getenv("TRAFFIC_DB", "traffic.db")
+TRAFFIC_INTERVAL = float(os.getenv("TRAFFIC_INTERVAL", "60"))
+TRAFFIC_RAW_HOURS = float(os.getenv("TRAFFIC_RAW_HOURS", "24"))
+TRAFFIC_RETENTION_DAYS = float(os.getenv("TRAFFIC_RETENTION_DAYS", "30"))
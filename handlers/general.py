@@ -17,6 +17,17 @@ async def help_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
         "<b>Commands:</b>\n"
         "/start - Show main menu\n"
         "/ping <IP> - Ping specific IP\n"
+        "/procs [cpu|rss|fds|conns] [N] - Top processes by resource\n"
+        "/inbounds - Live connections and Mbps per inbound\n"
+        "/perf [filter|reset] - Latency percentiles per operation\n"
+        "/add <name> [GB] [days] - Add a VPN user, optionally with quota/expiry\n"
+        "/addbulk <names...> - Add many users (or upload a .txt/.csv with this caption)\n"
+        "/cleanup - Delete or disable expired / over-quota users\n"
+        "/find <text> - Search users on all panels\n"
+        "/export - Download all share links of the active panel\n"
+        "/nodes [name] - List panels / choose where users are added\n"
+        "/top [N] [hours] - Heaviest users over the last hours\n"
+        "/usage <email> [hours] - Traffic graph for one user\n"
         "\n"
         "<b>Features:</b>\n"
         "🖥 <b>System Status</b>: Check CPU/RAM and Services.\n"
@@ -1,7 +1,84 @@
+import asyncio
+import html
+import logging
+import time
 from telegram import Update
 from telegram.ext import ContextTypes
+from telegram.helpers import escape_markdown
 from utils.auth import restricted
-from services.system_monitor import ping_host, check_service_status, get_system_stats
+from utils.perf import perf
+from services.system_monitor import stream_ping, parse_ping_summary, get_system_stats
+from services.stats_sampler import StatsSampler
+from services.alerts import AlertMonitor
+from services.watchdog import ServiceWatchdog
+from services.process_table import ProcessTable
+from services.port_monitor import PortMonitor
+from handlers.xui import xui_nodes
+from config import (STATS_INTERVAL, STATS_HISTORY, STATS_WINDOW, PING_EDIT_INTERVAL, PROC_INTERVAL, PROC_TOP, PORT_MONITOR_INTERVAL, ALERT_INTERVAL, ALERT_CPU, ALERT_RAM,
+                    ALERT_DISK, ALERT_HYSTERESIS, ALERT_DEBOUNCE, ALERT_PROBE_INTERVAL, ALERT_SERVICES,
+                    WATCH_SERVICES, WATCH_INTERVAL, WATCH_AUTO_RESTART, WATCH_RESTART_BACKOFF, WATCH_RESTART_MAX_BACKOFF)
+
+logger = logging.getLogger(__name__)
+
+# Background sampler, started from main.py once the event loop is running
+stats_sampler = StatsSampler(interval=STATS_INTERVAL, size=STATS_HISTORY)
+# Persistent process handles for /procs, refreshed in the background
+process_table = ProcessTable(interval=PROC_INTERVAL)
+# Connections per inbound port on the local (default) panel
+port_monitor = PortMonitor(xui_nodes.default, interval=PORT_MONITOR_INTERVAL) if PORT_MONITOR_INTERVAL > 0 else None
+# Cached systemd state of every displayed or alerted-on unit, refreshed in the background
+service_watchdog = ServiceWatchdog(
+    WATCH_SERVICES + ALERT_SERVICES, interval=WATCH_INTERVAL, auto_restart=WATCH_AUTO_RESTART,
+    backoff=WATCH_RESTART_BACKOFF, max_backoff=WATCH_RESTART_MAX_BACKOFF
+)
+# Threshold alerts, scheduled on the job queue from main.py (ALERT_INTERVAL=0 disables them)
+alert_monitor = AlertMonitor(
+    stats_sampler, xui_nodes, ALERT_SERVICES, cpu=ALERT_CPU, ram=ALERT_RAM, disk=ALERT_DISK,
+    hysteresis=ALERT_HYSTERESIS, debounce=ALERT_DEBOUNCE, probe_interval=ALERT_PROBE_INTERVAL,
+    service_check=service_watchdog.check
+) if ALERT_INTERVAL > 0 else None
+
+async def stream_ping_to_message(msg, host: str, count: int):
+    """
+    Streams ping output into `msg`, editing it at most once per PING_EDIT_INTERVAL seconds,
+    and finishes with the parsed min/avg/max/loss summary.
+    """
+    header = f"🏓 Pinging {host} ({count} packets)..."
+    lines = []
+    shown = ""
+    last_edit = 0.0  # first reply line is shown immediately
+
+    async def edit(text):
+        nonlocal shown, last_edit
+        if text != shown:
+            await msg.edit_text(text)
+            shown = text
+        last_edit = time.monotonic()
+
+    try:
+        async for line in stream_ping(host, count):
+            if line:
+                lines.append(line)
+            if time.monotonic() - last_edit >= PING_EDIT_INTERVAL:
+                await edit(header + "\n\n" + "\n".join(lines))
+    except asyncio.TimeoutError:
+        await edit(f"❌ Ping to {host} timed out.\n\n" + "\n".join(lines))
+        return
+    except Exception as e:
+        logger.error(f"Error pinging {host}: {e}")
+        await edit(f"⚠️ Error executing ping command: {e}")
+        return
+
+    output = "\n".join(lines)
+    summary = parse_ping_summary(output)
+    if summary and summary['received'] > 0:
+        result = f"✅ Ping to {host} successful!\n\n{output}\n\n"
+        if 'avg' in summary:
+            result += f"📊 min/avg/max: {summary['min']:.1f}/{summary['avg']:.1f}/{summary['max']:.1f} ms · "
+        result += f"loss: {summary['loss']:g}%"
+    else:
+        result = f"❌ Ping to {host} failed.\n\n{output}"
+    await edit(result)
 
 @restricted
 async def ping_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -11,20 +88,152 @@ async def ping_command(update: Update, context: ContextTypes.DEFAULT_TYPE):
     
     ip = context.args[0]
     msg = await update.message.reply_text(f"Pinging {ip}...")
-    result = ping_host(ip)
-    await msg.edit_text(result)
+    await stream_ping_to_message(msg, ip, count=4)
 
 @restricted
 async def system_status_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    stats = get_system_stats()
+    stats = get_system_stats(stats_sampler, window=STATS_WINDOW)
     
-    # Check services
-    services = ["x-ui", "docker", "ssh"] # customizable
+    # Services come from the watchdog's cache; with several panels, every node's status is fetched too
+    await service_watchdog.check()
     service_status = "\n\n🛠 **Services**:\n"
-    for s in services:
-        active = check_service_status(s)
-        # Only show if active or if it's a primary expected service that is down
-        if active or s in ["x-ui"]: 
-             service_status += f"{'✅' if active else '🔴'} {s}\n"
+    for name in WATCH_SERVICES:
+        service_status += format_service_status(service_watchdog.states[name]) + "\n"
+    node_results = await xui_nodes.fan_out(lambda node: node.client.get_server_status()) if len(xui_nodes) > 1 else []
+
+    node_status = ""
+    if node_results:
+        node_status = "\n🌐 **Nodes**:\n" + "\n".join(format_node_status(node.name, status) for node, status, _ in node_results)
         
-    await update.message.reply_text(stats + service_status, parse_mode='Markdown')
+    await update.message.reply_text(stats + service_status + node_status, parse_mode='Markdown')
+
+@restricted
+async def processes_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /procs [cpu|rss|fds|conns] [N] - top processes by the given resource.
+    """
+    key = context.args[0].lower() if context.args else "cpu"
+    key = {"mem": "rss", "ram": "rss", "conn": "conns", "fd": "fds"}.get(key, key)
+    if key not in ProcessTable.SORT_KEYS:
+        await update.message.reply_text("Usage: /procs [cpu|rss|fds|conns] [N]")
+        return
+    try:
+        limit = max(1, min(50, int(context.args[1]))) if len(context.args or []) > 1 else PROC_TOP
+    except ValueError:
+        limit = PROC_TOP
+
+    try:
+        rows = await process_table.top(key, limit)
+    except ImportError:
+        await update.message.reply_text("psutil not installed, cannot list processes.")
+        return
+
+    lines = [f"{'PID':>7} {'CPU%':>6} {'RSS MB':>7} {'FDs':>5} {'Conn':>5}  NAME" if key == "conns"
+             else f"{'PID':>7} {'CPU%':>6} {'RSS MB':>7} {'FDs':>5}  NAME"]
+    for p in rows:
+        line = f"{p.pid:>7} {p.cpu:>6.1f} {p.rss / 1024 ** 2:>7.0f} {p.fds:>5}"
+        if key == "conns":
+            line += f" {p.conns:>5}"
+        lines.append(f"{line}  {p.name[:20]}")
+    own = process_table.own()
+    footer = f"\n🤖 Bot: CPU {own.cpu:.1f}% · RSS {own.rss / 1024 ** 2:.0f} MB · {own.fds} FDs" if own else ""
+    text = f"⚙️ <b>Top {len(rows)} processes by {key}</b>\n<pre>{html.escape(chr(10).join(lines))}</pre>{footer}"
+    await update.message.reply_text(text, parse_mode='HTML')
+
+@restricted
+async def inbounds_load_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /inbounds - live connections and throughput per inbound of the local panel.
+    """
+    if not port_monitor:
+        await update.message.reply_text("Inbound monitor is disabled (PORT_MONITOR_INTERVAL=0).")
+        return
+    if port_monitor.stale():
+        # Fetches a snapshot if none is cached and maps its ports to inbounds
+        await port_monitor.sample()
+
+    rows = port_monitor.inbound_rows()
+    if not rows:
+        await update.message.reply_text("No inbounds found or connection failed.")
+        return
+
+    def mbps(bytes_per_sec):
+        return "  -  " if bytes_per_sec is None else f"{bytes_per_sec * 8 / 1_000_000:5.1f}"
+
+    lines = [f"{'PORT':>5} {'CONN':>5} {'UP':>5} {'DOWN':>5}  INBOUND"]
+    for row in sorted(rows, key=lambda r: r['connections'], reverse=True):
+        name = f"{row['remark']} ({row['protocol']})" + ("" if row['enable'] else " [off]")
+        lines.append(f"{row['port']:>5} {row['connections']:>5} {mbps(row['up'])} {mbps(row['down'])}  {name[:28]}")
+
+    latest = stats_sampler.latest()
+    host = f"\n🌐 Host: 🔼 {latest['net_up'] * 8 / 1_000_000:.2f} Mbps 🔽 {latest['net_down'] * 8 / 1_000_000:.2f} Mbps" if latest else ""
+    await update.message.reply_text(
+        f"📡 <b>Inbound load</b> (Mbps between panel snapshots)\n<pre>{html.escape(chr(10).join(lines))}</pre>{host}",
+        parse_mode='HTML'
+    )
+
+@restricted
+async def perf_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /perf [filter] - latency percentiles per operation; /perf reset clears them.
+    """
+    if context.args and context.args[0] == "reset":
+        perf.reset()
+        await update.message.reply_text("✅ Perf counters reset.")
+        return
+
+    needle = context.args[0].lower() if context.args else ""
+    rows = [(name, hist) for name, hist in perf.summary() if needle in name.lower()][:25]
+    gauges = [(name, value) for name, value in perf.gauge_values() if needle in name.lower()]
+    if not rows and not gauges:
+        await update.message.reply_text("No measurements yet.")
+        return
+
+    lines = [f"{'COUNT':>6} {'ERR':>4} {'P50':>7} {'P95':>7} {'P99':>7}  OP (ms)"]
+    for name, hist in rows:
+        p50, p95, p99 = (hist.percentile(q) * 1000 for q in (0.5, 0.95, 0.99))
+        lines.append(f"{hist.count:>6} {hist.errors:>4} {p50:>7.1f} {p95:>7.1f} {p99:>7.1f}  {name[:40]}")
+    since = format_duration(time.time() - perf.started_at)
+    text = f"⏱ <b>Latency</b> (last {since}, by total time)\n<pre>{html.escape(chr(10).join(lines))}</pre>" if rows else ""
+    if gauges:
+        text += "\n📥 <b>Now</b>\n<pre>" + html.escape("\n".join(f"{value:>6g}  {name}" for name, value in gauges)) + "</pre>"
+    await update.message.reply_text(text.strip(), parse_mode='HTML')
+
+def format_duration(seconds: float) -> str:
+    minutes = int(seconds // 60)
+    days, hours, minutes = minutes // 1440, minutes // 60 % 24, minutes % 60
+    if days:
+        return f"{days}d {hours}h"
+    if hours:
+        return f"{hours}h {minutes}m"
+    return f"{minutes}m"
+
+def format_service_status(state) -> str:
+    """
+    One line per unit: state, uptime and restart counts from the watchdog.
+    """
+    name = escape_markdown(state.name)
+    if not state.active:
+        return f"🔴 {name} ({escape_markdown(state.active_state)})"
+    details = []
+    if state.uptime is not None:
+        details.append(f"up {format_duration(state.uptime)}")
+    restarts = state.n_restarts + state.auto_restarts
+    if restarts:
+        details.append(f"{restarts} restarts")
+    return f"✅ {name}" + (f" ({', '.join(details)})" if details else "")
+
+def format_node_status(name: str, status) -> str:
+    """
+    One summary line from a panel's /server/status payload.
+    """
+    name = escape_markdown(name)
+    if not status:
+        return f"🔴 {name}: unreachable"
+    mem = status.get('mem') or {}
+    disk = status.get('disk') or {}
+    mem_pct = 100 * mem.get('current', 0) / mem['total'] if mem.get('total') else 0
+    disk_pct = 100 * disk.get('current', 0) / disk['total'] if disk.get('total') else 0
+    xray = (status.get('xray') or {}).get('state', '?')
+    icon = "🟢" if xray == 'running' else "🟠"
+    return f"{icon} {name}: CPU {status.get('cpu', 0):.0f}% · RAM {mem_pct:.0f}% · Disk {disk_pct:.0f}% · xray {escape_markdown(str(xray))}"
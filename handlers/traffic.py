@@ -0,0 +1,81 @@
+import html
+import time
+from telegram import Update
+from telegram.ext import ContextTypes
+from utils.auth import restricted
+from handlers.xui import xui_nodes, bytes_to_readable
+from config import TRAFFIC_DB, TRAFFIC_INTERVAL, TRAFFIC_RAW_HOURS, TRAFFIC_RETENTION_DAYS
+
+# History is optional: leave TRAFFIC_DB empty to disable it (and skip importing sqlite3)
+if TRAFFIC_DB:
+    from services.traffic_store import TrafficStore, TrafficCollector
+    traffic_store = TrafficStore(TRAFFIC_DB, raw_hours=TRAFFIC_RAW_HOURS, retention_days=TRAFFIC_RETENTION_DAYS)
+    traffic_collector = TrafficCollector(xui_nodes, traffic_store, interval=TRAFFIC_INTERVAL)
+else:
+    traffic_store = traffic_collector = None
+
+SPARK_BLOCKS = "▁▂▃▄▅▆▇█"
+
+def sparkline(values):
+    peak = max(values) if values else 0
+    if peak <= 0:
+        return SPARK_BLOCKS[0] * len(values)
+    return "".join(SPARK_BLOCKS[min(len(SPARK_BLOCKS) - 1, int(v / peak * (len(SPARK_BLOCKS) - 1)))] for v in values)
+
+def _parse_number(args, index, default, cast=int):
+    try:
+        return cast(args[index])
+    except (IndexError, ValueError):
+        return default
+
+@restricted
+async def top_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not traffic_store:
+        await update.message.reply_text("Traffic history is disabled (set TRAFFIC_DB).")
+        return
+
+    # Fifty lines stay well within Telegram's 4096-character message limit
+    limit = max(1, min(50, _parse_number(context.args, 0, 10)))
+    hours = _parse_number(context.args, 1, 1.0, float)
+    rows = await traffic_store.top_async(int(time.time() - hours * 3600), limit)
+    if not rows:
+        await update.message.reply_text(f"No traffic recorded in the last {hours:g}h.")
+        return
+
+    lines = [f"🏆 <b>Top {len(rows)} users, last {hours:g}h:</b>"]
+    for n, (email, up, down) in enumerate(rows, 1):
+        lines.append(f"{n}. {html.escape(email[:40])} — {bytes_to_readable(up + down)} (🔼 {bytes_to_readable(up)} 🔽 {bytes_to_readable(down)})")
+    await update.message.reply_text("\n".join(lines), parse_mode='HTML')
+
+@restricted
+async def usage_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not traffic_store:
+        await update.message.reply_text("Traffic history is disabled (set TRAFFIC_DB).")
+        return
+    if not context.args:
+        await update.message.reply_text("Usage: /usage <email> [hours]\n(on other panels: /usage <node>/<email>)")
+        return
+
+    email = context.args[0]
+    hours = _parse_number(context.args, 1, 24.0, float)
+    # ~24 buckets, never finer than the collection interval
+    bucket = max(int(TRAFFIC_INTERVAL), int(hours * 3600 / 24))
+    now = int(time.time())
+    since = (now - int(hours * 3600)) // bucket * bucket
+    rows = {b: (up, down) for b, up, down in await traffic_store.series_async(email, since, bucket)}
+    if not rows:
+        await update.message.reply_text(f"No traffic recorded for {email} in the last {hours:g}h.")
+        return
+
+    buckets = range(since, now + 1, bucket)
+    rates = [sum(rows.get(b, (0, 0))) * 8 / bucket / 1_000_000 for b in buckets]
+    total_up = sum(up for up, _ in rows.values())
+    total_down = sum(down for _, down in rows.values())
+
+    await update.message.reply_text(
+        f"📈 <b>{html.escape(email)}</b>, last {hours:g}h\n"
+        f"<code>{sparkline(rates)}</code>\n"
+        f"Peak: {max(rates):.2f} Mbps · Avg: {sum(rates) / len(rates):.2f} Mbps\n"
+        f"🔼 {bytes_to_readable(total_up)} 🔽 {bytes_to_readable(total_down)}",
+        parse_mode='HTML'
+    )
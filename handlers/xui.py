@@ -1,14 +1,53 @@
 from telegram import Update, ReplyKeyboardMarkup, InlineKeyboardMarkup, InlineKeyboardButton
 from telegram.ext import ContextTypes, CallbackQueryHandler
 from utils.auth import restricted
+from utils.perf import timed
+from utils.rate_limiter import edit_later
 from services.xui_client import XUIClient
-from config import XUI_HOST, XUI_PORT, XUI_USER, XUI_PASS, XUI_ROOT, HOME_IP
+from services.xui_cache import XUICache
+from services.nodes import Node, NodeRegistry
+from services.client_index import client_key, short_ref
+from config import XUI_NODES, XUI_NODE_TIMEOUT, XUI_TIMEOUT, XUI_MAX_CONCURRENCY, XUI_SESSION_FILE, XUI_SESSION_MAX_AGE, XUI_CACHE_TTL, XUI_PAGE_SIZE, ENFORCE_INTERVAL, ENFORCE_ACTION, SUB_LISTEN, SUB_PORT, SUB_PATH, SUB_SECRET, SUB_UPDATE_HOURS, TOKEN
 import uuid
-import json
 import html
+import csv
+import io
+import time
+import hashlib
 
-# Initialize client
-xui_client = XUIClient(XUI_HOST, XUI_PORT, XUI_USER, XUI_PASS, XUI_ROOT)
+def _connect_node(conf):
+    # Each panel needs its own session file once there is more than one
+    session_file = conf.get('session_file')
+    if session_file is None:
+        session_file = XUI_SESSION_FILE if len(XUI_NODES) == 1 or not XUI_SESSION_FILE else f"{XUI_SESSION_FILE}.{conf['name']}"
+    client = XUIClient(conf['host'], int(conf['port']), conf['username'], conf['password'], conf.get('root', ''),
+                       timeout=XUI_TIMEOUT, max_concurrency=XUI_MAX_CONCURRENCY,
+                       session_file=session_file, session_max_age=XUI_SESSION_MAX_AGE)
+    return client, XUICache(client, ttl=XUI_CACHE_TTL)
+
+def _build_node(conf) -> Node:
+    return Node(conf['name'], address=conf.get('address', ''), factory=lambda: _connect_node(conf))
+
+# One client + snapshot cache per panel, each built on first use (the first node is the default)
+xui_nodes = NodeRegistry([_build_node(conf) for conf in XUI_NODES], timeout=XUI_NODE_TIMEOUT)
+# Subscription endpoint, started from main.py (SUB_PORT=0 disables it; imported only when enabled)
+if SUB_PORT:
+    from services.subscription import SubscriptionServer
+    subscription_server = SubscriptionServer(
+        xui_nodes, SUB_SECRET or hashlib.sha256(f"subscription:{TOKEN}".encode()).hexdigest(),
+        SUB_LISTEN, SUB_PORT, SUB_PATH, SUB_UPDATE_HOURS, refresh_interval=XUI_CACHE_TTL,
+    )
+else:
+    subscription_server = None
+
+def make_quota_enforcers():
+    """
+    Quota/expiry enforcement per node, created and started from main.py (ENFORCE_INTERVAL=0 disables it).
+    """
+    if ENFORCE_INTERVAL <= 0:
+        return []
+    from services.enforcer import QuotaEnforcer
+    return [QuotaEnforcer(node.cache, interval=ENFORCE_INTERVAL, action=ENFORCE_ACTION) for node in xui_nodes]
 
 @restricted
 async def xui_help_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
@@ -29,57 +68,105 @@ def bytes_to_readable(bytes_val):
         bytes_val /= 1024
     return f"{bytes_val:.2f} PB"
 
+def active_node(context) -> Node:
+    """
+    The node this admin adds users to / cleans up (selected with /nodes <name>).
+    """
+    return xui_nodes.get(context.user_data.get('xui_node')) or xui_nodes.default
+
+def client_ref(node: Node, key: str) -> str:
+    # Callback payload: "<node index>:<short_ref>", since emails and passwords can exceed
+    # Telegram's 64-byte callback_data
+    return f"{xui_nodes.index_of(node)}:{short_ref(key)}"
+
+async def resolve_ref(payload: str):
+    """
+    Returns (node, client key) for a client_ref payload; the key is None if the client is gone.
+    """
+    index, _, ref = payload.rpartition(':')
+    node = (xui_nodes.by_index(int(index)) if index else None) or xui_nodes.default
+    snapshot = await node.cache.get_snapshot()
+    return node, snapshot.index.resolve_ref(ref) if snapshot else None
+
+def link_host(node: Node) -> str:
+    return node.link_host
+
+def subscription_line(node: Node, client: dict) -> str:
+    """
+    HTML line with the client's subscription URL, or "" when the subscription server is off.
+    """
+    if not subscription_server:
+        return ""
+    url = f"http://{node.link_host}:{SUB_PORT}{subscription_server.path}{subscription_server.token(node, client)}"
+    return f"\n\n📥 <b>Subscription:</b>\n<code>{html.escape(url)}</code>"
+
+def user_button(node: Node, client) -> InlineKeyboardButton:
+    email = client.get('email', 'No Name')
+    status_icon = "🟢" if client.get('enable', True) else "🔴"
+    tag = f"[{node.name}] " if len(xui_nodes) > 1 else ""
+    return InlineKeyboardButton(f"{status_icon} {tag}{email}", callback_data=f"xui_u_{client_ref(node, client_key(client))}")
+
+def render_user_page(snapshots, page: int):
+    """
+    Builds the text and inline keyboard for one page of the user browser,
+    over the clients of every reachable node in registry order.
+    Returns (text, reply_markup, page) with the page clamped to the valid range.
+    """
+    live = [(node, snapshot) for node, snapshot in snapshots if snapshot]
+    offline = [node.name for node, snapshot in snapshots if not snapshot]
+    total = sum(len(snapshot.index) for _, snapshot in live)
+    pages = max(1, (total + XUI_PAGE_SIZE - 1) // XUI_PAGE_SIZE)
+    page = min(max(page, 0), pages - 1)
+
+    keyboard = []
+    offset = page * XUI_PAGE_SIZE
+    for node, snapshot in live:
+        size = len(snapshot.index)
+        if offset >= size:
+            offset -= size
+            continue
+        for inbound_id, client in snapshot.index.page(offset, XUI_PAGE_SIZE - len(keyboard)):
+            keyboard.append([user_button(node, client)])
+        offset = 0
+        if len(keyboard) >= XUI_PAGE_SIZE:
+            break
+
+    nav = []
+    if page > 0:
+        nav.append(InlineKeyboardButton("⬅️ Prev", callback_data=f"xui_p_{page - 1}"))
+    if page < pages - 1:
+        nav.append(InlineKeyboardButton("Next ➡️", callback_data=f"xui_p_{page + 1}"))
+    if nav:
+        keyboard.append(nav)
+
+    text = f"📂 <b>Select a User:</b>\nPage {page + 1}/{pages} · {total} users"
+    if offline:
+        text += f"\n⚠️ Unreachable: {html.escape(', '.join(offline))}"
+    return text, InlineKeyboardMarkup(keyboard), page
+
 @restricted
 async def list_users_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
-    msg = await update.message.reply_text("Fetching users...")
-    inbounds = xui_client.get_inbounds()
+    # With every snapshot cached the answer is immediate: one message instead of a placeholder plus an edit
+    msg = None
+    if not all(node.cache.is_fresh() for node in xui_nodes):
+        msg = await update.message.reply_text("Fetching users...")
+    show = msg.edit_text if msg else update.message.reply_text
+    snapshots = await xui_nodes.snapshots()
     
-    if not inbounds:
-        await msg.edit_text("No users found or connection failed.")
+    if not any(snapshot for _, snapshot in snapshots):
+        await show("No users found or connection failed.")
         return
 
-    keyboard = []
-    found_users = False
-    
-    for inbound in inbounds:
-        try:
-            settings = json.loads(inbound.get('settings', '{}'))
-            clients = settings.get('clients', [])
-            
-            # Check for clientStats (3x-ui / MHSanaei often puts stats here)
-            client_stats = {c.get('email'): c for c in inbound.get('clientStats', [])}
-            
-            for client in clients:
-                found_users = True
-                email = client.get('email', 'No Name')
-                uuid_str = client.get('id')
-                enable = client.get('enable', True)
-                status_icon = "🟢" if enable else "🔴"
-                
-                # Check metrics in client object or clientStats
-                up = client.get('up', 0)
-                down = client.get('down', 0)
-                
-                # If 0, try clientStats
-                if up == 0 and down == 0 and email in client_stats:
-                    stat = client_stats[email]
-                    up = stat.get('up', 0)
-                    down = stat.get('down', 0)
-
-                button_text = f"{status_icon} {email}"
-                keyboard.append([InlineKeyboardButton(button_text, callback_data=f"xui_u_{uuid_str}")])
-                
-        except Exception as e:
-            logger.error(f"Error parsing inbound {inbound.get('id')}: {e}")
-            
-    if not found_users:
-        await msg.edit_text("No clients found in any inbound.")
+    if not any(len(snapshot.index) for _, snapshot in snapshots if snapshot):
+        await show("No clients found in any inbound.")
         return
         
-    reply_markup = InlineKeyboardMarkup(keyboard)
-    await msg.edit_text("📂 <b>Select a User:</b>", reply_markup=reply_markup, parse_mode='HTML')
+    text, reply_markup, page = render_user_page(snapshots, 0)
+    context.user_data['xui_page'] = page
+    await show(text, reply_markup=reply_markup, parse_mode='HTML')
 
 
+@timed()
 async def xui_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     query = update.callback_query
     await query.answer()
@@ -88,9 +175,11 @@ async def xui_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYP
     
     if data.startswith("xui_u_"):
         # Show User Details
-        uuid_str = data.split("xui_u_")[1]
+        ref = data.split("xui_u_")[1]
+        node, uuid_str = await resolve_ref(ref)
         
-        result = xui_client.find_client_by_uuid(uuid_str)
+        snapshot = await node.cache.get_snapshot()
+        result = snapshot.find_client(uuid_str) if snapshot and uuid_str else None
         if not result:
             await query.edit_message_text("❌ Client not found (might have been deleted).")
             return
@@ -100,16 +189,8 @@ async def xui_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYP
         enable = client.get('enable', True)
         status = "Active 🟢" if enable else "Disabled 🔴"
         
-        # Traffic Stats
-        up = client.get('up', 0)
-        down = client.get('down', 0)
-        
-        # Try clientStats if 0
-        client_stats = {c.get('email'): c for c in inbound.get('clientStats', [])}
-        if up == 0 and down == 0 and email in client_stats:
-             stat = client_stats[email]
-             up = stat.get('up', 0)
-             down = stat.get('down', 0)
+        # Traffic Stats (client object, falling back to clientStats)
+        up, down = snapshot.index.traffic(client)
              
         total = up + down
         quota = client.get('totalGB', 0)
@@ -117,7 +198,9 @@ async def xui_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYP
         stats_text = (
             f"👤 <b>User:</b> {html.escape(email)}\n"
             f"🆔 <b>UUID:</b> <code>{uuid_str}</code>\n"
-            f"📡 <b>Status:</b> {status}\n\n"
+            f"📡 <b>Status:</b> {status}\n"
+            + (f"🌐 <b>Node:</b> {html.escape(node.name)}\n" if len(xui_nodes) > 1 else "")
+            + "\n"
             f"📊 <b>Traffic Usage:</b>\n"
             f"   🔼 Upload: {bytes_to_readable(up)}\n"
             f"   🔽 Download: {bytes_to_readable(down)}\n"
@@ -126,10 +209,14 @@ async def xui_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYP
         
         if quota > 0:
              stats_text += f"   ⛔ Quota: {bytes_to_readable(quota)}\n"
+
+        expiry = client.get('expiryTime', 0) or 0
+        if expiry > 0:
+             stats_text += f"   ⏰ Expires: {time.strftime('%Y-%m-%d %H:%M', time.localtime(expiry / 1000))}\n"
              
         keyboard = [
-            [InlineKeyboardButton("🔗 Get Link", callback_data=f"xui_l_{uuid_str}")],
-            [InlineKeyboardButton("❌ Delete User", callback_data=f"xui_d_{uuid_str}")],
+            [InlineKeyboardButton("🔗 Get Link", callback_data=f"xui_l_{ref}")],
+            [InlineKeyboardButton("❌ Delete User", callback_data=f"xui_d_{ref}")],
             [InlineKeyboardButton("🔙 Back to List", callback_data="xui_list")]
         ]
         
@@ -137,40 +224,47 @@ async def xui_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYP
         
     elif data.startswith("xui_l_"):
         # Get Link
-        uuid_str = data.split("xui_l_")[1]
-        result = xui_client.find_client_by_uuid(uuid_str)
+        node, uuid_str = await resolve_ref(data.split("xui_l_")[1])
+        result = await node.cache.find_client_by_uuid(uuid_str) if uuid_str else None
         if not result:
             await query.message.reply_text("❌ Client not found.")
             return
             
         inbound, client = result
         email = client.get('email', 'No Name')
-        host_ip = HOME_IP if HOME_IP else "YOUR_IP"
-        
-        link = xui_client.generate_vless_link(inbound, uuid_str, email, host_ip)
+        snapshot = await node.cache.get_snapshot()
+        link = snapshot.link(inbound.get('id'), client, link_host(node)) if snapshot else None
+        if not link:
+            await query.message.reply_text(f"❌ No share link for {html.escape(inbound.get('protocol', '?'))} inbounds.")
+            return
         escaped_link = html.escape(link)
         
         await query.message.reply_text(
-            f"🔗 <b>Link for {html.escape(email)}:</b>\n<code>{escaped_link}</code>",
+            f"🔗 <b>Link for {html.escape(email)}:</b>\n<code>{escaped_link}</code>"
+            + subscription_line(node, client),
             parse_mode='HTML'
         )
         
     elif data.startswith("xui_d_"):
         # Delete User Confirmation
-        uuid_str = data.split("xui_d_")[1]
+        ref = data.split("xui_d_")[1]
         
         keyboard = [
-            [InlineKeyboardButton("✅ Yes, Delete", callback_data=f"xui_dc_{uuid_str}")],
-            [InlineKeyboardButton("🚫 Cancel", callback_data=f"xui_u_{uuid_str}")]
+            [InlineKeyboardButton("✅ Yes, Delete", callback_data=f"xui_dc_{ref}")],
+            [InlineKeyboardButton("🚫 Cancel", callback_data=f"xui_u_{ref}")]
         ]
         await query.edit_message_text("❓ <b>Are you sure you want to delete this user?</b>", reply_markup=InlineKeyboardMarkup(keyboard), parse_mode='HTML')
 
     elif data.startswith("xui_dc_"):
         # Confirmed Delete
-        uuid_str = data.split("xui_dc_")[1]
+        node, uuid_str = await resolve_ref(data.split("xui_dc_")[1])
+        if not uuid_str:
+            await query.edit_message_text("❌ Client not found (might have been deleted).")
+            return
         
-        await query.edit_message_text("⏳ Deleting...")
-        result = xui_client.delete_client_by_uuid(uuid_str)
+        # Progress edit in the background; the limiter merges it with the result if it hasn't gone out yet
+        edit_later(query.message, "⏳ Deleting...")
+        result = await node.cache.delete_client_by_uuid(uuid_str)
         
         if result['success']:
             await query.edit_message_text("✅ User deleted successfully.")
@@ -178,51 +272,73 @@ async def xui_callback_handler(update: Update, context: ContextTypes.DEFAULT_TYP
         else:
             await query.edit_message_text(f"❌ Failed to delete: {result['msg']}")
             
-    elif data == "xui_list":
-        # Back to List - re-run list handler logic locally
-        inbounds = xui_client.get_inbounds()
-        if not inbounds:
+    elif data.startswith("xui_bx_"):
+        # Confirmed bulk action from /cleanup
+        action = {"xui_bx_d": "delete", "xui_bx_x": "disable"}.get(data)
+        node_name, targets = context.user_data.pop('xui_bulk', (None, []))
+        node = xui_nodes.get(node_name)
+        if not action or not targets or not node:
+            await query.edit_message_text("🚫 Cancelled.")
+            return
+
+        edit_later(query.message, f"⏳ Applying {action} to {len(targets)} users...")
+        result = await node.cache.bulk_update_clients(targets, action)
+        icon = "✅" if result['success'] else "⚠️"
+        await query.edit_message_text(f"{icon} {result['msg']}.")
+
+    elif data == "xui_list" or data.startswith("xui_p_"):
+        # User browser page; "Back to List" returns to the last page viewed
+        if data.startswith("xui_p_"):
+            page = int(data.split("xui_p_")[1])
+        else:
+            page = context.user_data.get('xui_page', 0)
+
+        snapshots = await xui_nodes.snapshots()
+        if not any(snapshot and len(snapshot.index) for _, snapshot in snapshots):
              await query.edit_message_text("No users found.")
              return
 
-        keyboard = []
-        for inbound in inbounds:
-            try:
-                settings = json.loads(inbound.get('settings', '{}'))
-                clients = settings.get('clients', [])
-                 # Check for clientStats (3x-ui / MHSanaei often puts stats here)
-                client_stats = {c.get('email'): c for c in inbound.get('clientStats', [])}
-
-                for client in clients:
-                    email = client.get('email', 'No Name')
-                    uuid_str = client.get('id')
-                    enable = client.get('enable', True)
-                    status_icon = "🟢" if enable else "🔴"
-                    keyboard.append([InlineKeyboardButton(f"{status_icon} {email}", callback_data=f"xui_u_{uuid_str}")])
-            except: pass
-            
-        reply_markup = InlineKeyboardMarkup(keyboard)
-        await query.edit_message_text("📂 <b>Select a User:</b>", reply_markup=reply_markup, parse_mode='HTML')
+        text, reply_markup, page = render_user_page(snapshots, page)
+        context.user_data['xui_page'] = page
+        await query.edit_message_text(text, reply_markup=reply_markup, parse_mode='HTML')
+
+def pick_inbound(snapshot):
+    """
+    Picks the inbound new users are added to: the first enabled inbound that can produce share links,
+    preferring vless/vmess. Returns (inbound, template), or (None, None).
+    """
+    candidates = []
+    for i in snapshot.inbounds if snapshot else []:
+        template = snapshot.link_template(i.get('id'))
+        if template and i.get('enable', True):
+            candidates.append((i, template))
+    for i, template in candidates:
+        if template.protocol in ('vless', 'vmess'):
+            return i, template
+    return candidates[0] if candidates else (None, None)
 
 @restricted
 async def add_user_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     if not context.args:
-        await update.message.reply_text("Usage: /add <name>")
+        await update.message.reply_text("Usage: /add <name> [quota GB] [days]")
         return
     
     name = context.args[0]
+    try:
+        quota_gb = float(context.args[1]) if len(context.args) > 1 else 0
+        days = float(context.args[2]) if len(context.args) > 2 else 0
+    except ValueError:
+        await update.message.reply_text("Usage: /add <name> [quota GB] [days]")
+        return
+    total_bytes = int(quota_gb * 1024 ** 3)
+    expiry_ms = int((time.time() + days * 86400) * 1000) if days > 0 else 0
+
+    node = active_node(context)
     msg = await update.message.reply_text(f"Adding user '{name}'...")
     
     # 1. Find a suitable inbound (prefer vless/vmess)
-    inbounds = xui_client.get_inbounds()
-    target_inbound = None
-    if inbounds:
-        for i in inbounds:
-            if i.get('protocol') in ['vless', 'vmess']:
-                target_inbound = i
-                break
-        if not target_inbound:
-             target_inbound = inbounds[0]
+    snapshot = await node.cache.get_snapshot()
+    target_inbound, template = pick_inbound(snapshot)
     
     if not target_inbound:
         await msg.edit_text("❌ No inbounds found. Please create an inbound in the panel first.")
@@ -232,19 +348,192 @@ async def add_user_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
     client_uuid = str(uuid.uuid4())
     
     # 2. Add client to inbound
-    result = xui_client.add_client(inbound_id, name, client_uuid)
+    result = await node.cache.add_client(inbound_id, name, client_uuid, total_bytes=total_bytes, expiry_ms=expiry_ms,
+                                         protocol=template.protocol, flow=template.default_flow,
+                                         method=template.ss_method)
     
     if result['success']:
-        host_ip = HOME_IP if HOME_IP else "YOUR_IP"
-        link = xui_client.generate_vless_link(target_inbound, client_uuid, name, host_ip)
-        import html
+        link = template.build(result['client'], link_host(node))
         escaped_link = html.escape(link)
         
         await msg.edit_text(
             f"✅ User <b>{html.escape(name)}</b> added!\n"
             f"UUID: <code>{client_uuid}</code>\n\n"
-            f"🔗 <b>Link:</b>\n<code>{escaped_link}</code>",
+            f"🔗 <b>Link:</b>\n<code>{escaped_link}</code>"
+            + subscription_line(node, result['client']),
             parse_mode='HTML'
         )
     else:
         await msg.edit_text(f"❌ Failed: {result['msg']}")
+
+def parse_bulk_names(text: str):
+    """
+    Reads names from command arguments or an uploaded text/CSV file.
+    Takes the first column of each line, skipping blanks, a 'name'/'email' header and duplicates.
+    """
+    names = []
+    seen = set()
+    for row in csv.reader(io.StringIO(text)):
+        if not row:
+            continue
+        name = row[0].strip()
+        if not name or name.lower() in ('name', 'email') or name in seen:
+            continue
+        seen.add(name)
+        names.append(name)
+    return names
+
+@restricted
+async def add_bulk_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    document = update.message.document
+    if document:
+        file = await document.get_file()
+        text = (await file.download_as_bytearray()).decode('utf-8', errors='replace')
+    else:
+        text = "\n".join(context.args or [])
+
+    names = parse_bulk_names(text)
+    if not names:
+        await update.message.reply_text(
+            "Usage: /addbulk <name1> <name2> ...\nOr upload a .txt/.csv file (one name per line) with caption /addbulk"
+        )
+        return
+
+    node = active_node(context)
+    msg = await update.message.reply_text(f"Adding {len(names)} users...")
+
+    snapshot = await node.cache.get_snapshot()
+    target_inbound, template = pick_inbound(snapshot)
+    if not target_inbound:
+        await msg.edit_text("❌ No inbounds found. Please create an inbound in the panel first.")
+        return
+
+    # The panel rejects a whole addClient batch if any email already exists
+    existing = snapshot.index.emails()
+    skipped = [n for n in names if n in existing]
+    names = [n for n in names if n not in existing]
+    if not names:
+        await msg.edit_text(f"❌ All {len(skipped)} names already exist.")
+        return
+
+    result = await node.cache.add_clients(target_inbound.get('id'), names,
+                                          protocol=template.protocol, flow=template.default_flow,
+                                          method=template.ss_method)
+    added = result['clients']
+
+    host_ip = link_host(node)
+    lines = [template.build(c, host_ip) for c in added]
+
+    summary = f"✅ Added {len(added)}/{len(names)} users."
+    if skipped:
+        summary += f"\n⏭ Skipped {len(skipped)} existing."
+    if not result['success']:
+        summary += f"\n❌ Failed: {html.escape(result['msg'])}"
+    await msg.edit_text(summary, parse_mode='HTML')
+
+    if lines:
+        await update.message.reply_document(
+            document=io.BytesIO(("\n".join(lines) + "\n").encode()),
+            filename=f"links_{len(lines)}.txt",
+            caption=f"🔗 {len(lines)} links"
+        )
+
+@restricted
+async def cleanup_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Lists expired / over-quota users and offers to delete or disable them in one batch.
+    """
+    node = active_node(context)
+    msg = await update.message.reply_text("Checking users...")
+    snapshot = await node.cache.get_snapshot(force=True)
+    if not snapshot:
+        await msg.edit_text("No users found or connection failed.")
+        return
+
+    exhausted = snapshot.index.find_exhausted(int(time.time() * 1000))
+    if not exhausted:
+        await msg.edit_text("✅ No expired or over-quota users.")
+        return
+
+    context.user_data['xui_bulk'] = (node.name, [client_key(client) for _, client, _ in exhausted])
+
+    lines = [f"{'🟢' if c.get('enable', True) else '🔴'} {html.escape(c.get('email', 'No Name'))} ({reason})"
+             for _, c, reason in exhausted[:30]]
+    if len(exhausted) > 30:
+        lines.append(f"... and {len(exhausted) - 30} more")
+
+    keyboard = [
+        [InlineKeyboardButton(f"🗑 Delete {len(exhausted)}", callback_data="xui_bx_d"),
+         InlineKeyboardButton(f"⏸ Disable {len(exhausted)}", callback_data="xui_bx_x")],
+        [InlineKeyboardButton("🚫 Cancel", callback_data="xui_bx_c")]
+    ]
+    await msg.edit_text(
+        f"⏰ <b>{len(exhausted)} expired / over-quota users:</b>\n" + "\n".join(lines),
+        reply_markup=InlineKeyboardMarkup(keyboard), parse_mode='HTML'
+    )
+
+@restricted
+async def nodes_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    /nodes lists every panel with its reachability; /nodes <name> selects the node for add/cleanup.
+    """
+    if context.args:
+        node = xui_nodes.get(context.args[0])
+        if not node:
+            await update.message.reply_text(f"❌ Unknown node. Available: {', '.join(n.name for n in xui_nodes)}")
+            return
+        context.user_data['xui_node'] = node.name
+        await update.message.reply_text(f"✅ Active node: {node.name}")
+        return
+
+    current = active_node(context)
+    lines = ["🌐 <b>Nodes:</b>"]
+    for node, snapshot in await xui_nodes.snapshots():
+        marker = " ⭐" if node is current else ""
+        if snapshot:
+            lines.append(f"🟢 {html.escape(node.name)}: {len(snapshot.inbounds)} inbounds, {len(snapshot.index)} users{marker}")
+        else:
+            lines.append(f"🔴 {html.escape(node.name)}: unreachable{marker}")
+    lines.append("\nUse /nodes &lt;name&gt; to choose where users are added.")
+    await update.message.reply_text("\n".join(lines), parse_mode='HTML')
+
+@restricted
+async def find_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    if not context.args:
+        await update.message.reply_text("Usage: /find <part of name>")
+        return
+
+    text = " ".join(context.args)
+    matches = await xui_nodes.search(text, limit=XUI_PAGE_SIZE)
+    if not matches:
+        await update.message.reply_text("No matching users.")
+        return
+
+    keyboard = [[user_button(node, client)] for node, _, client in matches]
+    await update.message.reply_text(
+        f"🔎 <b>{len(matches)} match(es) for</b> {html.escape(text)}:",
+        reply_markup=InlineKeyboardMarkup(keyboard), parse_mode='HTML'
+    )
+
+@restricted
+async def export_handler(update: Update, context: ContextTypes.DEFAULT_TYPE):
+    """
+    Sends every user's share link on the active node as a text file.
+    """
+    node = active_node(context)
+    snapshot = await node.cache.get_snapshot()
+    if not snapshot:
+        await update.message.reply_text("No users found or connection failed.")
+        return
+
+    links = snapshot.all_links(link_host(node))
+    if not links:
+        await update.message.reply_text("No exportable users.")
+        return
+
+    body = "".join(f"{link}\n" for _, link in links)
+    await update.message.reply_document(
+        document=io.BytesIO(body.encode()),
+        filename=f"links_{node.name}.txt",
+        caption=f"🔗 {len(links)} links from {node.name}"
+    )
@@ -1,12 +1,39 @@
+import time
+# Startup phases are measured from here (see the "Startup:" log line)
+STARTED = time.perf_counter()
+
+import hashlib
 import logging
-from telegram.ext import ApplicationBuilder, CommandHandler, MessageHandler, filters
-from config import TOKEN
+from urllib.parse import urlparse
+from telegram.ext import Application, ApplicationBuilder, CommandHandler, MessageHandler, filters
+from config import (TOKEN, ALLOWED_IDS, ALERT_INTERVAL, PERF_METRICS_LISTEN, PERF_METRICS_PORT, TG_GLOBAL_RATE, TG_CHAT_RATE,
+                    TG_CHAT_BURST, TG_GROUP_RATE_PER_MIN, TG_MAX_RETRIES, WEBHOOK_URL, WEBHOOK_LISTEN, WEBHOOK_PORT,
+                    WEBHOOK_PATH, WEBHOOK_SECRET, UPDATE_WORKERS, UPDATE_MAX_PENDING)
+from utils.perf import perf, timed
+from utils.timed_request import TimedRequest
+from utils.rate_limiter import OutboundRateLimiter
+from utils.update_processor import ChatOrderedUpdateProcessor
 from utils.logger import setup_logger
 from handlers.general import start, help_command
-from handlers.system import system_status_handler
-from handlers.xui import xui_help_handler, list_users_handler, add_user_handler, xui_callback_handler
+from handlers.system import system_status_handler, processes_handler, stats_sampler, alert_monitor, service_watchdog, process_table, port_monitor, inbounds_load_handler, perf_handler
+from handlers.xui import xui_help_handler, list_users_handler, add_user_handler, add_bulk_handler, cleanup_handler, nodes_handler, find_handler, export_handler, xui_callback_handler, xui_nodes, make_quota_enforcers, subscription_server
+from handlers.traffic import top_handler, usage_handler, traffic_collector, traffic_store
 from telegram.ext import CallbackQueryHandler
 
+IMPORTED = time.perf_counter()
+
+class BotApplication(Application):
+    """
+    Application with a `post_start` hook: run_polling / run_webhook start the updater before
+    calling start(), so the hook runs once updates are being served.
+    """
+    post_start = None
+
+    async def start(self) -> None:
+        await super().start()
+        if self.post_start:
+            await self.post_start(self)
+
 def main():
     setup_logger()
     
@@ -14,7 +41,93 @@ def main():
         print("Error: TELEGRAM_BOT_TOKEN not found in .env")
         return
 
-    application = ApplicationBuilder().token(TOKEN).read_timeout(30).write_timeout(30).connect_timeout(30).build()
+    logger = logging.getLogger(__name__)
+    metrics_server = None
+    if PERF_METRICS_PORT:
+        from services.metrics_server import MetricsServer
+        metrics_server = MetricsServer(perf, PERF_METRICS_LISTEN, PERF_METRICS_PORT)
+    quota_enforcers = []
+    # perf_counter() at the end of each startup phase
+    marks = {}
+
+    async def report_startup(application):
+        ready = time.perf_counter()
+        perf.observe("startup", ready - STARTED)
+        logger.info(
+            f"Startup: imports {(IMPORTED - STARTED) * 1000:.0f} ms, setup {(marks['setup'] - IMPORTED) * 1000:.0f} ms, "
+            f"initialize {(marks['initialize'] - marks['setup']) * 1000:.0f} ms, "
+            f"services {(marks['services'] - marks['initialize']) * 1000:.0f} ms, "
+            f"{'webhook' if WEBHOOK_URL else 'polling'} {(ready - marks['services']) * 1000:.0f} ms; "
+            f"ready in {(ready - STARTED) * 1000:.0f} ms"
+        )
+
+    async def post_init(application):
+        marks['initialize'] = time.perf_counter()
+        # Background jobs need the running event loop
+        stats_sampler.start()
+        service_watchdog.start()
+        process_table.start()
+        if port_monitor:
+            port_monitor.start()
+        if traffic_collector:
+            traffic_collector.start()
+        # Building the enforcers creates each node's panel client, so it waits for the event loop too
+        quota_enforcers.extend(make_quota_enforcers())
+        for node, enforcer in zip(xui_nodes, quota_enforcers):
+            async def notify_enforced(targets, result, node_name=node.name):
+                names = ", ".join(c.get('email', '?') for _, c, _ in targets[:20])
+                more = f" (+{len(targets) - 20} more)" if len(targets) > 20 else ""
+                for chat_id in ALLOWED_IDS:
+                    try:
+                        await application.bot.send_message(chat_id, f"⛔ Enforcement on {node_name}: {result['msg']}.\n{names}{more}")
+                    except Exception as e:
+                        logger.warning(f"Could not notify {chat_id}: {e}")
+            enforcer.on_enforced = notify_enforced
+            enforcer.start()
+        if subscription_server:
+            await subscription_server.start()
+        if metrics_server:
+            await metrics_server.start()
+        marks['services'] = time.perf_counter()
+
+    async def post_shutdown(application):
+        await stats_sampler.stop()
+        await service_watchdog.stop()
+        await process_table.stop()
+        if port_monitor:
+            await port_monitor.stop()
+        if subscription_server:
+            await subscription_server.stop()
+        if metrics_server:
+            await metrics_server.stop()
+        for enforcer in quota_enforcers:
+            await enforcer.stop()
+        if traffic_collector:
+            await traffic_collector.stop()
+            traffic_store.close()
+        # Release the pooled panel connections
+        await xui_nodes.close()
+
+    # Bot API calls go through TimedRequest so /perf shows Telegram latency; long polling is left out
+    application = (
+        ApplicationBuilder().application_class(BotApplication).token(TOKEN)
+        .get_updates_read_timeout(30).get_updates_write_timeout(30).get_updates_connect_timeout(30)
+        .request(TimedRequest(connection_pool_size=256, read_timeout=30, write_timeout=30, connect_timeout=30))
+        # Every send/edit passes through token buckets, edit coalescing and RetryAfter handling
+        .rate_limiter(OutboundRateLimiter(TG_GLOBAL_RATE, TG_CHAT_RATE, TG_CHAT_BURST, TG_GROUP_RATE_PER_MIN, TG_MAX_RETRIES))
+        # Handlers run concurrently across chats, in order within each chat (keeps the ping conversation
+        # and the xui_d_ -> xui_dc_ confirmation consistent)
+        .concurrent_updates(ChatOrderedUpdateProcessor(UPDATE_WORKERS, UPDATE_MAX_PENDING))
+        .post_init(post_init).post_shutdown(post_shutdown).build()
+    )
+    application.post_start = report_startup
+
+    # Alerts run on the job queue (needs python-telegram-bot[job-queue])
+    if alert_monitor:
+        if application.job_queue:
+            application.job_queue.run_repeating(alert_monitor.make_job(ALLOWED_IDS), interval=ALERT_INTERVAL, first=ALERT_INTERVAL)
+        else:
+            logger.warning("Job queue unavailable; install python-telegram-bot[job-queue] to enable alerts")
 
     # General
     application.add_handler(CommandHandler("start", start))
@@ -25,19 +138,21 @@ def main():
     from telegram.ext import ConversationHandler
     PING_STATE = 1
     
+    @timed()
     async def start_ping(update, context):
         await update.message.reply_text("Please enter the IP address or Hostname to ping:", parse_mode='Markdown')
         return PING_STATE
 
+    @timed()
     async def handle_ping_input(update, context):
         ip = update.message.text
-        msg = await update.message.reply_text(f"Pinging {ip} (10 packets)... please wait.")
-        # Run ping with count=10
-        from services.system_monitor import ping_host
-        result = ping_host(ip, count=10)
-        await msg.edit_text(result)
+        msg = await update.message.reply_text(f"Pinging {ip} (10 packets)...")
+        # Run ping with count=10, streaming replies into the message
+        from handlers.system import stream_ping_to_message
+        await stream_ping_to_message(msg, ip, count=10)
         return ConversationHandler.END
 
+    @timed()
     async def cancel_ping(update, context):
         await update.message.reply_text("Ping cancelled.")
         return ConversationHandler.END
@@ -54,13 +169,15 @@ def main():
     )
 
     async def error_handler(update, context):
-        logger = logging.getLogger(__name__)
         logger.error(msg="Exception while handling an update:", exc_info=context.error)
         
     application.add_error_handler(error_handler)
 
     application.add_handler(ping_conv_handler)
     application.add_handler(MessageHandler(filters.Regex("^🖥 System Status$"), system_status_handler))
+    application.add_handler(CommandHandler("procs", processes_handler))
+    application.add_handler(CommandHandler("inbounds", inbounds_load_handler))
+    application.add_handler(CommandHandler("perf", perf_handler))
     
     # X-UI
     # X-UI
@@ -68,6 +185,7 @@ def main():
     application.add_handler(MessageHandler(filters.Regex("^👥 List Users$"), list_users_handler))
     application.add_handler(MessageHandler(filters.Regex("^🔙 Back$"), start))
     
+    @timed()
     async def add_prompt(update, context):
         await update.message.reply_text("To add a user, send:\n`/add <name>`", parse_mode='Markdown')
         
@@ -75,12 +193,34 @@ def main():
 
     application.add_handler(CommandHandler("users", list_users_handler))
     application.add_handler(CommandHandler("add", add_user_handler))
+    application.add_handler(CommandHandler("addbulk", add_bulk_handler))
+    application.add_handler(CommandHandler("cleanup", cleanup_handler))
+    application.add_handler(CommandHandler("nodes", nodes_handler))
+    application.add_handler(CommandHandler("find", find_handler))
+    application.add_handler(CommandHandler("export", export_handler))
+    application.add_handler(CommandHandler("top", top_handler))
+    application.add_handler(CommandHandler("usage", usage_handler))
+    # Bulk add from an uploaded .txt/.csv file with caption /addbulk
+    application.add_handler(MessageHandler(
+        (filters.Document.TXT | filters.Document.FileExtension("csv")) & filters.CaptionRegex(r"^/addbulk"),
+        add_bulk_handler
+    ))
     
     # Callback Handler for X-UI Interactive Menu
     application.add_handler(CallbackQueryHandler(xui_callback_handler))
 
-    print("Bot is running...")
-    application.run_polling()
+    marks['setup'] = time.perf_counter()
+    if WEBHOOK_URL:
+        # Telegram echoes the secret in X-Telegram-Bot-Api-Secret-Token; other requests are rejected
+        secret = WEBHOOK_SECRET or hashlib.sha256(f"webhook:{TOKEN}".encode()).hexdigest()
+        print(f"Bot is running (webhook on {WEBHOOK_LISTEN}:{WEBHOOK_PORT})...")
+        application.run_webhook(
+            listen=WEBHOOK_LISTEN, port=WEBHOOK_PORT, url_path=WEBHOOK_PATH or urlparse(WEBHOOK_URL).path,
+            webhook_url=WEBHOOK_URL, secret_token=secret
+        )
+    else:
+        print("Bot is running...")
+        application.run_polling()
 
 if __name__ == '__main__':
     main()
@@ -0,0 +1,137 @@
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from services.system_monitor import check_services
+
+logger = logging.getLogger(__name__)
+
+class AlertRule:
+    """
+    Fires when `value >= threshold` for `debounce` consecutive evaluations and clears when
+    `value < clear_below` for `debounce` consecutive evaluations. The gap between the two
+    thresholds (hysteresis) keeps a value hovering around the limit from flapping.
+    """
+    def __init__(self, key: str, label: str, threshold: float, clear_below: Optional[float] = None,
+                 debounce: int = 3, unit: str = "", recovered: str = ""):
+        self.key = key
+        self.label = label
+        self.recovered = recovered
+        self.threshold = threshold
+        self.clear_below = threshold if clear_below is None else clear_below
+        self.debounce = max(1, debounce)
+        self.unit = unit
+        self.firing = False
+        self._streak = 0
+
+    def update(self, value: Optional[float]) -> Optional[bool]:
+        """
+        Feeds one observation. Returns True when the alert starts firing, False when it clears,
+        None when nothing changed. A missing value (None) leaves the state untouched.
+        """
+        if value is None:
+            return None
+        crossing = value < self.clear_below if self.firing else value >= self.threshold
+        self._streak = self._streak + 1 if crossing else 0
+        if self._streak < self.debounce:
+            return None
+        self._streak = 0
+        self.firing = not self.firing
+        return self.firing
+
+    def describe(self, firing: bool, value: float) -> str:
+        if firing:
+            if self.unit:
+                return f"🚨 ALERT: {self.label} {value:.0f}{self.unit} (limit {self.threshold:g}{self.unit})"
+            return f"🚨 ALERT: {self.label}"
+        if self.unit:
+            return f"✅ Recovered: {self.label} back to {value:.0f}{self.unit}"
+        return f"✅ Recovered: {self.recovered or self.label}"
+
+
+class AlertMonitor:
+    """
+    Evaluates alert rules and reports state changes only.
+
+    Metric rules read the StatsSampler's latest sample, so a tick costs no process spawns or
+    panel calls. Service states come from `service_check` (the watchdog's cache when one runs);
+    service and panel checks are slower probes that run at most every `probe_interval`
+    seconds; between probes their last result is reused.
+    """
+    def __init__(self, sampler, nodes, services: List[str], cpu: float = 90, ram: float = 90, disk: float = 90,
+                 hysteresis: float = 10, debounce: int = 3, probe_interval: float = 60,
+                 service_check: Callable[[List[str]], Awaitable[Dict[str, bool]]] = check_services):
+        self.sampler = sampler
+        self.service_check = service_check
+        self.nodes = nodes
+        self.services = services
+        self.probe_interval = probe_interval
+        self.rules: Dict[str, AlertRule] = {}
+        for key, label, limit in (("cpu", "CPU", cpu), ("ram", "RAM", ram), ("disk", "Disk", disk)):
+            if limit > 0:
+                self.rules[key] = AlertRule(key, label, limit, limit - hysteresis, debounce, unit="%")
+        for name in services:
+            self.rules[f"service:{name}"] = AlertRule(f"service:{name}", f"Service {name} is down", 1, debounce=debounce,
+                                                       recovered=f"Service {name} is up")
+        for node in nodes:
+            self.rules[f"panel:{node.name}"] = AlertRule(f"panel:{node.name}", f"Panel {node.name} is unreachable", 1, debounce=debounce,
+                                                          recovered=f"Panel {node.name} is reachable")
+        self._last_probe = 0.0
+        self._last_sample_ts = 0.0
+
+    async def _run_probes(self) -> Dict[str, float]:
+        """
+        Service and panel checks as 0/1 "down" values, refreshed every `probe_interval` seconds.
+        Returns {} between probes so the debounce counts probes rather than ticks.
+        """
+        if time.monotonic() - self._last_probe < self.probe_interval:
+            return {}
+        self._last_probe = time.monotonic()
+
+        values = {}
+        states = await self.service_check(self.services)
+        for name in self.services:
+            values[f"service:{name}"] = 0.0 if states.get(name) else 1.0
+        for node, status, _ in await self.nodes.fan_out(lambda node: node.client.get_server_status()):
+            values[f"panel:{node.name}"] = 0.0 if status else 1.0
+        return values
+
+    async def evaluate(self) -> List[Tuple[AlertRule, bool, float]]:
+        """
+        Runs one evaluation. Returns (rule, firing, value) for every rule whose state changed.
+        """
+        values: Dict[str, float] = {}
+        latest = self.sampler.latest()
+        # Only new samples count towards the debounce
+        if latest and latest['ts'] > self._last_sample_ts:
+            self._last_sample_ts = latest['ts']
+            values.update({key: latest[key] for key in ("cpu", "ram", "disk")})
+        values.update(await self._run_probes())
+
+        changes = []
+        for key, rule in self.rules.items():
+            value = values.get(key)
+            changed = rule.update(value)
+            if changed is not None:
+                changes.append((rule, changed, value))
+        return changes
+
+    def make_job(self, chat_ids: List[int]) -> Callable[..., Awaitable[None]]:
+        """
+        Returns a job-queue callback that evaluates the rules and messages `chat_ids` on changes.
+        """
+        async def job(context):
+            try:
+                changes = await self.evaluate()
+            except Exception as e:
+                logger.error(f"Error evaluating alerts: {e}")
+                return
+            if not changes:
+                return
+            text = "\n".join(rule.describe(firing, value) for rule, firing, value in changes)
+            for chat_id in chat_ids:
+                try:
+                    await context.bot.send_message(chat_id, text)
+                except Exception as e:
+                    logger.warning(f"Could not send alert to {chat_id}: {e}")
+        return job
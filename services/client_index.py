@@ -0,0 +1,154 @@
+import hashlib
+from array import array
+from itertools import islice
+from typing import Dict, Iterable, List, Optional, Tuple
+
+def client_key(client: Dict) -> Optional[str]:
+    """
+    Returns the panel's identifier for a client: the UUID for VLESS/VMess,
+    the password for Trojan and the email for Shadowsocks.
+    """
+    if client.get('id'):
+        return client['id']
+    # Shadowsocks clients carry a (usually empty) "method" and are addressed by email
+    if 'method' in client:
+        return client.get('email')
+    return client.get('password') or client.get('email')
+
+def short_ref(key: str) -> str:
+    """
+    Short stand-in for a client key in Telegram callback data (64 bytes max),
+    which can't hold a long email or password. Resolved with ClientIndex.resolve_ref.
+    """
+    return hashlib.sha1(key.encode()).hexdigest()[:12]
+
+
+class ClientIndex:
+    """
+    Hash indexes over the clients of one inbound snapshot.
+    uuid -> (inbound_id, client) and email -> clientStats entry.
+    """
+    def __init__(self):
+        self.by_uuid: Dict[str, Tuple[int, Dict]] = {}
+        self.stats_by_email: Dict[str, Dict] = {}
+        self._columns = None
+        # short_ref -> client key, built on the first resolve_ref
+        self._refs: Optional[Dict[str, str]] = None
+
+    @classmethod
+    def build(cls, inbounds: Iterable[Dict], clients: Dict[int, List[Dict]]) -> "ClientIndex":
+        index = cls()
+        for inbound in inbounds:
+            inbound_id = inbound.get('id')
+            for client in clients.get(inbound_id, []):
+                index.add(inbound_id, client)
+            for stat in inbound.get('clientStats') or []:
+                index.stats_by_email[stat.get('email')] = stat
+        return index
+
+    @classmethod
+    def reuse(cls, previous: "ClientIndex", inbounds: Iterable[Dict]) -> "ClientIndex":
+        """
+        Index for a snapshot whose clients are unchanged from `previous`: shares its client entries
+        and only re-indexes the traffic stats.
+        """
+        index = cls()
+        index.by_uuid = previous.by_uuid.copy()
+        if previous._refs is not None:
+            index._refs = previous._refs.copy()
+        for inbound in inbounds:
+            for stat in inbound.get('clientStats') or []:
+                index.stats_by_email[stat.get('email')] = stat
+        return index
+
+    def __len__(self) -> int:
+        return len(self.by_uuid)
+
+    def page(self, offset: int, limit: int) -> List[Tuple[int, Dict]]:
+        """
+        Returns up to `limit` (inbound_id, client) entries starting at `offset`, in panel order.
+        """
+        return list(islice(self.by_uuid.values(), offset, offset + limit))
+
+    def emails(self) -> set:
+        return {client.get('email') for _, client in self.by_uuid.values()}
+
+    def get(self, client_uuid: str) -> Optional[Tuple[int, Dict]]:
+        return self.by_uuid.get(client_uuid)
+
+    def resolve_ref(self, ref: str) -> Optional[str]:
+        """
+        Returns the client key behind a short_ref, or None if no client has it.
+        """
+        if self._refs is None:
+            self._refs = {short_ref(key): key for key in self.by_uuid}
+        return self._refs.get(ref)
+
+    def get_stats(self, email: str) -> Optional[Dict]:
+        return self.stats_by_email.get(email)
+
+    def traffic(self, client: Dict) -> Tuple[int, int]:
+        """
+        Returns (up, down) for a client.
+        Uses the client object first and falls back to clientStats (3x-ui / MHSanaei keeps them there).
+        """
+        up = client.get('up', 0)
+        down = client.get('down', 0)
+        if up == 0 and down == 0:
+            stat = self.stats_by_email.get(client.get('email'))
+            if stat:
+                up = stat.get('up', 0)
+                down = stat.get('down', 0)
+        return up, down
+
+    def columns(self) -> Tuple[List[str], array, array, array, array]:
+        """
+        Columnar view of the index: (uuids, enabled, expiry_ms, quota_bytes, used_bytes).
+        Built once per snapshot state and rebuilt only after the index changes.
+        """
+        if self._columns is None:
+            uuids = list(self.by_uuid)
+            enabled = array('b')
+            expiry = array('q')
+            quota = array('q')
+            used = array('q')
+            for _, client in self.by_uuid.values():
+                enabled.append(1 if client.get('enable', True) else 0)
+                expiry.append(int(client.get('expiryTime', 0) or 0))
+                quota.append(int(client.get('totalGB', 0) or 0))
+                used.append(int(sum(self.traffic(client))))
+            self._columns = (uuids, enabled, expiry, quota, used)
+        return self._columns
+
+    def find_exhausted(self, now_ms: int, only_enabled: bool = False) -> List[Tuple[int, Dict, str]]:
+        """
+        Returns (inbound_id, client, reason) for clients past their expiry time or traffic quota.
+        Runs as a single pass over the columnar view.
+        """
+        uuids, enabled, expiry, quota, used = self.columns()
+        result = []
+        for i, (exp, q, u, on) in enumerate(zip(expiry, quota, used, enabled)):
+            if only_enabled and not on:
+                continue
+            if 0 < exp <= now_ms:
+                reason = "expired"
+            elif 0 < q <= u:
+                reason = "over quota"
+            else:
+                continue
+            inbound_id, client = self.by_uuid[uuids[i]]
+            result.append((inbound_id, client, reason))
+        return result
+
+    def add(self, inbound_id: int, client: Dict):
+        key = client_key(client)
+        self.by_uuid[key] = (inbound_id, client)
+        self._columns = None
+        if self._refs is not None:
+            self._refs[short_ref(key)] = key
+
+    def remove(self, client_uuid: str) -> Optional[Tuple[int, Dict]]:
+        self._columns = None
+        if self._refs is not None:
+            self._refs.pop(short_ref(client_uuid), None)
+        return self.by_uuid.pop(client_uuid, None)
@@ -0,0 +1,53 @@
+import logging
+import time
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple
+
+from services.client_index import client_key
+from utils.periodic import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+class QuotaEnforcer:
+    """
+    Periodically disables (or deletes) clients that are expired or over their traffic quota.
+    Each cycle costs one inbound list fetch and at most one update per affected inbound.
+    """
+    def __init__(self, cache, interval: float = 300, action: str = "disable",
+                 on_enforced: Optional[Callable[[List[Tuple[int, Dict, str]], Dict], Awaitable[None]]] = None):
+        if action not in ("disable", "delete"):
+            raise ValueError(f"Unknown enforcement action: {action}")
+        self.cache = cache
+        self.interval = interval
+        self.action = action
+        self.on_enforced = on_enforced
+        self._loop = PeriodicTask(self._tick, self.interval, "enforcing quotas", logger)
+
+    async def run_once(self) -> Optional[Dict]:
+        """
+        Runs one enforcement cycle. Returns the bulk update result, or None if nothing was due.
+        """
+        snapshot = await self.cache.get_snapshot(force=True)
+        if not snapshot:
+            return None
+
+        # Disabling only needs to touch clients that are still enabled
+        targets = snapshot.index.find_exhausted(int(time.time() * 1000), only_enabled=(self.action == "disable"))
+        if not targets:
+            return None
+
+        result = await self.cache.bulk_update_clients(
+            [client_key(client) for _, client, _ in targets], self.action, snapshot=snapshot
+        )
+        logger.info(f"Enforcement: {result['msg']}")
+        if self.on_enforced:
+            await self.on_enforced(targets, result)
+        return result
+
+    async def _tick(self):
+        await self.run_once()
+
+    def start(self):
+        self._loop.start()
+
+    async def stop(self):
+        await self._loop.stop()
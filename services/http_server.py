@@ -0,0 +1,42 @@
+import asyncio
+from typing import Dict, Optional, Tuple
+
+# Minimal HTTP/1.1 helpers for the bot's small built-in endpoints (one request per connection).
+
+REASONS = {200: "OK", 304: "Not Modified", 404: "Not Found", 405: "Method Not Allowed", 500: "Internal Server Error",
+           503: "Service Unavailable"}
+
+async def read_request(reader: asyncio.StreamReader, timeout: float = 10) -> Optional[Tuple[str, str, Dict[str, str]]]:
+    """
+    Reads the request head. Returns (method, path without query, lowercase headers),
+    or None if the client sent nothing usable in time.
+    """
+    try:
+        head = await asyncio.wait_for(reader.readuntil(b"\r\n\r\n"), timeout=timeout)
+    except (asyncio.IncompleteReadError, asyncio.LimitOverrunError, asyncio.TimeoutError, ConnectionError):
+        return None
+
+    lines = head.decode('latin-1').split("\r\n")
+    parts = lines[0].split(" ")
+    if len(parts) != 3:
+        return None
+    method, target, _ = parts
+    headers = {}
+    for line in lines[1:]:
+        if ":" in line:
+            name, value = line.split(":", 1)
+            headers[name.strip().lower()] = value.strip()
+    return method, target.split("?", 1)[0], headers
+
+async def write_response(writer: asyncio.StreamWriter, status: int, body: bytes,
+                         headers: Optional[Dict[str, str]] = None, head_only: bool = False,
+                         content_type: str = "text/plain; charset=utf-8"):
+    lines = [f"HTTP/1.1 {status} {REASONS.get(status, '')}",
+             f"Content-Type: {content_type}",
+             f"Content-Length: {len(body)}",
+             "Connection: close"]
+    lines += [f"{k}: {v}" for k, v in (headers or {}).items()]
+    writer.write(("\r\n".join(lines) + "\r\n\r\n").encode('latin-1'))
+    if not head_only:
+        writer.write(body)
+    await writer.drain()
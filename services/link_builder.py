@@ -0,0 +1,169 @@
+import base64
+import json
+import logging
+from typing import Dict, Iterable, List, Optional, Tuple
+from urllib.parse import quote, urlencode
+
+logger = logging.getLogger(__name__)
+
+SUPPORTED_PROTOCOLS = ('vless', 'vmess', 'trojan', 'shadowsocks')
+
+def _first(value, default=''):
+    if isinstance(value, list):
+        return value[0] if value else default
+    return value if value is not None else default
+
+
+class LinkTemplate:
+    """
+    A share-link template precompiled from one inbound's streamSettings/settings.
+    All JSON decoding and transport/security handling happens once here;
+    build() only substitutes the per-client fields.
+    """
+    def __init__(self, inbound: Dict, settings: Optional[Dict] = None):
+        self.protocol = inbound.get('protocol')
+        self.port = inbound.get('port')
+        stream = json.loads(inbound.get('streamSettings') or '{}')
+        if settings is None:
+            settings = json.loads(inbound.get('settings') or '{}')
+
+        self.network = stream.get('network', 'tcp')
+        self.security = stream.get('security', 'none')
+        params = {"type": self.network}
+        params.update(self._transport_params(stream))
+        params.update(self._security_params(stream))
+        self.params = params
+
+        # Shadowsocks cipher of the inbound ("" for other protocols); sizes the client keys
+        self.ss_method = ""
+        # Vision flow only applies to VLESS over raw TCP with TLS/REALITY
+        self.default_flow = ""
+        if self.protocol == 'vless' and self.network == 'tcp' and self.security in ('tls', 'reality'):
+            self.default_flow = "xtls-rprx-vision"
+
+        if self.protocol == 'vless':
+            self._query = urlencode(dict(encryption=settings.get('decryption', 'none'), security=self.security, **params))
+        elif self.protocol == 'trojan':
+            self._query = urlencode(dict(security=self.security, **params))
+        elif self.protocol == 'vmess':
+            self._vmess = {
+                "v": "2", "port": str(self.port), "aid": "0", "scy": "auto",
+                "net": self.network, "type": params.get('headerType', 'none'),
+                "host": params.get('host', ''), "path": params.get('path', params.get('serviceName', '')),
+                "tls": self.security if self.security in ('tls', 'reality') else '',
+                "sni": params.get('sni', ''), "fp": params.get('fp', ''), "alpn": params.get('alpn', ''),
+            }
+        elif self.protocol == 'shadowsocks':
+            self.ss_method = settings.get('method', '')
+            # 2022 ciphers use "method:serverKey:userKey"
+            self._ss_server_key = settings.get('password', '') if self.ss_method.startswith('2022') else None
+        else:
+            raise ValueError(f"Unsupported protocol: {self.protocol}")
+
+    @staticmethod
+    def _transport_params(stream: Dict) -> Dict:
+        network = stream.get('network', 'tcp')
+        params = {}
+        if network == 'tcp':
+            header = (stream.get('tcpSettings') or {}).get('header') or {}
+            if header.get('type') == 'http':
+                request = header.get('request') or {}
+                params['headerType'] = 'http'
+                params['path'] = _first(request.get('path'), '/')
+                host = _first((request.get('headers') or {}).get('Host'))
+                if host:
+                    params['host'] = host
+        elif network == 'ws':
+            ws = stream.get('wsSettings') or {}
+            params['path'] = ws.get('path', '/')
+            host = ws.get('host') or (ws.get('headers') or {}).get('Host', '')
+            if host:
+                params['host'] = host
+        elif network == 'grpc':
+            grpc = stream.get('grpcSettings') or {}
+            params['serviceName'] = grpc.get('serviceName', '')
+            params['mode'] = 'multi' if grpc.get('multiMode') else 'gun'
+        elif network in ('httpupgrade', 'xhttp', 'splithttp'):
+            key = {'httpupgrade': 'httpupgradeSettings', 'xhttp': 'xhttpSettings', 'splithttp': 'splithttpSettings'}[network]
+            conf = stream.get(key) or {}
+            params['path'] = conf.get('path', '/')
+            if conf.get('host'):
+                params['host'] = conf['host']
+        return params
+
+    @staticmethod
+    def _security_params(stream: Dict) -> Dict:
+        security = stream.get('security', 'none')
+        params = {}
+        if security == 'tls':
+            tls = stream.get('tlsSettings') or {}
+            tls_settings = tls.get('settings') or {}
+            if tls.get('serverName'):
+                params['sni'] = tls['serverName']
+            params['fp'] = tls_settings.get('fingerprint', 'chrome')
+            if tls.get('alpn'):
+                params['alpn'] = ",".join(tls['alpn'])
+            if tls_settings.get('allowInsecure'):
+                params['allowInsecure'] = '1'
+        elif security == 'reality':
+            reality = stream.get('realitySettings') or {}
+            reality_settings = reality.get('settings') or {}
+            # MHSanaei keeps the public key under settings; some versions put it at the top level
+            params['pbk'] = reality_settings.get('publicKey') or reality.get('publicKey', '')
+            params['fp'] = reality_settings.get('fingerprint') or reality.get('fingerprint', 'chrome')
+            params['sni'] = _first(reality.get('serverNames'))
+            params['sid'] = _first(reality.get('shortIds'))
+            spider_x = reality_settings.get('spiderX')
+            if spider_x:
+                params['spx'] = spider_x
+        return params
+
+    def build(self, client: Dict, host: str) -> str:
+        """
+        Returns the share link for one client of this inbound.
+        """
+        remark = quote(client.get('email', ''))
+        if self.protocol == 'vless':
+            link = f"vless://{client.get('id')}@{host}:{self.port}?{self._query}"
+            flow = client.get('flow') or ''
+            if flow:
+                link += f"&flow={flow}"
+            return f"{link}#{remark}"
+        if self.protocol == 'trojan':
+            return f"trojan://{quote(client.get('password', ''), safe='')}@{host}:{self.port}?{self._query}#{remark}"
+        if self.protocol == 'vmess':
+            body = dict(self._vmess, ps=client.get('email', ''), add=host, id=client.get('id'))
+            return "vmess://" + base64.b64encode(json.dumps(body, separators=(',', ':')).encode()).decode()
+        # shadowsocks
+        if self._ss_server_key is not None:
+            user_info = f"{self.ss_method}:{self._ss_server_key}:{client.get('password', '')}"
+        else:
+            user_info = f"{self.ss_method}:{client.get('password', '')}"
+        encoded = base64.urlsafe_b64encode(user_info.encode()).decode().rstrip('=')
+        return f"ss://{encoded}@{host}:{self.port}#{remark}"
+
+
+def compile_inbound(inbound: Dict, settings: Optional[Dict] = None) -> Optional[LinkTemplate]:
+    """
+    Precompiles the link template for an inbound; returns None if it can't produce share links.
+    Pass the already-decoded settings to avoid parsing them again.
+    """
+    if inbound.get('protocol') not in SUPPORTED_PROTOCOLS:
+        return None
+    try:
+        return LinkTemplate(inbound, settings)
+    except Exception as e:
+        logger.error(f"Error compiling link template for inbound {inbound.get('id')}: {e}")
+        return None
+
+
+def build_links(templates: Dict[int, Optional[LinkTemplate]], entries: Iterable[Tuple[int, Dict]], host: str) -> List[Tuple[Dict, str]]:
+    """
+    Bulk link generation: returns (client, link) for each (inbound_id, client) entry with a usable template.
+    """
+    links = []
+    for inbound_id, client in entries:
+        template = templates.get(inbound_id)
+        if template:
+            links.append((client, template.build(client, host)))
+    return links
@@ -0,0 +1,47 @@
+import asyncio
+import logging
+from typing import Optional
+
+from services.http_server import read_request, write_response
+from utils.perf import PerfRegistry
+
+logger = logging.getLogger(__name__)
+
+class MetricsServer:
+    """
+    Serves GET /metrics in the Prometheus text format from the running event loop.
+    """
+    def __init__(self, registry: PerfRegistry, host: str = "127.0.0.1", port: int = 9108):
+        self.registry = registry
+        self.host = host
+        self.port = port
+        self._server: Optional[asyncio.AbstractServer] = None
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await read_request(reader)
+            if request is None:
+                return
+            method, target, _ = request
+            if method != "GET":
+                await write_response(writer, 405, b"Method Not Allowed\n")
+            elif target != "/metrics":
+                await write_response(writer, 404, b"Not Found\n")
+            else:
+                await write_response(writer, 200, self.registry.prometheus().encode(),
+                                     content_type="text/plain; version=0.0.4; charset=utf-8")
+        except Exception as e:
+            logger.error(f"Error serving metrics: {e}")
+        finally:
+            writer.close()
+
+    async def start(self):
+        if self._server is None:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port, limit=8192)
+            logger.info(f"Metrics endpoint listening on {self.host}:{self.port}/metrics")
+
+    async def stop(self):
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
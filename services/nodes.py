@@ -0,0 +1,131 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Dict, List, Optional, Tuple, TypeVar
+
+from services.xui_client import XUIClient
+from services.xui_cache import XUICache, InboundSnapshot
+
+logger = logging.getLogger(__name__)
+
+T = TypeVar('T')
+
+class Node:
+    """
+    One 3x-ui panel: its client, snapshot cache and the public address used in links.
+    With a `factory` instead of a client and cache, both are built on first use
+    (normally inside the running event loop, not at import time).
+    """
+    def __init__(self, name: str, client: Optional[XUIClient] = None, cache: Optional[XUICache] = None,
+                 address: str = "", factory: Optional[Callable[[], Tuple[XUIClient, XUICache]]] = None):
+        if (client is None or cache is None) and factory is None:
+            raise ValueError(f"Node {name} needs a client and cache, or a factory")
+        self.name = name
+        self.address = address
+        self._client = client
+        self._cache = cache
+        self._factory = factory
+
+    def _build(self):
+        if self._client is None or self._cache is None:
+            self._client, self._cache = self._factory()
+
+    @property
+    def built(self) -> bool:
+        return self._client is not None
+
+    @property
+    def client(self) -> XUIClient:
+        self._build()
+        return self._client
+
+    @property
+    def cache(self) -> XUICache:
+        self._build()
+        return self._cache
+
+    @property
+    def link_host(self) -> str:
+        """
+        The host put into share links for this node's clients.
+        """
+        return self.address or "YOUR_IP"
+
+
+class NodeRegistry:
+    """
+    The set of managed panels. Fan-out operations run on every node concurrently,
+    each bounded by `timeout` so one dead node doesn't hold up the rest.
+    """
+    def __init__(self, nodes: List[Node], timeout: float = 5.0):
+        if not nodes:
+            raise ValueError("At least one node is required")
+        self.nodes = nodes
+        self.timeout = timeout
+        self._by_name = {n.name: n for n in nodes}
+
+    def __iter__(self):
+        return iter(self.nodes)
+
+    def __len__(self) -> int:
+        return len(self.nodes)
+
+    @property
+    def default(self) -> Node:
+        return self.nodes[0]
+
+    def get(self, name: str) -> Optional[Node]:
+        return self._by_name.get(name)
+
+    def by_index(self, index: int) -> Optional[Node]:
+        return self.nodes[index] if 0 <= index < len(self.nodes) else None
+
+    def index_of(self, node: Node) -> int:
+        return self.nodes.index(node)
+
+    async def fan_out(self, fn: Callable[[Node], Awaitable[T]], timeout: Optional[float] = None) -> List[Tuple[Node, Optional[T], Optional[Exception]]]:
+        """
+        Runs fn(node) on every node at once. Returns (node, result, error) per node, in registry order.
+        With a single node there is nothing to wait for in parallel, so only the client's own
+        request timeout applies.
+        """
+        timeout = self.timeout if timeout is None else timeout
+        if len(self.nodes) == 1:
+            timeout = None
+
+        async def run(node: Node):
+            try:
+                return node, await asyncio.wait_for(fn(node), timeout=timeout), None
+            except Exception as e:
+                logger.warning(f"Node {node.name} failed: {e!r}")
+                return node, None, e
+
+        return await asyncio.gather(*(run(node) for node in self.nodes))
+
+    async def snapshots(self, force: bool = False) -> List[Tuple[Node, Optional[InboundSnapshot]]]:
+        """
+        Fetches (or reuses cached) snapshots from all nodes. Unreachable nodes yield None.
+        """
+        results = await self.fan_out(lambda node: node.cache.get_snapshot(force=force))
+        return [(node, snapshot) for node, snapshot, _ in results]
+
+    async def search(self, text: str, limit: int = 50) -> List[Tuple[Node, int, Dict]]:
+        """
+        Finds clients whose email contains `text` (case-insensitive) on any node.
+        Returns (node, inbound_id, client) tuples.
+        """
+        needle = text.lower()
+        matches = []
+        for node, snapshot in await self.snapshots():
+            if not snapshot:
+                continue
+            for inbound_id, client in snapshot.index.by_uuid.values():
+                if needle in str(client.get('email', '')).lower():
+                    matches.append((node, inbound_id, client))
+                    if len(matches) >= limit:
+                        return matches
+        return matches
+
+    async def close(self):
+        for node in self.nodes:
+            if node.built:
+                await node.client.close()
@@ -0,0 +1,123 @@
+import asyncio
+import logging
+import time
+from typing import Dict, Iterable, List, Tuple
+
+from utils.periodic import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+TCP_ESTABLISHED = "01"
+PROC_NET_TCP = ("/proc/net/tcp", "/proc/net/tcp6")
+
+def count_established(ports_hex: Dict[str, int], paths: Iterable[str] = PROC_NET_TCP) -> Dict[int, int]:
+    """
+    Counts ESTABLISHED TCP connections whose local port is in `ports_hex` ({"01BB": 443}).
+    Matches the hex port suffix directly, so lines for other ports cost one split and a dict lookup.
+    """
+    counts = {port: 0 for port in ports_hex.values()}
+    for path in paths:
+        try:
+            with open(path, 'r') as f:
+                next(f, None)  # header
+                for line in f:
+                    fields = line.split(None, 4)
+                    if len(fields) < 4 or fields[3] != TCP_ESTABLISHED:
+                        continue
+                    port = ports_hex.get(fields[1].rpartition(':')[2])
+                    if port is not None:
+                        counts[port] += 1
+        except FileNotFoundError:
+            continue
+    return counts
+
+
+class PortMonitor:
+    """
+    Live load per inbound of the local panel (`node`).
+
+    Every `interval` seconds it counts established connections per inbound port from /proc/net/tcp*.
+    Per-inbound throughput is the change in each inbound's up/down counters between two snapshots.
+    Each tick also asks the node's cache for its snapshot, which only calls the panel once the
+    cache's TTL has expired (and not at all while another component keeps it fresh).
+    """
+    def __init__(self, node, interval: float = 5):
+        self.node = node
+        self.interval = interval
+        self.connections: Dict[int, int] = {}
+        # inbound id -> (up bytes/s, down bytes/s) between the last two snapshots
+        self.rates: Dict[int, Tuple[float, float]] = {}
+        self.sampled_at = 0.0
+        self._ports_hex: Dict[str, int] = {}
+        self._snapshot = None
+        self._loop = PeriodicTask(self._tick, self.interval, "sampling inbound ports", logger)
+
+    @property
+    def cache(self):
+        return self.node.cache
+
+    def _update_snapshot(self):
+        snapshot = self.cache.peek()
+        if snapshot is None or snapshot is self._snapshot:
+            return
+        self._ports_hex = {f"{int(i['port']):04X}": int(i['port']) for i in snapshot.inbounds if i.get('port')}
+
+        previous = self._snapshot
+        if previous is not None:
+            elapsed = snapshot.fetched_at - previous.fetched_at
+            rates = {}
+            for inbound in snapshot.inbounds:
+                old = previous.get_inbound(inbound.get('id'))
+                if old is None or elapsed <= 0:
+                    continue
+                up = inbound.get('up', 0) - old.get('up', 0)
+                down = inbound.get('down', 0) - old.get('down', 0)
+                # Counters go backwards when traffic is reset in the panel
+                rates[inbound.get('id')] = (max(0, up) / elapsed, max(0, down) / elapsed)
+            if elapsed > 0:
+                self.rates = rates
+        self._snapshot = snapshot
+
+    def stale(self) -> bool:
+        """
+        True if the monitor hasn't sampled the cache's current snapshot yet.
+        """
+        return self._snapshot is None or self._snapshot is not self.cache.peek()
+
+    async def sample(self):
+        await self.cache.get_snapshot()
+        self._update_snapshot()
+        # The /proc scan is blocking file I/O; with thousands of connections keep it off the loop
+        self.connections = await asyncio.to_thread(count_established, self._ports_hex) if self._ports_hex else {}
+        self.sampled_at = time.monotonic()
+
+    def inbound_rows(self) -> List[Dict]:
+        """
+        Returns one row per inbound: id, remark, protocol, port, enable, connections, up/down bytes/s.
+        """
+        if self._snapshot is None:
+            return []
+        rows = []
+        for inbound in self._snapshot.inbounds:
+            port = int(inbound.get('port') or 0)
+            up, down = self.rates.get(inbound.get('id'), (None, None))
+            rows.append({
+                "id": inbound.get('id'),
+                "remark": inbound.get('remark') or f"#{inbound.get('id')}",
+                "protocol": inbound.get('protocol', '?'),
+                "port": port,
+                "enable": inbound.get('enable', True),
+                "connections": self.connections.get(port, 0),
+                "up": up,
+                "down": down,
+            })
+        return rows
+
+    async def _tick(self):
+        await self.sample()
+
+    def start(self):
+        self._loop.start()
+
+    async def stop(self):
+        await self._loop.stop()
@@ -0,0 +1,125 @@
+import asyncio
+import logging
+import os
+import threading
+import time
+from typing import Dict, List, Optional
+
+from utils.periodic import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+class ProcessInfo:
+    """
+    Latest figures for one process, plus the persistent psutil handle used to get them.
+    """
+    __slots__ = ("pid", "name", "handle", "cpu", "rss", "fds", "conns")
+
+    def __init__(self, pid: int, handle):
+        self.pid = pid
+        self.handle = handle
+        self.name = ""
+        self.cpu = 0.0
+        self.rss = 0
+        self.fds = 0
+        self.conns = 0
+
+
+class ProcessTable:
+    """
+    Incrementally maintained process table.
+
+    Each refresh lists the PIDs (a cheap /proc listing) and only creates psutil.Process handles
+    for new ones; existing handles are kept so cpu_percent(None) is a non-blocking delta since the
+    previous refresh. Connection counts need a system-wide scan and are only taken on request.
+
+    A refresh builds a new table and swaps it in with one assignment, so readers on the event loop
+    never wait for a scan.
+    """
+    SORT_KEYS = ("cpu", "rss", "fds", "conns")
+
+    def __init__(self, interval: float = 10):
+        self.interval = interval
+        self.processes: Dict[int, ProcessInfo] = {}
+        self.refreshed_at = 0.0
+        # Serializes refreshes, which run in worker threads; never taken on the event loop
+        self._lock = threading.Lock()
+        self._loop = PeriodicTask(self._tick, self.interval, "refreshing process table", logger)
+
+    def refresh(self):
+        with self._lock:
+            self._refresh()
+
+    def _refresh(self):
+        import psutil
+
+        previous = self.processes
+        processes: Dict[int, ProcessInfo] = {}
+        for pid in psutil.pids():
+            info = previous.get(pid)
+            if info is None:
+                try:
+                    info = ProcessInfo(pid, psutil.Process(pid))
+                except (psutil.NoSuchProcess, psutil.AccessDenied):
+                    continue
+            processes[pid] = info
+            try:
+                with info.handle.oneshot():
+                    info.name = info.handle.name()
+                    # The first call on a new handle primes the counter and returns 0
+                    info.cpu = info.handle.cpu_percent(None)
+                    info.rss = info.handle.memory_info().rss
+                    try:
+                        info.fds = info.handle.num_fds()
+                    except psutil.AccessDenied:
+                        info.fds = 0
+            except psutil.NoSuchProcess:
+                del processes[pid]
+            except psutil.AccessDenied:
+                pass
+        self.processes = processes
+        self.refreshed_at = time.monotonic()
+
+    def count_connections(self):
+        """
+        Sets each process's count of inet connections from one system-wide scan.
+        """
+        import psutil
+
+        counts: Dict[int, int] = {}
+        try:
+            for conn in psutil.net_connections(kind='inet'):
+                if conn.pid:
+                    counts[conn.pid] = counts.get(conn.pid, 0) + 1
+        except psutil.AccessDenied:
+            logger.warning("Not allowed to list connections; run as root for per-process counts")
+        for pid, info in self.processes.items():
+            info.conns = counts.get(pid, 0)
+
+    async def top(self, key: str = "cpu", limit: int = 10) -> List[ProcessInfo]:
+        """
+        Returns the top `limit` processes by `key` (one of SORT_KEYS).
+        Refreshes first only if the background loop isn't keeping the table current.
+        """
+        if key not in self.SORT_KEYS:
+            raise ValueError(f"Unknown sort key: {key}")
+        if time.monotonic() - self.refreshed_at > 2 * self.interval:
+            await asyncio.to_thread(self.refresh)
+        if key == "conns":
+            await asyncio.to_thread(self.count_connections)
+        return sorted(self.processes.values(), key=lambda p: getattr(p, key), reverse=True)[:limit]
+
+    def own(self) -> Optional[ProcessInfo]:
+        """
+        The bot's own process.
+        """
+        return self.processes.get(os.getpid())
+
+    async def _tick(self):
+        await asyncio.to_thread(self.refresh)
+
+    def start(self):
+        self._loop.start()
+
+    async def stop(self):
+        await self._loop.stop()
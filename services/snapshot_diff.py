@@ -0,0 +1,112 @@
+from typing import Dict, List
+
+from services.client_index import client_key
+
+class ChangeEvent:
+    """
+    Base class for the changes XUICache reports to its subscribers.
+    """
+    __slots__ = ("inbound_id",)
+
+    def __init__(self, inbound_id: int):
+        self.inbound_id = inbound_id
+
+    def __repr__(self) -> str:
+        fields = ", ".join(f"{name}={getattr(self, name)!r}" for cls in reversed(type(self).__mro__)
+                           for name in getattr(cls, '__slots__', ()) if name != 'client')
+        return f"{type(self).__name__}({fields})"
+
+
+class ClientAdded(ChangeEvent):
+    __slots__ = ("key", "client")
+
+    def __init__(self, inbound_id: int, client: Dict):
+        super().__init__(inbound_id)
+        self.key = client_key(client)
+        self.client = client
+
+
+class ClientRemoved(ChangeEvent):
+    """
+    `client` is the last known state of the removed client.
+    """
+    __slots__ = ("key", "client")
+
+    def __init__(self, inbound_id: int, client: Dict):
+        super().__init__(inbound_id)
+        self.key = client_key(client)
+        self.client = client
+
+
+class ClientToggled(ChangeEvent):
+    __slots__ = ("key", "client", "enabled")
+
+    def __init__(self, inbound_id: int, client: Dict):
+        super().__init__(inbound_id)
+        self.key = client_key(client)
+        self.client = client
+        self.enabled = bool(client.get('enable', True))
+
+
+class TrafficDelta(ChangeEvent):
+    """
+    Bytes a client used between two polls (clientStats are keyed by email).
+    Negative after the client's traffic was reset in the panel.
+    """
+    __slots__ = ("email", "up", "down")
+
+    def __init__(self, inbound_id: int, email: str, up: int, down: int):
+        super().__init__(inbound_id)
+        self.email = email
+        self.up = up
+        self.down = down
+
+
+def diff_clients(inbound_id: int, old: List[Dict], new: List[Dict]) -> List[ChangeEvent]:
+    """
+    Added, removed and enabled/disabled clients between two client lists of one inbound.
+    """
+    before = {client_key(c): c for c in old}
+    events: List[ChangeEvent] = []
+    for client in new:
+        previous = before.pop(client_key(client), None)
+        if previous is None:
+            events.append(ClientAdded(inbound_id, client))
+        elif bool(previous.get('enable', True)) != bool(client.get('enable', True)):
+            events.append(ClientToggled(inbound_id, client))
+    events.extend(ClientRemoved(inbound_id, client) for client in before.values())
+    return events
+
+
+def diff_traffic(old_inbound: Dict, new_inbound: Dict, old_stats: Dict[str, Dict]) -> List[TrafficDelta]:
+    """
+    Per-client traffic deltas of one inbound. Skipped when the inbound's own totals did not move.
+    """
+    if old_inbound.get('up') == new_inbound.get('up') and old_inbound.get('down') == new_inbound.get('down'):
+        return []
+    inbound_id = new_inbound.get('id')
+    events = []
+    for stat in new_inbound.get('clientStats') or []:
+        previous = old_stats.get(stat.get('email'))
+        up = stat.get('up', 0) - (previous.get('up', 0) if previous else 0)
+        down = stat.get('down', 0) - (previous.get('down', 0) if previous else 0)
+        if up or down:
+            events.append(TrafficDelta(inbound_id, stat.get('email'), up, down))
+    return events
+
+
+def diff_snapshots(old, new) -> List[ChangeEvent]:
+    """
+    Change events between two InboundSnapshots. Client lists are only compared for the inbounds
+    `new` had to decode again (new.changed) and for inbounds that disappeared.
+    """
+    events: List[ChangeEvent] = []
+    for inbound_id in new.changed:
+        events.extend(diff_clients(inbound_id, old.clients.get(inbound_id, []), new.clients.get(inbound_id, [])))
+    for inbound_id in old.inbounds_by_id.keys() - new.inbounds_by_id.keys():
+        events.extend(ClientRemoved(inbound_id, client) for client in old.clients.get(inbound_id, []))
+
+    for inbound in new.inbounds:
+        old_inbound = old.inbounds_by_id.get(inbound.get('id'))
+        events.extend(diff_traffic(old_inbound or {}, inbound, old.index.stats_by_email))
+    return events
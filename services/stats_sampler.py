@@ -0,0 +1,142 @@
+import logging
+import time
+from array import array
+from typing import Dict, List, Optional, Sequence
+
+from utils.periodic import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+class RingBuffer:
+    """
+    Fixed-size, array-backed history of samples.
+    One column of doubles per field plus a timestamp column; the oldest sample is overwritten when full.
+    """
+    def __init__(self, fields: Sequence[str], size: int):
+        self.fields = tuple(fields)
+        self.size = max(1, size)
+        self.timestamps = array('d', [0.0] * self.size)
+        self.columns: Dict[str, array] = {f: array('d', [0.0] * self.size) for f in self.fields}
+        self.count = 0
+        self._head = 0  # next slot to write
+
+    def __len__(self) -> int:
+        return self.count
+
+    def append(self, ts: float, values: Dict[str, float]):
+        i = self._head
+        self.timestamps[i] = ts
+        for f in self.fields:
+            self.columns[f][i] = values.get(f, 0.0)
+        self._head = (i + 1) % self.size
+        self.count = min(self.count + 1, self.size)
+
+    def latest(self) -> Optional[Dict[str, float]]:
+        if not self.count:
+            return None
+        i = (self._head - 1) % self.size
+        sample = {f: self.columns[f][i] for f in self.fields}
+        sample['ts'] = self.timestamps[i]
+        return sample
+
+    def _recent_slots(self, since: float) -> List[int]:
+        # Walk backwards from the newest sample until we leave the window
+        slots = []
+        for n in range(1, self.count + 1):
+            i = (self._head - n) % self.size
+            if self.timestamps[i] < since:
+                break
+            slots.append(i)
+        return slots
+
+    def window(self, seconds: float, now: Optional[float] = None) -> Dict[str, Dict[str, float]]:
+        """
+        Returns {field: {min, avg, max}} over the samples of the last `seconds`.
+        """
+        now = time.time() if now is None else now
+        slots = self._recent_slots(now - seconds)
+        if not slots:
+            return {}
+
+        result = {}
+        for f in self.fields:
+            col = self.columns[f]
+            values = [col[i] for i in slots]
+            result[f] = {"min": min(values), "avg": sum(values) / len(values), "max": max(values)}
+        return result
+
+
+class StatsSampler:
+    """
+    Collects host metrics in the background so status requests never wait on psutil.
+    """
+    FIELDS = ("cpu", "ram", "disk", "net_up", "net_down", "load1", "load5", "load15")
+
+    def __init__(self, interval: float = 5.0, size: int = 720, disk_path: str = '/'):
+        self.interval = interval
+        self.disk_path = disk_path
+        self.buffer = RingBuffer(self.FIELDS, size)
+        # Absolute values from the latest sample that don't belong in the history
+        self.details: Dict[str, float] = {}
+        self._last_net = None
+        self._loop = PeriodicTask(self._tick, self.interval, "sampling system stats", logger)
+
+    def sample(self) -> Dict[str, float]:
+        """
+        Takes one sample and appends it to the buffer. All psutil calls here are non-blocking.
+        """
+        import psutil
+
+        now = time.time()
+        # interval=None compares against the previous call instead of sleeping
+        cpu = psutil.cpu_percent(interval=None)
+        ram = psutil.virtual_memory()
+        disk = psutil.disk_usage(self.disk_path)
+        net = psutil.net_io_counters()
+        load1, load5, load15 = psutil.getloadavg()
+
+        net_up = net_down = 0.0
+        if self._last_net:
+            last_ts, last_sent, last_recv = self._last_net
+            elapsed = now - last_ts
+            if elapsed > 0:
+                net_up = max(0, net.bytes_sent - last_sent) / elapsed
+                net_down = max(0, net.bytes_recv - last_recv) / elapsed
+        self._last_net = (now, net.bytes_sent, net.bytes_recv)
+
+        values = {
+            "cpu": cpu,
+            "ram": ram.percent,
+            "disk": disk.percent,
+            "net_up": net_up,
+            "net_down": net_down,
+            "load1": load1,
+            "load5": load5,
+            "load15": load15,
+        }
+        self.details = {
+            "ram_used": ram.used,
+            "ram_total": ram.total,
+            "disk_used": disk.used,
+            "disk_total": disk.total,
+        }
+        self.buffer.append(now, values)
+        return values
+
+    def latest(self) -> Optional[Dict[str, float]]:
+        return self.buffer.latest()
+
+    def window(self, seconds: float) -> Dict[str, Dict[str, float]]:
+        return self.buffer.window(seconds)
+
+    async def _tick(self):
+        self.sample()
+
+    def start(self):
+        """
+        Starts the sampling loop on the running event loop.
+        """
+        self._loop.start()
+
+    async def stop(self):
+        await self._loop.stop()
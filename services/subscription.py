@@ -0,0 +1,167 @@
+import asyncio
+import base64
+import hashlib
+import hmac
+import logging
+from typing import Dict, Optional, Tuple
+from urllib.parse import unquote
+
+from services.client_index import client_key
+from services.http_server import read_request, write_response
+from utils.periodic import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+def client_secret(client: Dict) -> str:
+    """
+    The client's credential (UUID for VLESS/VMess, password for Trojan/Shadowsocks).
+    Subscription tokens are derived from it, never from the guessable email.
+    """
+    return client.get('id') or client.get('password') or ""
+
+
+class SubscriptionServer:
+    """
+    Minimal in-process HTTP server for client subscriptions: GET <path><token> returns the
+    base64-encoded share link(s) of that client. The token is an HMAC of the node name and
+    the client's credential under `secret`, so it can't be derived from anything public.
+
+    Requests are answered from the nodes' cached snapshots only, never with a panel call; a
+    background task keeps the snapshots fresh and a node without one answers 503. Bodies are
+    memoized per node until that node's cache version changes. The ETag is a hash of the body,
+    so a snapshot refresh that doesn't change a client's links still answers 304 to If-None-Match.
+    """
+    MAX_HEADER_BYTES = 8192
+    READ_TIMEOUT = 10
+
+    def __init__(self, nodes, secret: str, host: str = "0.0.0.0", port: int = 2096, path: str = "/sub/",
+                 update_hours: int = 12, refresh_interval: float = 60):
+        if not secret:
+            raise ValueError("A subscription secret is required")
+        self.nodes = nodes
+        self.secret = secret.encode()
+        self.host = host
+        self.port = port
+        self.path = "/" + path.strip("/") + "/" if path.strip("/") else "/"
+        self.update_hours = update_hours
+        # node name -> (cache version, {token: client key}, {token: (body, etag, userinfo)})
+        self._entries: Dict[str, Tuple[int, Dict[str, str], Dict[str, Tuple[bytes, str, str]]]] = {}
+        # (node name, credential) -> token, so unchanged clients aren't hashed again after a refresh
+        self._token_memo: Dict[Tuple[str, str], str] = {}
+        self._server: Optional[asyncio.AbstractServer] = None
+        self._refresher = PeriodicTask(self._refresh, refresh_interval, "refreshing subscription snapshots", logger)
+
+    def token(self, node, client: Dict) -> str:
+        """
+        The subscription token of a client on `node` (the last path segment of its URL).
+        """
+        memo_key = (node.name, client_secret(client))
+        token = self._token_memo.get(memo_key)
+        if token is None:
+            digest = hmac.new(self.secret, f"{node.name}\0{memo_key[1]}".encode(), hashlib.sha256).digest()
+            token = base64.urlsafe_b64encode(digest[:18]).decode()
+            self._token_memo[memo_key] = token
+        return token
+
+    def _node_entries(self, node, snapshot):
+        version, tokens, entries = self._entries.get(node.name, (None, None, None))
+        if version != node.cache.version:
+            tokens = {}
+            for _, client in snapshot.index.by_uuid.values():
+                if client_secret(client):
+                    tokens[self.token(node, client)] = client_key(client)
+            entries = {}
+            self._entries[node.name] = (node.cache.version, tokens, entries)
+        return tokens, entries
+
+    @staticmethod
+    def _build_entry(snapshot, inbound_id: int, client: Dict, host: str) -> Optional[Tuple[bytes, str, str]]:
+        link = snapshot.link(inbound_id, client, host)
+        if not link:
+            return None
+        body = base64.b64encode((link + "\n").encode())
+        etag = '"' + hashlib.sha1(body).hexdigest() + '"'
+        up, down = snapshot.index.traffic(client)
+        expire = int(client.get('expiryTime', 0) or 0) // 1000
+        userinfo = f"upload={up}; download={down}; total={int(client.get('totalGB', 0) or 0)}; expire={max(expire, 0)}"
+        return body, etag, userinfo
+
+    def lookup(self, token: str) -> Tuple[Optional[Tuple[bytes, str, str]], bool]:
+        """
+        Returns ((body, etag, userinfo) or None, whether every node had a snapshot to look in).
+        """
+        complete = True
+        for node in self.nodes:
+            snapshot = node.cache.peek()
+            if snapshot is None:
+                complete = False
+                continue
+            tokens, entries = self._node_entries(node, snapshot)
+            if token in entries:
+                return entries[token], complete
+            key = tokens.get(token)
+            found = snapshot.index.get(key) if key else None
+            entry = self._build_entry(snapshot, found[0], found[1], node.link_host) if found else None
+            if entry:
+                # Only hits are memoized so unknown tokens can't grow the cache
+                entries[token] = entry
+                return entry, complete
+        return None, complete
+
+    async def _refresh(self):
+        await self.nodes.snapshots()
+        # Forget the tokens of clients that are gone
+        live = {(node.name, client_secret(c)) for node in self.nodes if node.cache.peek()
+                for _, c in node.cache.peek().index.by_uuid.values()}
+        self._token_memo = {k: v for k, v in self._token_memo.items() if k in live}
+
+    async def _handle(self, reader: asyncio.StreamReader, writer: asyncio.StreamWriter):
+        try:
+            request = await read_request(reader, self.READ_TIMEOUT)
+            if request is None:
+                return
+            method, target, headers = request
+            if method not in ("GET", "HEAD"):
+                await write_response(writer, 405, b"Method Not Allowed\n")
+            elif not target.startswith(self.path) or len(target) == len(self.path):
+                await write_response(writer, 404, b"Not Found\n")
+            else:
+                entry, complete = self.lookup(unquote(target[len(self.path):]))
+                if entry is None and not complete:
+                    # A node has no snapshot yet (starting up or unreachable): the client may live there
+                    await write_response(writer, 503, b"Service Unavailable\n", {"Retry-After": "60"})
+                elif entry is None:
+                    await write_response(writer, 404, b"Not Found\n")
+                else:
+                    body, etag, userinfo = entry
+                    extra = {
+                        "ETag": etag,
+                        "Cache-Control": "no-cache",
+                        "Profile-Update-Interval": str(self.update_hours),
+                        "Subscription-Userinfo": userinfo,
+                    }
+                    if headers.get("if-none-match") == etag:
+                        await write_response(writer, 304, b"", extra, head_only=True)
+                    else:
+                        await write_response(writer, 200, body, extra, head_only=method == "HEAD")
+        except Exception as e:
+            logger.error(f"Error serving subscription request: {e}")
+            try:
+                await write_response(writer, 500, b"Internal Server Error\n")
+            except Exception:
+                pass
+        finally:
+            writer.close()
+
+    async def start(self):
+        self._refresher.start()
+        if self._server is None:
+            self._server = await asyncio.start_server(self._handle, self.host, self.port, limit=self.MAX_HEADER_BYTES)
+            logger.info(f"Subscription server listening on {self.host}:{self.port}{self.path}")
+
+    async def stop(self):
+        await self._refresher.stop()
+        if self._server is not None:
+            self._server.close()
+            await self._server.wait_closed()
+            self._server = None
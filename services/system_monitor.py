@@ -1,54 +1,152 @@
-import subprocess
+import asyncio
 import logging
+import re
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
+
+from utils.perf import perf
 
 logger = logging.getLogger(__name__)
 
-def ping_host(host: str, count: int = 1) -> str:
+# Cap on captured output per stream; anything beyond is drained and dropped
+MAX_OUTPUT_BYTES = 64 * 1024
+
+async def _read_capped(stream: asyncio.StreamReader, limit: int) -> Tuple[bytes, bool]:
+    chunks = []
+    size = 0
+    while True:
+        chunk = await stream.read(4096)
+        if not chunk:
+            break
+        if size < limit:
+            chunks.append(chunk[:limit - size])
+        size += len(chunk)
+    return b"".join(chunks), size > limit
+
+async def run_command(command: Sequence[str], timeout: float = 30, max_output: int = MAX_OUTPUT_BYTES) -> Tuple[int, str, str]:
     """
-    Pings a host and returns the result message.
+    Runs a command without blocking the event loop.
+    Returns (returncode, stdout, stderr). Kills the process and raises asyncio.TimeoutError after `timeout` seconds.
     """
+    async with perf.timer(f"cmd.{' '.join(command[:2])}"):
+        return await _run_command(command, timeout, max_output)
+
+async def _run_command(command: Sequence[str], timeout: float, max_output: int) -> Tuple[int, str, str]:
+    proc = await asyncio.create_subprocess_exec(
+        *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.PIPE
+    )
     try:
-        # -W 2: wait up to 2 seconds
-        command = ['ping', '-c', str(count), '-W', '2', host]
-        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
-        
-        if result.returncode == 0:
-            return f"✅ Ping to {host} successful!\n\n{result.stdout}"
-        else:
-            return f"❌ Ping to {host} failed.\n\n{result.stderr}"
-    except Exception as e:
-        logger.error(f"Error pinging {host}: {e}")
-        return f"⚠️ Error executing ping command: {e}"
+        (out, out_cut), (err, err_cut) = await asyncio.wait_for(
+            asyncio.gather(_read_capped(proc.stdout, max_output), _read_capped(proc.stderr, max_output)),
+            timeout=timeout
+        )
+        await asyncio.wait_for(proc.wait(), timeout=timeout)
+    except asyncio.TimeoutError:
+        proc.kill()
+        await proc.wait()
+        raise
+
+    stdout = out.decode(errors='replace') + ("\n[output truncated]" if out_cut else "")
+    stderr = err.decode(errors='replace') + ("\n[output truncated]" if err_cut else "")
+    return proc.returncode, stdout, stderr
 
-def check_service_status(service_name: str) -> bool:
+async def stream_ping(host: str, count: int = 4) -> AsyncIterator[str]:
     """
-    Checks if a systemd service is active.
+    Pings a host and yields each output line (one per packet, then the summary) as it arrives.
+    Raises asyncio.TimeoutError if ping runs past its expected duration.
     """
+    loop = asyncio.get_running_loop()
+    command = ['ping', '-c', str(count), '-W', '2', host]
+    proc = await asyncio.create_subprocess_exec(
+        *command, stdout=asyncio.subprocess.PIPE, stderr=asyncio.subprocess.STDOUT
+    )
+    deadline = loop.time() + count * 3 + 5
     try:
-        command = ['systemctl', 'is-active', service_name]
-        result = subprocess.run(command, stdout=subprocess.PIPE, stderr=subprocess.PIPE, text=True)
+        while True:
+            remaining = deadline - loop.time()
+            if remaining <= 0:
+                raise asyncio.TimeoutError()
+            line = await asyncio.wait_for(proc.stdout.readline(), timeout=remaining)
+            if not line:
+                break
+            yield line.decode(errors='replace').rstrip()
+        await proc.wait()
+    finally:
+        if proc.returncode is None:
+            proc.kill()
+            await proc.wait()
+
+_PING_LOSS_RE = re.compile(r"(\d+) packets transmitted, (\d+) (?:packets )?received.*?([\d.]+)% packet loss")
+_PING_RTT_RE = re.compile(r"= ([\d.]+)/([\d.]+)/([\d.]+)")
+
+def parse_ping_summary(output: str) -> Optional[Dict[str, float]]:
+    """
+    Extracts sent/received/loss and min/avg/max RTT (ms) from ping's summary lines.
+    Returns None if no summary was printed.
+    """
+    loss = _PING_LOSS_RE.search(output)
+    if not loss:
+        return None
+    summary = {
+        "sent": int(loss.group(1)),
+        "received": int(loss.group(2)),
+        "loss": float(loss.group(3)),
+    }
+    rtt = _PING_RTT_RE.search(output, loss.end())
+    if rtt:
+        summary.update(min=float(rtt.group(1)), avg=float(rtt.group(2)), max=float(rtt.group(3)))
+    return summary
+
+async def check_services(service_names: List[str]) -> Dict[str, bool]:
+    """
+    Checks several systemd services with a single `systemctl is-active a b c` call.
+    Returns {name: is_active}.
+    """
+    if not service_names:
+        return {}
+    try:
+        command = ['systemctl', 'is-active', *service_names]
+        returncode, stdout, stderr = await run_command(command, timeout=10)
         
-        # 'active' is the standard output for a running service
-        return result.stdout.strip() == 'active'
+        # One state per line, in the order requested; 'active' means running
+        states = stdout.split()
+        return {name: (states[i] == 'active' if i < len(states) else False) for i, name in enumerate(service_names)}
     except Exception as e:
-        logger.error(f"Error checking service {service_name}: {e}")
-        return False
+        logger.error(f"Error checking services {service_names}: {e}")
+        return {name: False for name in service_names}
 
-def get_system_stats() -> str:
+def get_system_stats(sampler, window: float = 300) -> str:
     """
-    Returns a formatted string of system stats (CPU, RAM, Disk).
+    Returns a formatted string of system stats (CPU, RAM, Disk, Network, Load)
+    from the sampler's latest sample, with min/avg/max over the last `window` seconds.
     """
     try:
-        import psutil
-        cpu_usage = psutil.cpu_percent(interval=1)
-        ram = psutil.virtual_memory()
-        disk = psutil.disk_usage('/')
-        
+        latest = sampler.latest()
+        if latest is None:
+            # Sampler hasn't ticked yet; take one sample now (non-blocking)
+            sampler.sample()
+            latest = sampler.latest()
+
+        details = sampler.details
+        summary = sampler.window(window)
+
+        def spread(field, fmt="{:.0f}"):
+            s = summary.get(field)
+            if not s:
+                return ""
+            return f" ({fmt.format(s['min'])}/{fmt.format(s['avg'])}/{fmt.format(s['max'])})"
+
+        def mbps(bytes_per_sec):
+            return bytes_per_sec * 8 / 1_000_000
+
+        minutes = int(window // 60)
         return (
             f"💻 **System Stats**:\n"
-            f"CPU: {cpu_usage}%\n"
-            f"RAM: {ram.percent}% ({ram.used // (1024*1024)}MB / {ram.total // (1024*1024)}MB)\n"
-            f"Disk: {disk.percent}% ({disk.used // (1024*1024*1024)}GB / {disk.total // (1024*1024*1024)}GB)"
+            f"CPU: {latest['cpu']}%{spread('cpu')}\n"
+            f"RAM: {latest['ram']}% ({int(details['ram_used']) // (1024*1024)}MB / {int(details['ram_total']) // (1024*1024)}MB){spread('ram')}\n"
+            f"Disk: {latest['disk']}% ({int(details['disk_used']) // (1024*1024*1024)}GB / {int(details['disk_total']) // (1024*1024*1024)}GB)\n"
+            f"Net: 🔼 {mbps(latest['net_up']):.2f} Mbps 🔽 {mbps(latest['net_down']):.2f} Mbps\n"
+            f"Load: {latest['load1']:.2f} {latest['load5']:.2f} {latest['load15']:.2f}\n"
+            f"_(min/avg/max over {minutes} min)_"
         )
     except ImportError:
         return "psutil not installed, cannot retrieve stats."
@@ -0,0 +1,178 @@
+import asyncio
+import logging
+import sqlite3
+import threading
+import time
+from typing import Dict, List, Optional, Tuple
+
+from utils.periodic import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+class TrafficStore:
+    """
+    Per-client traffic history in SQLite (WAL mode).
+
+    Raw rows hold the up/down bytes used between two collections. Rows older than `raw_hours`
+    are rolled up into hourly buckets, and hourly buckets older than `retention_days` are dropped.
+    All methods are blocking; use the async wrappers from the event loop.
+    The database is opened on first use.
+    """
+    SCHEMA = """
+        CREATE TABLE IF NOT EXISTS counters (
+            email TEXT PRIMARY KEY, up INTEGER NOT NULL, down INTEGER NOT NULL
+        );
+        CREATE TABLE IF NOT EXISTS raw (
+            ts INTEGER NOT NULL, email TEXT NOT NULL, up INTEGER NOT NULL, down INTEGER NOT NULL
+        );
+        CREATE INDEX IF NOT EXISTS raw_ts ON raw (ts);
+        CREATE INDEX IF NOT EXISTS raw_email_ts ON raw (email, ts);
+        CREATE TABLE IF NOT EXISTS hourly (
+            ts INTEGER NOT NULL, email TEXT NOT NULL, up INTEGER NOT NULL, down INTEGER NOT NULL,
+            PRIMARY KEY (email, ts)
+        );
+        CREATE INDEX IF NOT EXISTS hourly_ts ON hourly (ts);
+    """
+
+    def __init__(self, path: str, raw_hours: float = 24, retention_days: float = 30):
+        self.path = path
+        self.raw_hours = raw_hours
+        self.retention_days = retention_days
+        self._lock = threading.Lock()
+        self._conn: Optional[sqlite3.Connection] = None
+
+    @property
+    def _db(self) -> sqlite3.Connection:
+        # Only called with self._lock held
+        if self._conn is None:
+            conn = sqlite3.connect(self.path, check_same_thread=False)
+            conn.execute("PRAGMA journal_mode=WAL")
+            conn.execute("PRAGMA synchronous=NORMAL")
+            conn.executescript(self.SCHEMA)
+            self._conn = conn
+        return self._conn
+
+    def close(self):
+        with self._lock:
+            if self._conn is not None:
+                self._conn.close()
+                self._conn = None
+
+    def record(self, counters: Dict[str, Tuple[int, int]], ts: Optional[int] = None) -> int:
+        """
+        Stores the usage since the previous call, given each client's cumulative (up, down) counters.
+        A counter that went down (traffic reset in the panel) counts from zero.
+        Returns the number of clients with non-zero usage.
+        """
+        ts = int(ts if ts is not None else time.time())
+        with self._lock, self._db:
+            last = {row[0]: (row[1], row[2]) for row in self._db.execute("SELECT email, up, down FROM counters")}
+            rows = []
+            for email, (up, down) in counters.items():
+                prev_up, prev_down = last.get(email, (up, down))  # first sighting: no delta
+                d_up = up - prev_up if up >= prev_up else up
+                d_down = down - prev_down if down >= prev_down else down
+                if d_up or d_down:
+                    rows.append((ts, email, d_up, d_down))
+
+            self._db.executemany("INSERT INTO raw (ts, email, up, down) VALUES (?, ?, ?, ?)", rows)
+            self._db.executemany(
+                "INSERT OR REPLACE INTO counters (email, up, down) VALUES (?, ?, ?)",
+                [(email, up, down) for email, (up, down) in counters.items()]
+            )
+        return len(rows)
+
+    def maintain(self, now: Optional[int] = None):
+        """
+        Downsamples raw rows past `raw_hours` into hourly buckets and applies the retention policy.
+        """
+        now = int(now if now is not None else time.time())
+        raw_cutoff = int(now - self.raw_hours * 3600) // 3600 * 3600
+        keep_cutoff = int(now - self.retention_days * 86400)
+        with self._lock, self._db:
+            self._db.execute("""
+                INSERT INTO hourly (ts, email, up, down)
+                SELECT ts / 3600 * 3600 AS hour, email, SUM(up), SUM(down) FROM raw
+                WHERE ts < ? GROUP BY hour, email
+                ON CONFLICT (email, ts) DO UPDATE SET up = up + excluded.up, down = down + excluded.down
+            """, (raw_cutoff,))
+            self._db.execute("DELETE FROM raw WHERE ts < ?", (raw_cutoff,))
+            self._db.execute("DELETE FROM hourly WHERE ts < ?", (keep_cutoff,))
+
+    def top(self, since: int, limit: int = 10) -> List[Tuple[str, int, int]]:
+        """
+        Returns [(email, up, down)] of the heaviest users since `since`, by total bytes.
+        """
+        with self._lock:
+            return self._db.execute("""
+                SELECT email, SUM(up), SUM(down) FROM (
+                    SELECT email, up, down FROM raw WHERE ts >= ?
+                    UNION ALL
+                    SELECT email, up, down FROM hourly WHERE ts >= ?
+                ) GROUP BY email ORDER BY SUM(up) + SUM(down) DESC LIMIT ?
+            """, (since, since, limit)).fetchall()
+
+    def series(self, email: str, since: int, bucket: int) -> List[Tuple[int, int, int]]:
+        """
+        Returns [(bucket_start, up, down)] for one client since `since`, in `bucket`-second buckets.
+        """
+        with self._lock:
+            return self._db.execute("""
+                SELECT ts / ? * ? AS b, SUM(up), SUM(down) FROM (
+                    SELECT ts, up, down FROM raw WHERE email = ? AND ts >= ?
+                    UNION ALL
+                    SELECT ts, up, down FROM hourly WHERE email = ? AND ts >= ?
+                ) GROUP BY b ORDER BY b
+            """, (bucket, bucket, email, since, email, since)).fetchall()
+
+    async def record_async(self, counters: Dict[str, Tuple[int, int]], ts: Optional[int] = None) -> int:
+        return await asyncio.to_thread(self.record, counters, ts)
+
+    async def maintain_async(self):
+        await asyncio.to_thread(self.maintain)
+
+    async def top_async(self, since: int, limit: int = 10) -> List[Tuple[str, int, int]]:
+        return await asyncio.to_thread(self.top, since, limit)
+
+    async def series_async(self, email: str, since: int, bucket: int) -> List[Tuple[int, int, int]]:
+        return await asyncio.to_thread(self.series, email, since, bucket)
+
+
+class TrafficCollector:
+    """
+    Polls every node's inbound list at a fixed interval and records per-client usage into a TrafficStore.
+    Clients are keyed by email on the default node and by "<node>/<email>" on the others.
+    """
+    MAINTAIN_EVERY = 3600
+
+    def __init__(self, nodes, store: TrafficStore, interval: float = 60):
+        self.nodes = nodes
+        self.store = store
+        self.interval = interval
+        self._loop = PeriodicTask(self._tick, self.interval, "collecting traffic", logger)
+        self._last_maintain = 0.0
+
+    async def collect(self) -> int:
+        # Forced refresh: this poll also keeps the bot's cached snapshots warm
+        counters = {}
+        for node, snapshot in await self.nodes.snapshots(force=True):
+            if not snapshot:
+                continue
+            prefix = "" if node is self.nodes.default else f"{node.name}/"
+            for _, client in snapshot.index.by_uuid.values():
+                counters[f"{prefix}{client.get('email')}"] = snapshot.index.traffic(client)
+        if not counters:
+            return 0
+        return await self.store.record_async(counters)
+
+    async def _tick(self):
+        await self.collect()
+        if time.monotonic() - self._last_maintain >= self.MAINTAIN_EVERY:
+            await self.store.maintain_async()
+            self._last_maintain = time.monotonic()
+
+    def start(self):
+        self._loop.start()
+
+    async def stop(self):
+        await self._loop.stop()
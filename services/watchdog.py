@@ -0,0 +1,149 @@
+import asyncio
+import logging
+import time
+from typing import Dict, List, Optional
+
+from services.system_monitor import run_command
+from utils.periodic import PeriodicTask
+
+logger = logging.getLogger(__name__)
+
+class ServiceState:
+    """
+    Last known systemd state of one unit plus what the watchdog observed about it.
+    """
+    def __init__(self, name: str):
+        self.name = name
+        self.active_state = "unknown"
+        self.sub_state = ""
+        self.active_since: Optional[float] = None  # time.monotonic() when the unit became active
+        self.n_restarts = 0     # systemd's own NRestarts (Restart= policy)
+        self.transitions = 0    # active -> not active changes seen by the watchdog
+        self.auto_restarts = 0  # restarts issued by the watchdog
+        self.next_restart_at = 0.0
+        self.backoff = 0.0
+
+    @property
+    def active(self) -> bool:
+        return self.active_state == "active"
+
+    @property
+    def uptime(self) -> Optional[float]:
+        if not self.active or self.active_since is None:
+            return None
+        return max(0.0, time.monotonic() - self.active_since)
+
+
+class ServiceWatchdog:
+    """
+    Tracks systemd units with one `systemctl show` call per refresh.
+
+    A background loop refreshes every `interval` seconds, so readers get cached state without
+    spawning processes. Units listed in `auto_restart` are restarted when they stop, with an
+    exponential backoff between attempts that resets once the unit stays up.
+    """
+    PROPERTIES = "Id,ActiveState,SubState,ActiveEnterTimestampMonotonic,NRestarts"
+
+    def __init__(self, services: List[str], interval: float = 15, auto_restart: Optional[List[str]] = None,
+                 backoff: float = 30, max_backoff: float = 1800):
+        self.services = list(dict.fromkeys(services))
+        self.interval = interval
+        self.auto_restart = set(auto_restart or []) & set(self.services)
+        self.base_backoff = backoff
+        self.max_backoff = max_backoff
+        self.states: Dict[str, ServiceState] = {name: ServiceState(name) for name in self.services}
+        self.refreshed_at = 0.0
+        self._lock = asyncio.Lock()
+        self._loop = PeriodicTask(self._tick, self.interval, "in service watchdog", logger)
+
+    @staticmethod
+    def parse_show(output: str) -> List[Dict[str, str]]:
+        """
+        Splits `systemctl show` output into one property dict per unit (blocks are blank-line separated).
+        """
+        units, current = [], {}
+        for line in output.splitlines():
+            if not line.strip():
+                if current:
+                    units.append(current)
+                    current = {}
+                continue
+            key, _, value = line.partition("=")
+            current[key] = value
+        if current:
+            units.append(current)
+        return units
+
+    async def refresh(self):
+        """
+        Queries every unit in a single process and updates the cached states.
+        """
+        if not self.services:
+            return
+        async with self._lock:
+            names = [name if "." in name else f"{name}.service" for name in self.services]
+            try:
+                _, stdout, _ = await run_command(['systemctl', 'show', '-p', self.PROPERTIES, *names], timeout=10)
+            except Exception as e:
+                logger.error(f"Error querying services {self.services}: {e}")
+                return
+
+            # systemctl show prints the units in the order requested
+            for name, props in zip(self.services, self.parse_show(stdout)):
+                state = self.states[name]
+                was_active = state.active
+                state.active_state = props.get("ActiveState", "unknown")
+                state.sub_state = props.get("SubState", "")
+                try:
+                    state.n_restarts = int(props.get("NRestarts") or 0)
+                    entered = int(props.get("ActiveEnterTimestampMonotonic") or 0)
+                except ValueError:
+                    entered = 0
+                # systemd's monotonic clock is CLOCK_MONOTONIC, the same as time.monotonic() on Linux
+                state.active_since = entered / 1e6 if entered else None
+                if was_active and not state.active:
+                    state.transitions += 1
+            self.refreshed_at = time.monotonic()
+
+    async def _maybe_restart(self, state: ServiceState):
+        now = time.monotonic()
+        if state.active:
+            # Stable for a full backoff period: forget earlier failures
+            if state.backoff and state.uptime is not None and state.uptime >= state.backoff:
+                state.backoff = 0.0
+            return
+        if state.active_state in ("activating", "reloading") or now < state.next_restart_at:
+            return
+
+        state.backoff = min(self.max_backoff, state.backoff * 2 if state.backoff else self.base_backoff)
+        state.next_restart_at = now + state.backoff
+        state.auto_restarts += 1
+        logger.warning(f"Service {state.name} is {state.active_state}; restarting (next attempt in {state.backoff:.0f}s)")
+        try:
+            rc, _, stderr = await run_command(['systemctl', 'restart', state.name], timeout=60)
+            if rc != 0:
+                logger.error(f"Restarting {state.name} failed: {stderr.strip()}")
+        except Exception as e:
+            logger.error(f"Error restarting {state.name}: {e}")
+
+    async def check(self, names: Optional[List[str]] = None, max_age: Optional[float] = None) -> Dict[str, bool]:
+        """
+        Returns {name: is_active} from the cache, refreshing first only if it is older than `max_age`
+        (default: two intervals, i.e. the background loop has stalled or was never started).
+        """
+        max_age = 2 * self.interval if max_age is None else max_age
+        if time.monotonic() - self.refreshed_at > max_age:
+            await self.refresh()
+        names = self.services if names is None else names
+        return {name: self.states[name].active if name in self.states else False for name in names}
+
+    async def _tick(self):
+        await self.refresh()
+        for name in self.auto_restart:
+            await self._maybe_restart(self.states[name])
+
+    def start(self):
+        self._loop.start()
+
+    async def stop(self):
+        await self._loop.stop()
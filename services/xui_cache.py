@@ -0,0 +1,326 @@
+import asyncio
+import json
+import logging
+import time
+from typing import Callable, Dict, List, Optional, Tuple
+
+from services.xui_client import XUIClient
+from services.client_index import ClientIndex, client_key
+from services.link_builder import LinkTemplate, compile_inbound, build_links
+from services.snapshot_diff import ChangeEvent, ClientAdded, ClientRemoved, ClientToggled, diff_snapshots
+from utils.perf import perf
+
+logger = logging.getLogger(__name__)
+
+class InboundSnapshot:
+    """
+    A parsed copy of /panel/api/inbounds/list.
+    Each inbound's settings JSON is decoded and indexed exactly once per snapshot. Given the
+    previous snapshot, inbounds whose raw settings/streamSettings strings are unchanged reuse
+    its decoded clients, settings and link template instead of being decoded again.
+    """
+    def __init__(self, inbounds: List[Dict], fetched_at: float, previous: Optional["InboundSnapshot"] = None):
+        self.inbounds = inbounds
+        self.fetched_at = fetched_at
+        self.clients: Dict[int, List[Dict]] = {}
+        self.inbounds_by_id: Dict[int, Dict] = {i.get('id'): i for i in inbounds}
+        # Decoded settings without the client list, for link templates
+        self._settings: Dict[int, Dict] = {}
+        self._templates: Dict[int, Optional[LinkTemplate]] = {}
+        # inbound id -> raw strings the decoded state came from; dropped when the snapshot is patched
+        self._fingerprints: Dict[int, Tuple] = {}
+        # Inbounds decoded from scratch (all of them without a previous snapshot)
+        self.changed: set = set()
+        # Client lists still shared with the previous snapshot (copied before patching)
+        self._shared: set = set()
+
+        with perf.timer("snapshot.parse"):
+            for inbound in inbounds:
+                inbound_id = inbound.get('id')
+                fingerprint = (inbound.get('protocol'), inbound.get('port'),
+                               inbound.get('settings'), inbound.get('streamSettings'))
+                self._fingerprints[inbound_id] = fingerprint
+                if previous is not None and previous._fingerprints.get(inbound_id) == fingerprint:
+                    self.clients[inbound_id] = previous.clients[inbound_id]
+                    self._settings[inbound_id] = previous._settings[inbound_id]
+                    if inbound_id in previous._templates:
+                        self._templates[inbound_id] = previous._templates[inbound_id]
+                    self._shared.add(inbound_id)
+                    continue
+
+                self.changed.add(inbound_id)
+                try:
+                    settings = json.loads(inbound.get('settings', '{}'))
+                    self.clients[inbound_id] = settings.pop('clients', [])
+                    self._settings[inbound_id] = settings
+                except Exception as e:
+                    logger.error(f"Error parsing inbound {inbound_id}: {e}")
+                    self.clients[inbound_id] = []
+                    self._fingerprints.pop(inbound_id)
+
+            if previous is not None and not self.changed and previous.inbounds_by_id.keys() == self.inbounds_by_id.keys():
+                # Same clients in the same order: only the traffic stats need re-indexing
+                self.index = ClientIndex.reuse(previous.index, inbounds)
+            else:
+                self.index = ClientIndex.build(inbounds, self.clients)
+
+    def get_inbound(self, inbound_id: int) -> Optional[Dict]:
+        return self.inbounds_by_id.get(inbound_id)
+
+    def link_template(self, inbound_id: int) -> Optional[LinkTemplate]:
+        """
+        Returns the inbound's precompiled link template, compiling it on first use in this snapshot.
+        """
+        if inbound_id not in self._templates:
+            inbound = self.inbounds_by_id.get(inbound_id)
+            self._templates[inbound_id] = compile_inbound(inbound, self._settings.get(inbound_id)) if inbound else None
+        return self._templates[inbound_id]
+
+    def link(self, inbound_id: int, client: Dict, host: str) -> Optional[str]:
+        template = self.link_template(inbound_id)
+        return template.build(client, host) if template else None
+
+    def all_links(self, host: str) -> List[Tuple[Dict, str]]:
+        """
+        Builds the links of every client in the snapshot (for export / subscriptions).
+        """
+        templates = {inbound_id: self.link_template(inbound_id) for inbound_id in self.inbounds_by_id}
+        return build_links(templates, self.index.by_uuid.values(), host)
+
+    def find_client(self, client_uuid: str) -> Optional[Tuple[Dict, Dict]]:
+        entry = self.index.get(client_uuid)
+        if not entry:
+            return None
+        inbound_id, client = entry
+        return self.inbounds_by_id[inbound_id], client
+
+    def mark_patched(self, inbound_id: int):
+        """
+        Records that the inbound's clients were changed locally, so the next snapshot decodes it again.
+        """
+        self._fingerprints.pop(inbound_id, None)
+        self._shared.discard(inbound_id)
+
+    def add_client(self, inbound_id: int, client: Dict):
+        clients = self.clients.get(inbound_id, [])
+        self.clients[inbound_id] = list(clients) if inbound_id in self._shared else clients
+        self.clients[inbound_id].append(client)
+        self.mark_patched(inbound_id)
+        self.index.add(inbound_id, client)
+
+    def remove_client(self, inbound_id: int, client_uuid: str):
+        clients = self.clients.get(inbound_id, [])
+        self.clients[inbound_id] = [c for c in clients if client_key(c) != client_uuid]
+        self.mark_patched(inbound_id)
+        self.index.remove(client_uuid)
+
+
+class XUICache:
+    """
+    TTL cache in front of XUIClient.
+    Concurrent misses share a single panel fetch; writes patch the cached snapshot in place.
+    Subscribers get the ChangeEvents of every refresh (diffed against the previous snapshot) and patch.
+    """
+    def __init__(self, client: XUIClient, ttl: float = 30.0):
+        self.client = client
+        self.ttl = ttl
+        self._snapshot: Optional[InboundSnapshot] = None
+        # Last snapshot built, kept across invalidate() as the base for the next diff
+        self._last: Optional[InboundSnapshot] = None
+        self._lock = asyncio.Lock()
+        self._listeners: List[Callable[[List[ChangeEvent]], None]] = []
+        # Bumped whenever the snapshot is replaced or patched, so derived caches know to rebuild
+        self.version = 0
+
+    def subscribe(self, listener: Callable[[List[ChangeEvent]], None]):
+        """
+        Calls listener(events) after each change; it runs on the event loop, so keep it quick.
+        """
+        self._listeners.append(listener)
+
+    def unsubscribe(self, listener: Callable[[List[ChangeEvent]], None]):
+        if listener in self._listeners:
+            self._listeners.remove(listener)
+
+    def _emit(self, events: List[ChangeEvent]):
+        if not events:
+            return
+        for listener in list(self._listeners):
+            try:
+                listener(events)
+            except Exception as e:
+                logger.error(f"Error in snapshot listener {listener!r}: {e}")
+
+    def is_fresh(self) -> bool:
+        return self._snapshot is not None and (time.monotonic() - self._snapshot.fetched_at) < self.ttl
+
+    def invalidate(self):
+        """
+        Drops the cached snapshot so the next read goes to the panel.
+        """
+        self._snapshot = None
+        self.version += 1
+
+    def peek(self) -> Optional[InboundSnapshot]:
+        """
+        Returns the current snapshot, however old, without ever calling the panel.
+        """
+        return self._snapshot
+
+    async def get_snapshot(self, force: bool = False) -> Optional[InboundSnapshot]:
+        """
+        Returns the cached snapshot, refreshing it if it is older than the TTL.
+        """
+        if not force and self.is_fresh():
+            return self._snapshot
+
+        async with self._lock:
+            # Another caller may have refreshed while we were waiting
+            if not force and self.is_fresh():
+                return self._snapshot
+
+            inbounds = await self.client.get_inbounds()
+            if inbounds is None:
+                # Don't cache failures; a panel without inbounds is a valid (empty) snapshot
+                self._snapshot = None
+                return None
+
+            previous = self._last
+            self._snapshot = self._last = InboundSnapshot(inbounds, time.monotonic(), previous=previous)
+            self.version += 1
+            if previous is not None and self._listeners:
+                with perf.timer("snapshot.diff"):
+                    events = diff_snapshots(previous, self._snapshot)
+                self._emit(events)
+            return self._snapshot
+
+    async def get_inbounds(self) -> List[Dict]:
+        snapshot = await self.get_snapshot()
+        return snapshot.inbounds if snapshot else []
+
+    async def find_client_by_uuid(self, client_uuid: str) -> Optional[Tuple[Dict, Dict]]:
+        """
+        Finds a client and its inbound by UUID from the cached snapshot.
+        Returns (inbound, client) tuple or None.
+        """
+        snapshot = await self.get_snapshot()
+        if not snapshot:
+            return None
+        return snapshot.find_client(client_uuid)
+
+    async def add_client(self, inbound_id: int, email: str, uuid: str, enable: bool = True,
+                         total_bytes: int = 0, expiry_ms: int = 0, protocol: str = "vless", flow: str = "",
+                         method: str = "") -> Dict:
+        """
+        Adds a client through the panel and patches the cached snapshot on success.
+        On success the result also carries the stored client object under "client".
+        """
+        result = await self.client.add_client(inbound_id, email, uuid, enable, total_bytes, expiry_ms, protocol, flow, method)
+        if result['success']:
+            client = XUIClient.build_client(email, uuid, enable, total_bytes, expiry_ms, protocol, flow, method)
+            result['client'] = client
+            if self._snapshot:
+                self._snapshot.add_client(inbound_id, client)
+                self.version += 1
+            self._emit([ClientAdded(inbound_id, client)])
+        return result
+
+    async def add_clients(self, inbound_id: int, emails: List[str], enable: bool = True,
+                          protocol: str = "vless", flow: str = "", method: str = "") -> Dict:
+        """
+        Bulk-adds clients through the panel and patches the cached snapshot with those that were added.
+        """
+        result = await self.client.add_clients(inbound_id, emails, enable, protocol=protocol, flow=flow, method=method)
+        if self._snapshot and result['clients']:
+            for client in result['clients']:
+                self._snapshot.add_client(inbound_id, client)
+            self.version += 1
+        self._emit([ClientAdded(inbound_id, client) for client in result['clients']])
+        return result
+
+    async def delete_client_by_uuid(self, client_uuid: str) -> Dict:
+        """
+        Deletes a client through the panel and patches the cached snapshot on success.
+        """
+        snapshot = await self.get_snapshot()
+        found = snapshot.find_client(client_uuid) if snapshot else None
+        inbound_id = found[0].get('id') if found else None
+
+        # The snapshot's client list includes local patches its raw inbound settings don't have yet
+        clients = snapshot.clients.get(inbound_id) if found else None
+        result = await self.client.delete_client_by_uuid(client_uuid, inbound=found[0] if found else None, clients=clients)
+        if result['success']:
+            if self._snapshot and inbound_id is not None:
+                self._snapshot.remove_client(inbound_id, client_uuid)
+                self.version += 1
+            else:
+                self.invalidate()
+            if found:
+                self._emit([ClientRemoved(inbound_id, found[1])])
+        return result
+
+    async def bulk_update_clients(self, client_uuids: List[str], action: str,
+                                  snapshot: Optional[InboundSnapshot] = None) -> Dict:
+        """
+        Deletes (action="delete") or disables (action="disable") many clients.
+        Targets are grouped by inbound from one fresh snapshot (or the one given) and each inbound gets a single update.
+        Returns {"success", "msg", "done": [uuids], "failed": [uuids]}.
+        """
+        if snapshot is None:
+            snapshot = await self.get_snapshot(force=True)
+        if not snapshot:
+            return {"success": False, "msg": "Could not fetch inbounds.", "done": [], "failed": list(client_uuids)}
+
+        targets: Dict[int, set] = {}
+        missing = []
+        for client_uuid in client_uuids:
+            entry = snapshot.index.get(client_uuid)
+            if entry:
+                targets.setdefault(entry[0], set()).add(client_uuid)
+            else:
+                missing.append(client_uuid)
+
+        done, failed = [], list(missing)
+        for inbound_id, uuids in targets.items():
+            inbound = snapshot.get_inbound(inbound_id)
+            clients = snapshot.clients.get(inbound_id, [])
+            if action == "delete":
+                new_clients = [c for c in clients if client_key(c) not in uuids]
+            else:
+                new_clients = [dict(c, enable=False) if client_key(c) in uuids else c for c in clients]
+
+            settings = json.loads(inbound.get('settings', '{}'))
+            settings['clients'] = new_clients
+            payload = dict(inbound, settings=json.dumps(settings))
+
+            result = await self.client.update_inbound(inbound_id, payload)
+            if not result['success']:
+                logger.error(f"Bulk {action} failed on inbound {inbound_id}: {result['msg']}")
+                failed.extend(uuids)
+                continue
+
+            # Patch the snapshot in place
+            inbound['settings'] = payload['settings']
+            snapshot.clients[inbound_id] = new_clients
+            snapshot.mark_patched(inbound_id)
+            for client in new_clients:
+                if client_key(client) in uuids:
+                    snapshot.index.add(inbound_id, client)
+            if action == "delete":
+                events = [ClientRemoved(inbound_id, c) for c in clients if client_key(c) in uuids]
+                for client_uuid in uuids:
+                    snapshot.index.remove(client_uuid)
+            else:
+                was_enabled = {client_key(c) for c in clients if c.get('enable', True)}
+                events = [ClientToggled(inbound_id, c) for c in new_clients
+                          if client_key(c) in uuids and client_key(c) in was_enabled]
+            done.extend(uuids)
+            self.version += 1
+            self._emit(events)
+
+        return {
+            "success": not failed,
+            "msg": f"{len(done)} clients {action}d, {len(failed)} failed",
+            "done": done,
+            "failed": failed,
+        }
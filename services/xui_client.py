@@ -1,13 +1,29 @@
-import requests
+import asyncio
+import base64
+import httpx
 import logging
 import json
 import os
-from typing import Dict, List, Optional, Tuple
+import re
+import time
+import uuid as uuid_lib
+from typing import Dict, List, Optional
+
+from services.xui_session import SessionStore
+from utils.perf import perf
+from services.client_index import client_key
 
 logger = logging.getLogger(__name__)
 
+_ID_SEGMENT = re.compile(r'/\d+(?=/|$)')
+
 class XUIClient:
-    def __init__(self, host: str, port: int, username: str, password: str, root_path: str = ""):
+    # Refresh the session this many seconds before it is due to expire
+    SESSION_MARGIN = 60
+
+    def __init__(self, host: str, port: int, username: str, password: str, root_path: str = "",
+                 timeout: float = 10.0, max_concurrency: int = 4,
+                 session_file: str = "", session_max_age: float = 3600):
         self.base_url = f"{host}:{port}"
         # Normalize root path: ensure it starts with / and has no trailing /
         self.root_path = root_path.strip()
@@ -15,74 +31,183 @@ class XUIClient:
             self.root_path = '/' + self.root_path
         if self.root_path.endswith('/'):
             self.root_path = self.root_path[:-1]
-            
+
         self.username = username
         self.password = password
-        self.session = requests.Session()
+        self.timeout = timeout
+        self.max_concurrency = max(1, max_concurrency)
         self.logged_in = False
 
-    def login(self) -> bool:
+        # Session state: expiry (epoch seconds), a generation counter bumped on every login,
+        # and a lock so that a burst of expired requests triggers exactly one re-login
+        self.session_max_age = session_max_age
+        self.session_expires_at = 0.0
+        self._session_gen = 0
+        self._login_lock = asyncio.Lock()
+        self._session_store = SessionStore(session_file, f"{self.base_url}{self.root_path}")
+
+        # The HTTP client is created lazily so that it binds to the bot's running event loop
+        self._client: Optional[httpx.AsyncClient] = None
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+
+    def _get_client(self) -> httpx.AsyncClient:
+        """
+        Returns the shared keep-alive connection pool, creating it on first use.
+        """
+        if self._client is None or self._client.is_closed:
+            limits = httpx.Limits(
+                max_connections=self.max_concurrency,
+                max_keepalive_connections=self.max_concurrency
+            )
+            # Redirects are not followed so that a redirect to the login page can be detected
+            self._client = httpx.AsyncClient(limits=limits, timeout=self.timeout, follow_redirects=False)
+            self._restore_session()
+        return self._client
+
+    def _restore_session(self):
+        saved = self._session_store.load()
+        if not saved:
+            return
+        for c in saved.get('cookies', []):
+            self._client.cookies.set(c['name'], c['value'], domain=c.get('domain', ''), path=c.get('path', '/'))
+        self.session_expires_at = saved['expires_at']
+        self.logged_in = True
+        logger.info("Restored 3x-ui session from disk")
+
+    def _save_session(self):
+        cookies = []
+        expires = []
+        for c in self._client.cookies.jar:
+            cookies.append({"name": c.name, "value": c.value, "domain": c.domain, "path": c.path})
+            if c.expires:
+                expires.append(c.expires)
+        # Use the cookie's own expiry when the panel sets one, else the configured session age
+        self.session_expires_at = min(expires) if expires else time.time() + self.session_max_age
+        self._session_store.save(cookies, self.session_expires_at)
+
+    def _session_expired(self) -> bool:
+        return time.time() >= self.session_expires_at - self.SESSION_MARGIN
+
+    @staticmethod
+    def _is_auth_failure(response: httpx.Response) -> bool:
+        """
+        Detects an expired/invalid session: 401, a redirect to the login page,
+        or the HTML login page served in place of JSON.
+        """
+        if response.status_code == 401:
+            return True
+        if response.is_redirect:
+            return True
+        content_type = response.headers.get('content-type', '')
+        return response.status_code == 200 and 'text/html' in content_type
+
+    async def _send(self, method: str, path: str, timeout: Optional[float] = None, **kwargs) -> httpx.Response:
+        """
+        Sends a raw request to the panel, bounded by the concurrency limit.
+        """
+        url = f"{self.base_url}{self.root_path}{path}"
+        # Numeric path segments (inbound ids) are folded so each endpoint gets one histogram
+        op = f"panel.{method} {_ID_SEGMENT.sub('/{id}', path)}"
+        async with self._semaphore:
+            start = time.perf_counter()
+            response = None
+            try:
+                response = await self._get_client().request(
+                    method, url, timeout=timeout if timeout is not None else self.timeout, **kwargs
+                )
+                return response
+            finally:
+                perf.observe(op, time.perf_counter() - start, response is None or response.status_code >= 400)
+
+    async def _request(self, method: str, path: str, timeout: Optional[float] = None, **kwargs) -> httpx.Response:
+        """
+        Sends an authenticated request. Logs in up front if the session is missing or about to expire,
+        and re-logs in once (shared with concurrent callers) if the panel rejects the session.
+        """
+        await self._ensure_login()
+        gen = self._session_gen
+        response = await self._send(method, path, timeout, **kwargs)
+        if self._is_auth_failure(response):
+            logger.warning(f"Session rejected on {path}, re-logging in...")
+            if await self._relogin(gen):
+                response = await self._send(method, path, timeout, **kwargs)
+        return response
+
+    async def close(self):
+        """
+        Closes the underlying connection pool.
+        """
+        if self._client is not None:
+            await self._client.aclose()
+            self._client = None
+
+    async def login(self) -> bool:
         """
         Authenticates with the 3x-ui panel.
         """
-        url = f"{self.base_url}{self.root_path}/login"
         data = {
             "username": self.username,
             "password": self.password
         }
         try:
-            response = self.session.post(url, data=data, timeout=10)
+            response = await self._send("POST", "/login", data=data)
             if response.status_code == 200 and response.json().get('success'):
                 self.logged_in = True
+                self._session_gen += 1
+                self._save_session()
                 logger.info("Successfully logged into 3x-ui")
                 return True
             else:
+                self.logged_in = False
                 logger.error(f"Login failed. Status: {response.status_code}, Body: {response.text}")
                 return False
         except Exception as e:
+            self.logged_in = False
             logger.error(f"Error connecting to 3x-ui login: {e}")
             return False
 
-    def _ensure_login(self):
+    async def _relogin(self, seen_gen: int) -> bool:
+        """
+        Logs in again unless another request already did so since `seen_gen`.
+        """
+        async with self._login_lock:
+            if self._session_gen != seen_gen and self.logged_in:
+                return True
+            self._session_store.clear()
+            return await self.login()
+
+    async def _ensure_login(self):
         """
-        Ensures we are logged in before making a request.
+        Ensures we hold a live session before making a request.
         """
-        if not self.logged_in:
-            self.login()
+        # Creating the client restores a saved session, if any
+        self._get_client()
+        if not self.logged_in or self._session_expired():
+            await self._relogin(self._session_gen)
 
-    def get_inbounds(self) -> List[Dict]:
+    async def get_inbounds(self) -> Optional[List[Dict]]:
         """
-        Retrieves the list of active inbounds.
+        Retrieves the list of active inbounds, or None if the request failed.
         """
-        self._ensure_login()
-        url = f"{self.base_url}{self.root_path}/panel/api/inbounds/list"
         try:
-            response = self.session.get(url, timeout=10)
+            response = await self._request("GET", "/panel/api/inbounds/list")
             if response.status_code == 200:
                 data = response.json()
                 if data.get('success'):
-                    return data.get('obj', [])
-            
-            # If failed, maybe session expired? retry once
-            logger.warning("Failed to get inbounds, retrying login...")
-            if self.login():
-                response = self.session.get(url, timeout=10)
-                if response.status_code == 200 and response.json().get('success'):
-                    return response.json().get('obj', [])
-            
-            return []
+                    return data.get('obj') or []
+
+            logger.warning(f"Failed to get inbounds. Status: {response.status_code}")
+            return None
         except Exception as e:
             logger.error(f"Error getting inbounds: {e}")
-            return []
+            return None
 
-    def get_inbound(self, inbound_id: int) -> Optional[Dict]:
+    async def get_inbound(self, inbound_id: int) -> Optional[Dict]:
         """
         Retrieves a specific inbound by ID.
         """
-        self._ensure_login()
-        url = f"{self.base_url}{self.root_path}/panel/api/inbounds/get/{inbound_id}"
         try:
-            response = self.session.get(url, timeout=10)
+            response = await self._request("GET", f"/panel/api/inbounds/get/{inbound_id}")
             if response.status_code == 200 and response.json().get('success'):
                 return response.json().get('obj')
             return None
@@ -90,39 +215,54 @@ class XUIClient:
             logger.error(f"Error fetching inbound {inbound_id}: {e}")
             return None
 
-    def add_client(self, inbound_id: int, email: str, uuid: str, enable: bool = True) -> Dict:
+    @staticmethod
+    def build_client(email: str, uuid: str, enable: bool = True, total_bytes: int = 0, expiry_ms: int = 0,
+                     protocol: str = "vless", flow: str = "", method: str = "") -> Dict:
+        """
+        Builds the client object sent to (and stored by) the panel.
+        total_bytes / expiry_ms of 0 mean unlimited (the panel's totalGB is in bytes).
+        Trojan and Shadowsocks clients are identified by their password, which is derived from `uuid`.
+        `method` is the Shadowsocks inbound's cipher, which fixes the key size for 2022 ciphers.
+        """
+        client = {
+            "email": email,
+            "enable": enable,
+            "expiryTime": expiry_ms,
+            "limitIp": 0,
+            "totalGB": total_bytes,
+        }
+        if protocol == "trojan":
+            client["password"] = uuid.replace("-", "")
+        elif protocol == "shadowsocks":
+            # 2022 ciphers need a key of the cipher's size (16 bytes for aes-128, 32 for aes-256 and
+            # chacha20); classic ciphers take any password, so they get 32 bytes too
+            key = uuid_lib.UUID(uuid).bytes
+            client["method"] = ""
+            client["password"] = base64.b64encode(key if method == "2022-blake3-aes-128-gcm" else key * 2).decode()
+        else:
+            client["id"] = uuid
+            if protocol == "vless":
+                client["flow"] = flow
+        return client
+
+    async def add_client(self, inbound_id: int, email: str, uuid: str, enable: bool = True,
+                         total_bytes: int = 0, expiry_ms: int = 0, protocol: str = "vless", flow: str = "",
+                         method: str = "") -> Dict:
         """
         Adds a client to an existing inbound.
+        `protocol`, `flow` and `method` should match the inbound (see LinkTemplate.default_flow / ss_method).
         """
-        self._ensure_login()
-        url = f"{self.base_url}{self.root_path}/panel/api/inbounds/addClient"
-        
-        # Structure for adding a client
-        # We need to respect the flow of the inbound, but for VLESS Vision it's explicit.
-        # Ideally we fetch the inbound first to get the flow, but that's an extra call.
-        # Let's assume standard X-UI structure.
-        
         settings = {
-            "clients": [
-                {
-                    "id": uuid,
-                    "email": email,
-                    "enable": enable,
-                    "expiryTime": 0,
-                    "limitIp": 0,
-                    "totalGB": 0,
-                    "flow": "xtls-rprx-vision", # Default for Reality, but ideally should match inbound
-                }
-            ]
+            "clients": [self.build_client(email, uuid, enable, total_bytes, expiry_ms, protocol, flow, method)]
         }
-        
+
         data = {
             "id": inbound_id,
             "settings": json.dumps(settings)
         }
-        
+
         try:
-            response = self.session.post(url, data=data, timeout=10)
+            response = await self._request("POST", "/panel/api/inbounds/addClient", data=data)
             logger.info(f"Add client response: {response.status_code} - {response.text}")
             result = response.json()
             if result.get('success'):
@@ -133,92 +273,102 @@ class XUIClient:
             logger.error(f"Error adding client: {e}")
             return {"success": False, "msg": str(e)}
 
-    def generate_vless_link(self, inbound: Dict, uuid: str, email: str, host_ip: str) -> str:
+    async def add_clients(self, inbound_id: int, emails: List[str], enable: bool = True, chunk_size: int = 100,
+                          protocol: str = "vless", flow: str = "", method: str = "") -> Dict:
+        """
+        Adds many clients to one inbound, sending up to `chunk_size` clients per addClient request.
+        Returns {"success", "msg", "clients"} where "clients" lists the client objects actually added.
+        """
+        added = []
+
+        for start in range(0, len(emails), chunk_size):
+            chunk = [self.build_client(email, str(uuid_lib.uuid4()), enable, protocol=protocol, flow=flow, method=method)
+                     for email in emails[start:start + chunk_size]]
+            data = {
+                "id": inbound_id,
+                "settings": json.dumps({"clients": chunk})
+            }
+            try:
+                response = await self._request("POST", "/panel/api/inbounds/addClient", data=data)
+                logger.info(f"Add clients response ({len(chunk)} clients): {response.status_code}")
+                result = response.json()
+                if not result.get('success'):
+                    return {"success": False, "msg": result.get('msg', 'Unknown error'), "clients": added}
+            except Exception as e:
+                logger.error(f"Error adding clients: {e}")
+                return {"success": False, "msg": str(e), "clients": added}
+            added.extend(chunk)
+
+        return {"success": True, "msg": f"{len(added)} clients added", "clients": added}
+
+    async def update_inbound(self, inbound_id: int, inbound: Dict) -> Dict:
+        """
+        Replaces an inbound (including its settings/clients) via /panel/api/inbounds/update.
+        """
+        try:
+            response = await self._request("POST", f"/panel/api/inbounds/update/{inbound_id}", json=inbound)
+            logger.info(f"Update inbound {inbound_id} response: {response.status_code}")
+            if response.status_code == 200 and response.json().get('success'):
+                return {"success": True, "msg": "Inbound updated"}
+            return {"success": False, "msg": response.text}
+        except Exception as e:
+            logger.error(f"Error updating inbound {inbound_id}: {e}")
+            return {"success": False, "msg": str(e)}
+
+    async def get_server_status(self) -> Optional[Dict]:
         """
-        Generates a VLESS link based on inbound settings.
+        Retrieves the panel host's status (cpu, mem, disk, loads, netIO, xray state) via /server/status.
         """
         try:
-            port = inbound['port']
-            stream_settings = json.loads(inbound['streamSettings'])
-            network = stream_settings.get('network', 'tcp')
-            security = stream_settings.get('security', 'none')
-            
-            link = f"vless://{uuid}@{host_ip}:{port}?type={network}&security={security}"
-            
-            # Add reality/tls settings
-            if security == 'reality':
-                reality = stream_settings.get('realitySettings', {})
-                pbk = reality.get('settings', {}).get('publicKey') # MHSanaei structure
-                if not pbk: 
-                    pbk = reality.get('privateKey') # Fallback if structure differs or if we are mistakenly reading private
-                    # Actually typically: realitySettings: { settings: { publicKey: ... }, ... }
-                    # Or direct fields dependent on version. 
-                    # Let's try to find publicKey in realitySettings directly or nested
-                    pbk = reality.get('publicKey') or reality.get('settings', {}).get('publicKey')
-
-                sni = reality.get('serverNames', [''])[0]
-                fp = reality.get('fingerprint', 'chrome')
-                sid = reality.get('shortIds', [''])[0]
-                
-                link += f"&pbk={pbk}&fp={fp}&sni={sni}&sid={sid}&flow=xtls-rprx-vision"
-            
-            link += f"#{email}"
-            return link
+            response = await self._request("POST", "/server/status")
+            if response.status_code == 200 and response.json().get('success'):
+                return response.json().get('obj')
+            return None
         except Exception as e:
-            logger.error(f"Error generating link: {e}")
-            return f"Error generating link: {e}"
+            logger.error(f"Error fetching server status: {e}")
+            return None
 
-    def delete_inbound(self, inbound_id: int) -> bool:
+    async def delete_inbound(self, inbound_id: int) -> bool:
         """
         Deletes an inbound by ID.
         """
-        self._ensure_login()
-        url = f"{self.base_url}{self.root_path}/panel/api/inbounds/del/{inbound_id}"
         try:
-            response = self.session.post(url, timeout=10)
+            response = await self._request("POST", f"/panel/api/inbounds/del/{inbound_id}")
             return response.json().get('success', False)
         except Exception as e:
             logger.error(f"Error deleting inbound: {e}")
             return False
 
-    def delete_client_by_uuid(self, client_uuid: str) -> Dict:
+    async def delete_client_by_uuid(self, client_uuid: str, inbound: Optional[Dict] = None,
+                                    clients: Optional[List[Dict]] = None) -> Dict:
         """
-        Deletes a client by UUID. 
-        First finds the inbound containing the client, then deletes the client.
+        Deletes a client by UUID.
+        `inbound` is the inbound holding the client and `clients` its current client list, as known
+        to the caller (e.g. from a cached snapshot); without them the inbounds are fetched once.
         """
-        self._ensure_login()
-        
-        # 1. Find Inbound and Client Email based on UUID
-        inbounds = self.get_inbounds()
-        target_inbound_id = None
-        target_email = None
-        
-        for inbound in inbounds:
-            try:
-                settings = json.loads(inbound.get('settings', '{}'))
-                clients = settings.get('clients', [])
-                for client in clients:
-                    if client.get('id') == client_uuid:
-                        target_inbound_id = inbound.get('id')
-                        target_email = client.get('email')
-                        break
-            except Exception:
-                continue
-            
-            if target_inbound_id:
-                break
-                
+        # 1. Find the inbound holding the client
+        if inbound is None:
+            for candidate in await self.get_inbounds() or []:
+                try:
+                    candidate_clients = json.loads(candidate.get('settings', '{}')).get('clients', [])
+                except Exception:
+                    continue
+                if any(client_key(c) == client_uuid for c in candidate_clients):
+                    inbound, clients = candidate, candidate_clients
+                    break
+        target_inbound_id = inbound.get('id') if inbound else None
+
         if not target_inbound_id:
             return {"success": False, "msg": "Client with this UUID not found."}
-            
+
         # 2. Delete Client
         # Strategy A: /panel/api/inbounds/delClient/{inboundId}/{clientUuid}
-        url_a = f"{self.base_url}{self.root_path}/panel/api/inbounds/delClient/{target_inbound_id}/{client_uuid}"
+        path_a = f"/panel/api/inbounds/delClient/{target_inbound_id}/{client_uuid}"
         try:
-            logger.info(f"Attempting delete via {url_a}")
-            response = self.session.post(url_a, timeout=10)
+            logger.info(f"Attempting delete via {path_a}")
+            response = await self._request("POST", path_a)
             logger.info(f"Delete response A: {response.status_code} - {response.text}")
-            
+
             if response.status_code == 200 and response.json().get('success'):
                  return {"success": True, "msg": "Client deleted (Method A)"}
         except Exception as e:
@@ -228,39 +378,23 @@ class XUIClient:
         # This is the fallback if the specific delete endpoint doesn't work/exist in this version
         try:
             logger.info(f"Attempting delete via Update Inbound (Method B)")
-            # Re-fetch inbound to be sure
-            inbound = self.get_inbound(target_inbound_id) # Need to implement get_inbound or find it again
-            # For now, iterate again or use the one we found if we trust it hasn't changed in sub-second
-            # Let's just use the 'inbound' variable from the loop above? No, it's safer to re-find exactly.
-            
-            # Simple re-find logic from list
-            inbounds = self.get_inbounds()
-            target_inbound = None
-            for i in inbounds:
-                if i.get('id') == target_inbound_id:
-                    target_inbound = i
-                    break
-            
-            if not target_inbound:
-                 return {"success": False, "msg": "Inbound not found for fallback delete."}
+            settings = json.loads(inbound.get('settings', '{}'))
+            if clients is None:
+                clients = settings.get('clients', [])
 
-            settings = json.loads(target_inbound.get('settings', '{}'))
-            clients = settings.get('clients', [])
-            
             # Filter out the client
-            new_clients = [c for c in clients if c.get('id') != client_uuid]
-            
+            new_clients = [c for c in clients if client_key(c) != client_uuid]
+
             if len(new_clients) == len(clients):
                  return {"success": False, "msg": "Client not found in inbound settings."}
-                 
+
             settings['clients'] = new_clients
-            target_inbound['settings'] = json.dumps(settings)
-            
+            payload = dict(inbound, settings=json.dumps(settings))
+
             # Update inbound
-            update_url = f"{self.base_url}{self.root_path}/panel/api/inbounds/update/{target_inbound_id}"
-            resp = self.session.post(update_url, json=target_inbound, timeout=10)
+            resp = await self._request("POST", f"/panel/api/inbounds/update/{target_inbound_id}", json=payload)
             logger.info(f"Delete response B: {resp.status_code} - {resp.text}")
-            
+
             if resp.status_code == 200 and resp.json().get('success'):
                 return {"success": True, "msg": "Client deleted (Method B)"}
             else:
@@ -269,22 +403,3 @@ class XUIClient:
         except Exception as e:
             logger.error(f"Error deleting client (Method B): {e}")
             return {"success": False, "msg": str(e)}
-
-    def find_client_by_uuid(self, client_uuid: str) -> Optional[Tuple[Dict, Dict]]:
-        """
-        Finds a client and its inbound by UUID.
-        Returns (inbound, client) tuple or None.
-        """
-        self._ensure_login()
-        inbounds = self.get_inbounds()
-        
-        for inbound in inbounds:
-            try:
-                settings = json.loads(inbound.get('settings', '{}'))
-                clients = settings.get('clients', [])
-                for client in clients:
-                    if client.get('id') == client_uuid:
-                        return inbound, client
-            except Exception:
-                continue
-        return None
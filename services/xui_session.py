@@ -0,0 +1,53 @@
+import json
+import logging
+import os
+import time
+from typing import Dict, List, Optional
+
+logger = logging.getLogger(__name__)
+
+class SessionStore:
+    """
+    Persists the panel's session cookies to disk so a restart can skip the cold login.
+    The file holds {"base_url", "expires_at", "cookies": [...]} and is only readable by the owner.
+    """
+    def __init__(self, path: str, base_url: str):
+        self.path = path
+        self.base_url = base_url
+
+    def load(self) -> Optional[Dict]:
+        """
+        Returns the saved session if it belongs to this panel and has not expired.
+        """
+        if not self.path or not os.path.exists(self.path):
+            return None
+        try:
+            with open(self.path, 'r') as f:
+                data = json.load(f)
+        except Exception as e:
+            logger.warning(f"Ignoring unreadable session file {self.path}: {e}")
+            return None
+
+        if data.get('base_url') != self.base_url or data.get('expires_at', 0) <= time.time():
+            return None
+        return data
+
+    def save(self, cookies: List[Dict], expires_at: float):
+        if not self.path:
+            return
+        data = {"base_url": self.base_url, "expires_at": expires_at, "cookies": cookies}
+        tmp_path = f"{self.path}.tmp"
+        try:
+            fd = os.open(tmp_path, os.O_WRONLY | os.O_CREAT | os.O_TRUNC, 0o600)
+            with os.fdopen(fd, 'w') as f:
+                json.dump(data, f)
+            os.replace(tmp_path, self.path)
+        except Exception as e:
+            logger.warning(f"Could not save session file {self.path}: {e}")
+
+    def clear(self):
+        if self.path and os.path.exists(self.path):
+            try:
+                os.remove(self.path)
+            except OSError as e:
+                logger.warning(f"Could not remove session file {self.path}: {e}")
@@ -0,0 +1,36 @@
+from services.alerts import AlertRule
+
+
+def feed(rule, values):
+    return [rule.update(v) for v in values]
+
+
+def test_fires_after_debounce_consecutive_breaches():
+    rule = AlertRule("cpu", "CPU", threshold=90, debounce=3)
+    assert feed(rule, [95, 95, 80, 95, 95]) == [None] * 5  # the dip resets the streak
+    assert rule.update(95) is True
+    assert rule.firing
+    assert rule.update(99) is None  # already firing
+
+
+def test_hysteresis_keeps_hovering_value_firing():
+    rule = AlertRule("cpu", "CPU", threshold=90, clear_below=80, debounce=2)
+    assert feed(rule, [91, 91]) == [None, True]
+    # Between clear_below and threshold: neither clears nor re-fires
+    assert feed(rule, [85, 89, 85, 89]) == [None] * 4
+    assert rule.firing
+    assert feed(rule, [79, 79]) == [None, False]
+    assert not rule.firing
+
+
+def test_missing_values_leave_state_untouched():
+    rule = AlertRule("panel", "Panel down", threshold=1, debounce=2)
+    assert feed(rule, [1, None, 1]) == [None, None, True]
+
+
+def test_describe():
+    rule = AlertRule("ram", "RAM", threshold=90, unit="%")
+    assert rule.describe(True, 93.4) == "🚨 ALERT: RAM 93% (limit 90%)"
+    assert rule.describe(False, 42) == "✅ Recovered: RAM back to 42%"
+    service = AlertRule("svc", "x-ui is down", threshold=1, recovered="x-ui is running")
+    assert service.describe(False, 0) == "✅ Recovered: x-ui is running"
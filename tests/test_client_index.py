@@ -0,0 +1,33 @@
+from services.client_index import ClientIndex, client_key, short_ref
+
+VLESS = {"id": "5f0c3c1e-6c0a-4a57-9d0b-0b6d2a1f0e11", "email": "alice", "flow": ""}
+TROJAN = {"password": "s3cret", "email": "bob"}
+SHADOWSOCKS = {"method": "", "password": "c3M=", "email": "carol"}
+
+
+def test_client_key_per_protocol():
+    assert client_key(VLESS) == VLESS["id"]
+    assert client_key(TROJAN) == "s3cret"
+    # Shadowsocks clients are addressed by email, even though they carry a password
+    assert client_key(SHADOWSOCKS) == "carol"
+
+
+def test_short_ref_fits_callback_data():
+    long_email = "someone.with.a.long.name+vpn-subscription@example-mailbox.com"
+    ref = short_ref(long_email)
+    assert ref == short_ref(long_email)
+    assert len(f"xui_dc_99:{ref}".encode()) <= 64
+
+
+def test_resolve_ref_follows_add_and_remove():
+    index = ClientIndex.build([{"id": 1}], {1: [VLESS, SHADOWSOCKS]})
+    assert index.resolve_ref(short_ref("carol")) == "carol"
+    assert index.resolve_ref(short_ref("nobody")) is None
+
+    index.add(1, TROJAN)
+    assert index.resolve_ref(short_ref("s3cret")) == "s3cret"
+    index.remove("carol")
+    assert index.resolve_ref(short_ref("carol")) is None
+
+    reused = ClientIndex.reuse(index, [{"id": 1}])
+    assert reused.resolve_ref(short_ref(VLESS["id"])) == VLESS["id"]
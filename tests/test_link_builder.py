@@ -0,0 +1,93 @@
+import base64
+import json
+
+from services.link_builder import LinkTemplate, build_links, compile_inbound
+from services.xui_client import XUIClient
+
+UUID = "5f0c3c1e-6c0a-4a57-9d0b-0b6d2a1f0e11"
+
+REALITY = json.dumps({
+    "network": "tcp", "security": "reality",
+    "realitySettings": {"serverNames": ["www.example.com"], "shortIds": ["ab12"],
+                        "settings": {"publicKey": "PBK", "fingerprint": "firefox"}},
+})
+WS_TLS = json.dumps({
+    "network": "ws", "security": "tls",
+    "wsSettings": {"path": "/ws", "headers": {"Host": "cdn.example.com"}},
+    "tlsSettings": {"serverName": "cdn.example.com", "alpn": ["h2", "http/1.1"]},
+})
+
+
+def inbound(protocol, stream, settings=None, port=443):
+    return {"id": 1, "protocol": protocol, "port": port, "streamSettings": stream,
+            "settings": json.dumps(settings or {"clients": []})}
+
+
+def test_vless_reality_uses_vision_flow():
+    template = LinkTemplate(inbound("vless", REALITY))
+    assert template.default_flow == "xtls-rprx-vision"
+    client = XUIClient.build_client("alice", UUID, flow=template.default_flow)
+    link = template.build(client, "203.0.113.1")
+    assert link.startswith(f"vless://{UUID}@203.0.113.1:443?encryption=none&security=reality&type=tcp")
+    assert "pbk=PBK" in link and "sni=www.example.com" in link and "sid=ab12" in link and "fp=firefox" in link
+    assert link.endswith("&flow=xtls-rprx-vision#alice")
+
+
+def test_vless_ws_has_no_default_flow():
+    template = LinkTemplate(inbound("vless", WS_TLS))
+    assert template.default_flow == ""
+    link = template.build(XUIClient.build_client("alice", UUID), "vpn.example.com")
+    assert "path=%2Fws" in link and "host=cdn.example.com" in link and "alpn=h2%2Chttp%2F1.1" in link
+    assert "flow=" not in link
+
+
+def test_trojan_link_uses_build_client_password():
+    client = XUIClient.build_client("bob", UUID, protocol="trojan")
+    link = LinkTemplate(inbound("trojan", WS_TLS)).build(client, "203.0.113.1")
+    assert link.startswith(f"trojan://{UUID.replace('-', '')}@203.0.113.1:443?security=tls")
+
+
+def test_vmess_link_is_base64_json():
+    link = LinkTemplate(inbound("vmess", WS_TLS)).build({"id": UUID, "email": "dave"}, "203.0.113.1")
+    body = json.loads(base64.b64decode(link[len("vmess://"):]))
+    assert body["id"] == UUID and body["ps"] == "dave" and body["add"] == "203.0.113.1"
+    assert body["net"] == "ws" and body["path"] == "/ws" and body["tls"] == "tls"
+
+
+def decode_ss(link):
+    user_info = link[len("ss://"):].split("@", 1)[0]
+    return base64.urlsafe_b64decode(user_info + "=" * (-len(user_info) % 4)).decode()
+
+
+def test_shadowsocks_links():
+    client = XUIClient.build_client("carol", UUID, protocol="shadowsocks")
+    classic = LinkTemplate(inbound("shadowsocks", "{}", {"method": "chacha20-ietf-poly1305", "clients": []}, port=8388))
+    link = classic.build(client, "203.0.113.1")
+    assert link.endswith("@203.0.113.1:8388#carol")
+    assert decode_ss(link) == f"chacha20-ietf-poly1305:{client['password']}"
+
+    ss2022 = LinkTemplate(inbound("shadowsocks", "{}", {"method": "2022-blake3-aes-256-gcm", "password": "SERVER"}))
+    assert decode_ss(ss2022.build(client, "h")) == f"2022-blake3-aes-256-gcm:SERVER:{client['password']}"
+
+
+def test_compile_inbound_skips_unsupported_and_broken():
+    assert compile_inbound(inbound("socks", "{}")) is None
+    assert compile_inbound(inbound("vless", "{not json")) is None
+
+
+def test_build_links_skips_inbounds_without_template():
+    templates = {1: LinkTemplate(inbound("vless", WS_TLS)), 2: None}
+    entries = [(1, {"id": UUID, "email": "a"}), (2, {"id": UUID, "email": "b"}), (3, {"id": UUID, "email": "c"})]
+    assert [client["email"] for client, _ in build_links(templates, entries, "h")] == ["a"]
+
+
+def test_shadowsocks_2022_key_size_follows_the_cipher():
+    def key_bytes(method):
+        client = XUIClient.build_client("carol", UUID, protocol="shadowsocks", method=method)
+        return len(base64.b64decode(client["password"]))
+
+    assert key_bytes("2022-blake3-aes-128-gcm") == 16
+    assert key_bytes("2022-blake3-aes-256-gcm") == 32
+    assert key_bytes("2022-blake3-chacha20-poly1305") == 32
+    assert LinkTemplate(inbound("shadowsocks", "{}", {"method": "2022-blake3-aes-128-gcm"})).ss_method == "2022-blake3-aes-128-gcm"
+    assert LinkTemplate(inbound("vless", WS_TLS)).ss_method == ""
@@ -0,0 +1,42 @@
+import pytest
+
+from utils.perf import Histogram, PerfRegistry
+
+
+def test_empty_histogram():
+    assert Histogram().percentile(0.5) == 0.0
+
+
+def test_percentile_interpolates_within_bucket():
+    hist = Histogram()
+    for _ in range(90):
+        hist.observe(0.001)
+    for _ in range(10):
+        hist.observe(1.0)
+    # 90 samples in (0.7 ms, 1 ms], 10 in (0.7 s, 1 s]
+    assert hist.percentile(0.5) == pytest.approx(0.0007 + 0.0003 * 50 / 90)
+    assert hist.percentile(0.95) == pytest.approx(0.85)
+    assert hist.percentile(1.0) == pytest.approx(1.0)
+    assert hist.count == 100 and hist.max == 1.0
+
+
+def test_percentile_never_exceeds_max():
+    hist = Histogram()
+    for _ in range(10):
+        hist.observe(0.004)
+    assert hist.percentile(0.99) == pytest.approx(0.004)
+
+
+def test_overflow_bucket_uses_max():
+    hist = Histogram()
+    hist.observe(500.0)
+    assert hist.percentile(0.5) == pytest.approx(300.0)
+    assert hist.percentile(1.0) == pytest.approx(500.0)
+
+
+def test_registry_counts_errors():
+    registry = PerfRegistry()
+    registry.observe("op", 0.01)
+    registry.observe("op", 0.02, error=True)
+    assert registry.histograms["op"].count == 2
+    assert registry.histograms["op"].errors == 1
@@ -0,0 +1,33 @@
+import asyncio
+
+from utils.periodic import PeriodicTask
+
+
+def test_runs_until_stopped_and_survives_errors():
+    ticks = []
+
+    async def tick():
+        ticks.append(len(ticks))
+        if len(ticks) == 2:
+            raise RuntimeError("transient")
+
+    async def run():
+        task = PeriodicTask(tick, 0.01, "ticking")
+        task.start()
+        task.start()  # already running: no second loop
+        await asyncio.sleep(0.06)
+        assert task.running
+        await task.stop()
+        assert not task.running
+        stopped_at = len(ticks)
+        await asyncio.sleep(0.03)
+        return stopped_at
+
+    stopped_at = asyncio.run(run())
+    assert stopped_at >= 3  # the failing tick didn't end the loop
+    assert len(ticks) == stopped_at
+    assert ticks == list(range(len(ticks)))
+
+
+def test_stop_without_start():
+    asyncio.run(PeriodicTask(lambda: None, 1, "idle").stop())
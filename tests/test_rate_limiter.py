@@ -0,0 +1,98 @@
+import asyncio
+import time
+
+import pytest
+from telegram.error import RetryAfter
+
+from utils.rate_limiter import OutboundRateLimiter
+
+
+class FakeBot:
+    """
+    Stands in for Bot._do_post: records (endpoint, data) and answers after a short delay.
+    """
+    def __init__(self, fail_first=0, retry_after=0.05):
+        self.sent = []
+        self.fail_first = fail_first
+        self.retry_after = retry_after
+
+    async def post(self, endpoint, data):
+        self.sent.append((endpoint, data))
+        if self.fail_first:
+            self.fail_first -= 1
+            raise RetryAfter(self.retry_after)
+        await asyncio.sleep(0.01)
+        return f"{endpoint}:{data.get('text', data.get('reply_markup'))}"
+
+
+def fast_limiter(**kwargs):
+    return OutboundRateLimiter(global_rate=1000, chat_rate=1000, chat_burst=1000, **kwargs)
+
+
+def request(limiter, bot, endpoint, rate_limit_args=None, **data):
+    data.setdefault("chat_id", 1)
+    return limiter.process_request(bot.post, (endpoint, data), {}, endpoint, data, rate_limit_args)
+
+
+async def gather_in_order(*coros):
+    # Start each call before the next one, like handlers sending one after another
+    tasks = []
+    for coro in coros:
+        tasks.append(asyncio.create_task(coro))
+        await asyncio.sleep(0)
+    return await asyncio.gather(*tasks)
+
+
+def test_queued_edits_of_one_message_are_merged():
+    limiter, bot = fast_limiter(), FakeBot()
+    results = asyncio.run(gather_in_order(*(
+        request(limiter, bot, "editMessageText", message_id=7, text=f"step {i}") for i in range(4)
+    )))
+    # The first edit goes out at once; the next three wait behind it and collapse into the last one
+    assert [data["text"] for _, data in bot.sent] == ["step 0", "step 3"]
+    assert results == ["editMessageText:step 0"] + ["editMessageText:step 3"] * 3
+
+
+def test_edits_through_different_endpoints_are_not_merged():
+    limiter, bot = fast_limiter(), FakeBot()
+    results = asyncio.run(gather_in_order(
+        request(limiter, bot, "sendMessage", text="hello"),
+        request(limiter, bot, "editMessageText", message_id=7, text="first"),
+        request(limiter, bot, "editMessageText", message_id=7, text="second"),
+        request(limiter, bot, "editMessageReplyMarkup", message_id=7, reply_markup="keyboard"),
+    ))
+    assert [endpoint for endpoint, _ in bot.sent] == [
+        "sendMessage", "editMessageText", "editMessageText", "editMessageReplyMarkup"
+    ]
+    assert results[3] == "editMessageReplyMarkup:keyboard"
+    assert results[2] == "editMessageText:second"
+
+
+def test_edits_of_different_messages_are_independent():
+    limiter, bot = fast_limiter(), FakeBot()
+    asyncio.run(gather_in_order(
+        request(limiter, bot, "editMessageText", message_id=1, text="a"),
+        request(limiter, bot, "editMessageText", message_id=2, text="b"),
+    ))
+    assert sorted(data["text"] for _, data in bot.sent) == ["a", "b"]
+
+
+def test_retry_after_pauses_the_chat_and_retries():
+    limiter, bot = fast_limiter(), FakeBot(fail_first=1, retry_after=0.05)
+
+    async def run():
+        start = time.monotonic()
+        result = await request(limiter, bot, "sendMessage", text="hi")
+        return result, time.monotonic() - start
+
+    result, elapsed = asyncio.run(run())
+    assert result == "sendMessage:hi"
+    assert len(bot.sent) == 2
+    assert elapsed >= 0.05
+
+
+def test_retry_after_is_raised_when_retries_run_out():
+    limiter, bot = fast_limiter(max_retries=3), FakeBot(fail_first=5, retry_after=0.01)
+    with pytest.raises(RetryAfter):
+        asyncio.run(request(limiter, bot, "sendMessage", rate_limit_args=1, text="hi"))
+    assert len(bot.sent) == 2
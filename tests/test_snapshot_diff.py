@@ -0,0 +1,72 @@
+import json
+
+from services.snapshot_diff import ClientAdded, ClientRemoved, ClientToggled, TrafficDelta, diff_snapshots
+from services.xui_cache import InboundSnapshot
+
+
+def client(uuid, email, enable=True):
+    return {"id": uuid, "email": email, "enable": enable}
+
+
+def inbound(inbound_id, clients, stats=(), up=0, down=0):
+    return {
+        "id": inbound_id, "protocol": "vless", "port": 443, "streamSettings": "{}",
+        "settings": json.dumps({"clients": clients, "decryption": "none"}),
+        "up": up, "down": down,
+        "clientStats": [{"email": email, "up": u, "down": d} for email, u, d in stats],
+    }
+
+
+def snapshot(inbounds, previous=None):
+    return InboundSnapshot(inbounds, 0.0, previous=previous)
+
+
+def summary(events):
+    return sorted((type(e).__name__, e.inbound_id, getattr(e, "key", None) or e.email) for e in events)
+
+
+def test_unchanged_refresh_has_no_events():
+    old = snapshot([inbound(1, [client("u1", "a")], [("a", 10, 10)], up=10, down=10)])
+    new = snapshot([inbound(1, [client("u1", "a")], [("a", 10, 10)], up=10, down=10)], previous=old)
+    assert not new.changed
+    assert diff_snapshots(old, new) == []
+
+
+def test_client_changes():
+    old = snapshot([inbound(1, [client("u1", "a"), client("u2", "b"), client("u3", "c")])])
+    new = snapshot([inbound(1, [client("u1", "a"), client("u2", "b", enable=False), client("u4", "d")])], previous=old)
+    events = diff_snapshots(old, new)
+    assert summary(events) == [
+        ("ClientAdded", 1, "u4"),
+        ("ClientRemoved", 1, "u3"),
+        ("ClientToggled", 1, "u2"),
+    ]
+    toggled = next(e for e in events if isinstance(e, ClientToggled))
+    assert toggled.enabled is False
+
+
+def test_removed_inbound_removes_its_clients():
+    old = snapshot([inbound(1, [client("u1", "a")]), inbound(2, [client("u2", "b")])])
+    new = snapshot([inbound(1, [client("u1", "a")])], previous=old)
+    events = diff_snapshots(old, new)
+    assert [(type(e), e.inbound_id, e.key) for e in events] == [(ClientRemoved, 2, "u2")]
+    assert events[0].client["email"] == "b"
+
+
+def test_traffic_deltas():
+    clients = [client("u1", "a"), client("u2", "b")]
+    old = snapshot([inbound(1, clients, [("a", 100, 1000), ("b", 5, 5)], up=105, down=1005)])
+    new = snapshot([inbound(1, clients, [("a", 150, 1200), ("b", 5, 5)], up=155, down=1205)], previous=old)
+    events = diff_snapshots(old, new)
+    assert len(events) == 1 and isinstance(events[0], TrafficDelta)
+    assert (events[0].email, events[0].up, events[0].down) == ("a", 50, 200)
+
+    # Unchanged inbound totals skip the per-client comparison
+    same = snapshot([inbound(1, clients, [("a", 150, 1200), ("b", 5, 5)], up=155, down=1205)], previous=new)
+    assert diff_snapshots(new, same) == []
+
+
+def test_new_inbound_reports_its_clients_as_added():
+    old = snapshot([inbound(1, [client("u1", "a")])])
+    new = snapshot([inbound(1, [client("u1", "a")]), inbound(2, [client("u2", "b")])], previous=old)
+    assert [(type(e), e.key) for e in diff_snapshots(old, new)] == [(ClientAdded, "u2")]
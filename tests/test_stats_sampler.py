@@ -0,0 +1,33 @@
+from services.stats_sampler import RingBuffer
+
+
+def test_empty_buffer():
+    buf = RingBuffer(("cpu",), 3)
+    assert len(buf) == 0
+    assert buf.latest() is None
+    assert buf.window(60, now=100) == {}
+
+
+def test_latest_returns_newest_sample():
+    buf = RingBuffer(("cpu", "ram"), 3)
+    buf.append(1, {"cpu": 10, "ram": 50})
+    buf.append(2, {"cpu": 20})
+    assert buf.latest() == {"cpu": 20, "ram": 0.0, "ts": 2}
+
+
+def test_overwrites_oldest_when_full():
+    buf = RingBuffer(("cpu",), 3)
+    for ts in range(1, 6):
+        buf.append(ts, {"cpu": ts * 10})
+    assert len(buf) == 3
+    assert buf.latest()["cpu"] == 50
+    # Only samples 3..5 are left
+    assert buf.window(100, now=5) == {"cpu": {"min": 30, "avg": 40, "max": 50}}
+
+
+def test_window_only_covers_recent_samples():
+    buf = RingBuffer(("cpu",), 10)
+    for ts, value in ((100, 90), (150, 10), (160, 30)):
+        buf.append(ts, {"cpu": value})
+    assert buf.window(15, now=160) == {"cpu": {"min": 10, "avg": 20, "max": 30}}
+    assert buf.window(5, now=200) == {}
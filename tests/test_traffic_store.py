@@ -0,0 +1,47 @@
+from services.traffic_store import TrafficStore
+
+HOUR = 3600
+
+
+def make_store(tmp_path, **kwargs):
+    return TrafficStore(str(tmp_path / "traffic.db"), **kwargs)
+
+
+def test_record_stores_deltas_of_cumulative_counters(tmp_path):
+    store = make_store(tmp_path)
+    assert store.record({"a": (100, 200)}, ts=10) == 0  # first sighting: no delta
+    assert store.record({"a": (150, 260), "b": (5, 5)}, ts=20) == 1
+    # A counter that went down was reset in the panel and counts from zero
+    assert store.record({"a": (30, 40), "b": (5, 5)}, ts=30) == 1
+    assert store.top(0) == [("a", 80, 100)]
+    store.close()
+
+
+def test_maintain_rolls_old_rows_into_hourly_buckets(tmp_path):
+    store = make_store(tmp_path, raw_hours=1, retention_days=30)
+    store.record({"a": (0, 0)}, ts=2 * HOUR)
+    store.record({"a": (100, 200)}, ts=2 * HOUR + 10)
+    store.record({"a": (150, 260)}, ts=2 * HOUR + 50)
+    store.record({"a": (160, 270)}, ts=9 * HOUR + 5)
+
+    store.maintain(now=10 * HOUR + 100)
+
+    # Both rows of hour 2 are merged; hour 9 is within raw_hours and stays raw
+    assert store.series("a", 0, HOUR) == [(2 * HOUR, 150, 260), (9 * HOUR, 10, 10)]
+    assert store.top(0) == [("a", 160, 270)]
+
+    # Maintaining again adds nothing twice
+    store.maintain(now=10 * HOUR + 100)
+    assert store.series("a", 0, HOUR) == [(2 * HOUR, 150, 260), (9 * HOUR, 10, 10)]
+    store.close()
+
+
+def test_maintain_drops_hourly_buckets_past_retention(tmp_path):
+    store = make_store(tmp_path, raw_hours=1, retention_days=1)
+    store.record({"a": (0, 0)}, ts=2 * HOUR)
+    store.record({"a": (100, 100)}, ts=2 * HOUR + 10)
+    store.record({"a": (110, 110)}, ts=30 * HOUR)
+
+    store.maintain(now=26 * HOUR + 1)
+    assert store.series("a", 0, HOUR) == [(30 * HOUR, 10, 10)]
+    store.close()
@@ -0,0 +1,79 @@
+import asyncio
+import random
+from datetime import datetime, timezone
+
+from telegram import Chat, Message, Update
+
+from utils.perf import perf
+from utils.update_processor import ChatOrderedUpdateProcessor
+
+
+def make_update(update_id, chat_id):
+    chat = Chat(id=chat_id, type=Chat.PRIVATE)
+    message = Message(message_id=update_id, date=datetime.now(timezone.utc), chat=chat, text="x")
+    return Update(update_id=update_id, message=message)
+
+
+def test_ordering_key():
+    assert ChatOrderedUpdateProcessor.ordering_key(make_update(1, 42)) == 42
+    assert ChatOrderedUpdateProcessor.ordering_key(Update(update_id=2)) is None
+    assert ChatOrderedUpdateProcessor.ordering_key("not an update") is None
+
+
+def test_same_chat_in_order_and_workers_bounded():
+    processor = ChatOrderedUpdateProcessor(workers=3, max_pending=50)
+    rng = random.Random(7)
+    handled = {}
+    peak = 0
+
+    async def handle(chat_id, seq):
+        nonlocal peak
+        peak = max(peak, processor.running)
+        await asyncio.sleep(rng.uniform(0, 0.005))
+        handled.setdefault(chat_id, []).append(seq)
+
+    async def run():
+        await processor.initialize()
+        tasks = []
+        for update_id in range(60):
+            chat_id = update_id % 5
+            update = make_update(update_id, chat_id)
+            tasks.append(asyncio.create_task(processor.process_update(update, handle(chat_id, update_id))))
+            await asyncio.sleep(0)
+        await asyncio.gather(*tasks)
+        await processor.shutdown()
+
+    asyncio.run(run())
+    for chat_id, seqs in handled.items():
+        assert seqs == sorted(seqs), chat_id
+    assert sum(len(s) for s in handled.values()) == 60
+    assert 1 < peak <= 3
+    assert processor.queued == 0 and processor.running == 0
+    assert processor.max_queued > 0
+
+
+def test_failing_update_does_not_block_its_chat():
+    processor = ChatOrderedUpdateProcessor(workers=2)
+    handled = []
+
+    async def fail():
+        raise RuntimeError("boom")
+
+    async def ok():
+        handled.append("second")
+
+    async def run():
+        first = asyncio.create_task(processor.process_update(make_update(1, 9), fail()))
+        second = asyncio.create_task(processor.process_update(make_update(2, 9), ok()))
+        results = await asyncio.gather(first, second, return_exceptions=True)
+        assert isinstance(results[0], RuntimeError)
+
+    asyncio.run(run())
+    assert handled == ["second"]
+
+
+def test_queue_gauges_are_registered():
+    processor = ChatOrderedUpdateProcessor()
+    gauges = dict(perf.gauge_values())
+    assert gauges["updates.queued"] == processor.queued == 0
+    assert gauges["updates.running"] == 0
@@ -3,15 +3,20 @@ from telegram import Update
 from telegram.ext import ContextTypes
 import logging
 from config import ALLOWED_IDS
+from utils.perf import perf
 
 logger = logging.getLogger(__name__)
 
 def restricted(func):
+    # Every restricted handler is also timed (see /perf)
+    op = f"handler.{func.__name__}"
+
     @wraps(func)
     async def wrapped(update: Update, context: ContextTypes.DEFAULT_TYPE, *args, **kwargs):
         user_id = update.effective_user.id
         if user_id not in ALLOWED_IDS:
             logger.warning(f"Unauthorized access attempt from {user_id} ({update.effective_user.username})")
             return
-        return await func(update, context, *args, **kwargs)
+        async with perf.timer(op):
+            return await func(update, context, *args, **kwargs)
     return wrapped
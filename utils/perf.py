@@ -0,0 +1,156 @@
+import time
+from bisect import bisect_left
+from functools import wraps
+from typing import Callable, Dict, List, Optional, Tuple
+
+# Bucket upper bounds in seconds: 1/1.5/2/3/5/7 steps per decade from 0.1 ms to 100 s
+BUCKETS: Tuple[float, ...] = tuple(
+    round(m * 10 ** e, 6) for e in range(-4, 2) for m in (1, 1.5, 2, 3, 5, 7)
+) + (100.0,)
+
+class Histogram:
+    """
+    Fixed-bucket latency histogram. observe() is a bisect and two increments, so it can stay on
+    in production; percentiles are interpolated within the matching bucket.
+    """
+    __slots__ = ("counts", "count", "errors", "total", "max")
+
+    def __init__(self):
+        self.counts = [0] * (len(BUCKETS) + 1)  # last slot is +Inf
+        self.count = 0
+        self.errors = 0
+        self.total = 0.0
+        self.max = 0.0
+
+    def observe(self, seconds: float, error: bool = False):
+        self.counts[bisect_left(BUCKETS, seconds)] += 1
+        self.count += 1
+        self.total += seconds
+        if seconds > self.max:
+            self.max = seconds
+        if error:
+            self.errors += 1
+
+    def percentile(self, q: float) -> float:
+        if not self.count:
+            return 0.0
+        rank = q * self.count
+        seen = 0
+        for i, n in enumerate(self.counts):
+            if n and seen + n >= rank:
+                low = BUCKETS[i - 1] if i > 0 else 0.0
+                high = BUCKETS[i] if i < len(BUCKETS) else self.max
+                return min(self.max, low + (high - low) * (rank - seen) / n)
+            seen += n
+        return self.max
+
+
+class PerfRegistry:
+    """
+    Per-operation histograms, keyed by names like "panel.POST /login" or "handler.list_users_handler",
+    plus gauges: named callables read whenever the metrics are rendered (e.g. queue depths).
+    """
+    def __init__(self):
+        self.histograms: Dict[str, Histogram] = {}
+        self.gauges: Dict[str, Callable[[], float]] = {}
+        self.started_at = time.time()
+
+    def gauge(self, name: str, read: Callable[[], float]):
+        self.gauges[name] = read
+
+    def gauge_values(self) -> List[Tuple[str, float]]:
+        return [(name, read()) for name, read in sorted(self.gauges.items())]
+
+    def observe(self, name: str, seconds: float, error: bool = False):
+        hist = self.histograms.get(name)
+        if hist is None:
+            hist = self.histograms[name] = Histogram()
+        hist.observe(seconds, error)
+
+    def timer(self, name: str) -> "Timer":
+        return Timer(self, name)
+
+    def reset(self):
+        self.histograms.clear()
+        self.started_at = time.time()
+
+    def summary(self) -> List[Tuple[str, Histogram]]:
+        """
+        (name, histogram) pairs, the most time-consuming operations first.
+        """
+        return sorted(self.histograms.items(), key=lambda item: item[1].total, reverse=True)
+
+    def prometheus(self) -> str:
+        """
+        Renders all histograms and gauges in the Prometheus text exposition format.
+        """
+        lines = [
+            "# HELP vpsbot_operation_seconds Latency of bot operations.",
+            "# TYPE vpsbot_operation_seconds histogram",
+        ]
+        errors = [
+            "# HELP vpsbot_operation_errors_total Failed bot operations.",
+            "# TYPE vpsbot_operation_errors_total counter",
+        ]
+        for name, hist in sorted(self.histograms.items()):
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            cumulative = 0
+            for bound, n in zip(BUCKETS, hist.counts):
+                cumulative += n
+                lines.append(f'vpsbot_operation_seconds_bucket{{op="{label}",le="{bound:g}"}} {cumulative}')
+            lines.append(f'vpsbot_operation_seconds_bucket{{op="{label}",le="+Inf"}} {hist.count}')
+            lines.append(f'vpsbot_operation_seconds_sum{{op="{label}"}} {hist.total:.6f}')
+            lines.append(f'vpsbot_operation_seconds_count{{op="{label}"}} {hist.count}')
+            errors.append(f'vpsbot_operation_errors_total{{op="{label}"}} {hist.errors}')
+        gauges = [
+            "# HELP vpsbot_gauge Current value of a bot gauge.",
+            "# TYPE vpsbot_gauge gauge",
+        ]
+        for name, value in self.gauge_values():
+            label = name.replace("\\", "\\\\").replace('"', '\\"')
+            gauges.append(f'vpsbot_gauge{{name="{label}"}} {value:g}')
+        return "\n".join(lines + errors + gauges) + "\n"
+
+
+class Timer:
+    """
+    Times a block as either `with` or `async with`; an exception counts as an error.
+    """
+    __slots__ = ("registry", "name", "start")
+
+    def __init__(self, registry: PerfRegistry, name: str):
+        self.registry = registry
+        self.name = name
+
+    def __enter__(self):
+        self.start = time.perf_counter()
+        return self
+
+    def __exit__(self, exc_type, exc, tb):
+        self.registry.observe(self.name, time.perf_counter() - self.start, exc_type is not None)
+        return False
+
+    async def __aenter__(self):
+        return self.__enter__()
+
+    async def __aexit__(self, exc_type, exc, tb):
+        return self.__exit__(exc_type, exc, tb)
+
+
+# Process-wide registry used by the instrumented call sites
+perf = PerfRegistry()
+
+def timed(name: Optional[str] = None):
+    """
+    Decorator that times an async function under `name` (default: "handler.<function name>").
+    """
+    def decorator(func):
+        op = name or f"handler.{func.__name__}"
+
+        @wraps(func)
+        async def wrapped(*args, **kwargs):
+            async with perf.timer(op):
+                return await func(*args, **kwargs)
+        return wrapped
+    return decorator
+
@@ -0,0 +1,46 @@
+import asyncio
+import logging
+from typing import Awaitable, Callable, Optional
+
+logger = logging.getLogger(__name__)
+
+class PeriodicTask:
+    """
+    Runs `tick()` on the event loop, then sleeps `interval` seconds, until stopped.
+    An exception in one tick is logged as "Error <what>: ..." and the loop carries on.
+    """
+    def __init__(self, tick: Callable[[], Awaitable[None]], interval: float, what: str,
+                 log: Optional[logging.Logger] = None):
+        self.tick = tick
+        self.interval = interval
+        self.what = what
+        self.log = log or logger
+        self._task: Optional[asyncio.Task] = None
+
+    @property
+    def running(self) -> bool:
+        return self._task is not None and not self._task.done()
+
+    async def _run(self):
+        while True:
+            try:
+                await self.tick()
+            except Exception as e:
+                self.log.error(f"Error {self.what}: {e}")
+            await asyncio.sleep(self.interval)
+
+    def start(self):
+        """
+        Starts the loop on the running event loop (no-op if it is already running).
+        """
+        if not self.running:
+            self._task = asyncio.create_task(self._run())
+
+    async def stop(self):
+        if self._task is not None:
+            self._task.cancel()
+            try:
+                await self._task
+            except asyncio.CancelledError:
+                pass
+            self._task = None
@@ -0,0 +1,179 @@
+import asyncio
+import logging
+import time
+from typing import Any, Callable, Coroutine, Dict, Optional, Tuple
+
+from telegram.error import RetryAfter
+from telegram.ext import BaseRateLimiter
+
+logger = logging.getLogger(__name__)
+
+EDIT_ENDPOINTS = frozenset({"editMessageText", "editMessageCaption", "editMessageReplyMarkup"})
+
+class TokenBucket:
+    """
+    `rate` tokens per second, holding at most `burst`. A RetryAfter blocks the bucket until it expires.
+    """
+    __slots__ = ("rate", "burst", "tokens", "updated", "blocked_until")
+
+    def __init__(self, rate: float, burst: float):
+        self.rate = rate
+        self.burst = max(1.0, burst)
+        self.tokens = self.burst
+        self.updated = time.monotonic()
+        self.blocked_until = 0.0
+
+    def _refill(self, now: float):
+        self.tokens = min(self.burst, self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def idle(self) -> bool:
+        now = time.monotonic()
+        self._refill(now)
+        return self.tokens >= self.burst and now >= self.blocked_until
+
+    async def acquire(self):
+        while True:
+            now = time.monotonic()
+            if now < self.blocked_until:
+                await asyncio.sleep(self.blocked_until - now)
+                continue
+            self._refill(now)
+            if self.tokens >= 1:
+                self.tokens -= 1
+                return
+            await asyncio.sleep((1 - self.tokens) / self.rate)
+
+
+class _PendingEdit:
+    __slots__ = ("endpoint", "args", "kwargs", "future", "waiters", "started", "previous")
+
+    def __init__(self, endpoint: str, args, kwargs, previous: Optional["_PendingEdit"]):
+        self.endpoint = endpoint
+        self.args = args
+        self.kwargs = kwargs
+        self.previous = previous
+        self.future: asyncio.Future = asyncio.get_running_loop().create_future()
+        self.waiters = 0
+        self.started = False
+
+
+class OutboundRateLimiter(BaseRateLimiter[int]):
+    """
+    Rate limiter for every Bot API call the application makes (plugged in via ApplicationBuilder).
+
+    - Token buckets: one global, one per chat (groups get Telegram's slower per-minute allowance).
+    - Edit coalescing: edits of one message are sent in order, one at a time. An edit that arrives
+      while another edit of the same message through the same endpoint is still queued replaces the
+      queued content, so a burst of edits costs one API call; every merged caller gets that call's
+      result. Edits through different endpoints (text vs. reply markup) are never merged.
+    - RetryAfter: the chat (or the global bucket, for chat-less calls) is paused for the requested
+      time and the call is retried up to `max_retries` times (override per call with rate_limit_args).
+    """
+    MAX_BUCKETS = 1000
+
+    def __init__(self, global_rate: float = 25, chat_rate: float = 1, chat_burst: float = 3,
+                 group_rate_per_min: float = 20, max_retries: int = 3):
+        self.global_bucket = TokenBucket(global_rate, global_rate)
+        self.chat_rate = chat_rate
+        self.chat_burst = chat_burst
+        self.group_rate = group_rate_per_min / 60
+        self.max_retries = max_retries
+        self._buckets: Dict[Any, TokenBucket] = {}
+        self._pending_edits: Dict[Tuple[Any, Any], _PendingEdit] = {}
+
+    async def initialize(self) -> None:
+        pass
+
+    async def shutdown(self) -> None:
+        self._buckets.clear()
+
+    def _chat_bucket(self, chat_id) -> TokenBucket:
+        bucket = self._buckets.get(chat_id)
+        if bucket is None:
+            if len(self._buckets) >= self.MAX_BUCKETS:
+                for key in [k for k, b in self._buckets.items() if b.idle()]:
+                    del self._buckets[key]
+            is_group = isinstance(chat_id, str) or (isinstance(chat_id, int) and chat_id < 0)
+            bucket = TokenBucket(self.group_rate, 1) if is_group else TokenBucket(self.chat_rate, self.chat_burst)
+            self._buckets[chat_id] = bucket
+        return bucket
+
+    async def _call(self, callback, args, kwargs, chat_id, retries: int, have_chat_token: bool = False):
+        for attempt in range(retries + 1):
+            if chat_id is not None and not have_chat_token:
+                await self._chat_bucket(chat_id).acquire()
+            have_chat_token = False
+            await self.global_bucket.acquire()
+            try:
+                return await callback(*args, **kwargs)
+            except RetryAfter as e:
+                delay = e.retry_after.total_seconds() if hasattr(e.retry_after, 'total_seconds') else float(e.retry_after)
+                bucket = self._chat_bucket(chat_id) if chat_id is not None else self.global_bucket
+                bucket.blocked_until = max(bucket.blocked_until, time.monotonic() + delay)
+                if attempt == retries:
+                    raise
+                logger.warning(f"Flood limit hit (chat {chat_id}); retrying in {delay:.0f}s")
+
+    async def process_request(
+        self,
+        callback: Callable[..., Coroutine[Any, Any, Any]],
+        args: Any,
+        kwargs: Dict[str, Any],
+        endpoint: str,
+        data: Dict[str, Any],
+        rate_limit_args: Optional[int],
+    ):
+        chat_id = data.get('chat_id')
+        retries = self.max_retries if rate_limit_args is None else rate_limit_args
+
+        message_id = data.get('message_id') if endpoint in EDIT_ENDPOINTS else None
+        if message_id is None:
+            return await self._call(callback, args, kwargs, chat_id, retries)
+
+        key = (chat_id, message_id)
+        pending = self._pending_edits.get(key)
+        if pending is not None and not pending.started and pending.endpoint == endpoint:
+            # Still queued: send this content instead and share the result
+            pending.args, pending.kwargs = args, kwargs
+            pending.waiters += 1
+            return await asyncio.shield(pending.future)
+
+        pending = _PendingEdit(endpoint, args, kwargs, previous=pending)
+        self._pending_edits[key] = pending
+        try:
+            # Edits arriving while we wait (for the previous edit or a token) are merged into this one
+            if pending.previous is not None:
+                await asyncio.wait({pending.previous.future})
+                pending.previous = None
+            if chat_id is not None:
+                await self._chat_bucket(chat_id).acquire()
+            pending.started = True
+            result = await self._call(callback, pending.args, pending.kwargs, chat_id, retries,
+                                      have_chat_token=chat_id is not None)
+            pending.future.set_result(result)
+            return result
+        except asyncio.CancelledError:
+            pending.future.cancel()
+            raise
+        except Exception as e:
+            pending.future.set_exception(e)
+            if not pending.waiters:
+                pending.future.exception()  # nobody else is waiting; mark it retrieved
+            raise
+        finally:
+            if self._pending_edits.get(key) is pending:
+                del self._pending_edits[key]
+
+
+def edit_later(message, text: str, **kwargs) -> asyncio.Task:
+    """
+    Schedules message.edit_text without waiting for it, for progress updates that a later edit
+    will supersede (queued edits of the same message are merged by OutboundRateLimiter).
+    """
+    async def run():
+        try:
+            await message.edit_text(text, **kwargs)
+        except Exception as e:
+            logger.warning(f"Background edit failed: {e}")
+    return asyncio.create_task(run())
@@ -0,0 +1,17 @@
+import time
+from telegram.request import HTTPXRequest
+from utils.perf import perf
+
+class TimedRequest(HTTPXRequest):
+    """
+    HTTPXRequest that records every Bot API call in the perf registry as "tg.<method>".
+    """
+    async def do_request(self, url: str, method: str, *args, **kwargs):
+        op = f"tg.{url.rsplit('/', 1)[-1]}"
+        start = time.perf_counter()
+        status = None
+        try:
+            status, payload = await super().do_request(url, method, *args, **kwargs)
+            return status, payload
+        finally:
+            perf.observe(op, time.perf_counter() - start, status is None or status >= 400)
@@ -0,0 +1,81 @@
+import asyncio
+import time
+from typing import Any, Awaitable, Dict, Optional
+
+from telegram import Update
+from telegram.ext import BaseUpdateProcessor
+from utils.perf import perf
+
+class ChatOrderedUpdateProcessor(BaseUpdateProcessor):
+    """
+    Runs updates concurrently on at most `workers` handlers, while updates from the same chat
+    still run one at a time in arrival order (conversation state and confirm-then-act callbacks
+    rely on that). Updates without a chat or user are not ordered.
+
+    Up to `max_pending` updates are admitted at once (queued or running); further updates wait in
+    the application's update queue. An update that waits for an earlier one from its chat does not
+    hold a worker, so one slow chat occupies a single worker.
+
+    Queue depths are exposed as perf gauges ("updates.queued", "updates.running") and the time
+    from admission to start as the "updates.wait" histogram.
+    """
+    def __init__(self, workers: int = 8, max_pending: int = 256):
+        super().__init__(max(workers, max_pending))
+        self.workers = max(1, workers)
+        self.queued = 0
+        self.running = 0
+        self.max_queued = 0
+        self._worker_slots: Optional[asyncio.Semaphore] = None
+        # chat id -> future of the last admitted update of that chat
+        self._tails: Dict[Any, asyncio.Future] = {}
+        perf.gauge("updates.queued", lambda: self.queued)
+        perf.gauge("updates.running", lambda: self.running)
+        perf.gauge("updates.max_queued", lambda: self.max_queued)
+
+    @staticmethod
+    def ordering_key(update: object):
+        if isinstance(update, Update):
+            if update.effective_chat is not None:
+                return update.effective_chat.id
+            if update.effective_user is not None:
+                return ("user", update.effective_user.id)
+        return None
+
+    async def initialize(self) -> None:
+        # Created here so the semaphore belongs to the application's event loop
+        self._worker_slots = asyncio.Semaphore(self.workers)
+
+    async def shutdown(self) -> None:
+        self._tails.clear()
+
+    async def do_process_update(self, update: object, coroutine: Awaitable[Any]) -> None:
+        if self._worker_slots is None:
+            await self.initialize()
+        key = self.ordering_key(update)
+        previous = self._tails.get(key) if key is not None else None
+        done = asyncio.get_running_loop().create_future()
+        if key is not None:
+            self._tails[key] = done
+
+        admitted = time.perf_counter()
+        self.queued += 1
+        self.max_queued = max(self.max_queued, self.queued)
+        try:
+            try:
+                if previous is not None:
+                    await asyncio.wait({previous})
+                await self._worker_slots.acquire()
+            finally:
+                self.queued -= 1
+            perf.observe("updates.wait", time.perf_counter() - admitted)
+
+            self.running += 1
+            try:
+                await coroutine
+            finally:
+                self.running -= 1
+                self._worker_slots.release()
+        finally:
+            done.set_result(None)
+            if key is not None and self._tails.get(key) is done:
+                del self._tails[key]